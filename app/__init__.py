@@ -2,37 +2,52 @@ from flask import Flask, abort, request, session
 from .config import Config
 from .extensions import db, migrate, limiter
 from .utils import (
-    ACTIVITY_TYPE_DEFAULTS,
     can_manage_agenda,
     can_view_agenda,
-    get_active_team_code,
-    get_active_team_name,
+    generate_csrf_token,
     get_activity_color,
     get_activity_type_defs,
     get_activity_type_order,
-    get_available_teams,
+    get_auth_context,
+    reset_auth_context,
     POSITION_GROUP_DEFAULTS,
     get_position_group_defs,
     get_position_groups,
     get_position_group_labels,
+    order_topics_by_group,
     refresh_position_groups,
+    reset_position_group_snapshot,
     get_team_like_types,
 )
-from .activity_colors import get_activity_color_map
+from .activity_colors import get_activity_color_map, reset_activity_type_rows
 from datetime import timedelta
 from .routes import main, auth, admin, api
-from .models import User, ActivityType
-import json
+from . import json_codec
+from .schema import ensure_schema
+from .perf import BootTimer, init_request_metrics, measure, perf_cli
+from .sessions import init_sessions, sessions_cli
+from .webhooks import init_webhooks, webhooks_cli
+from .metrics import init_metrics
+from .profiling import init_profiling
+from .assets import assets_cli, init_assets
+from .compression import init_compression
+from .templating import init_template_cache, templates_cli
+from .data_version import init_data_versions, reset_data_versions
+from .fragment_cache import init_fragment_cache
+from .single_flight import init_single_flight
+from .queries import init_query_guards
+from .forking import register_app
 from dotenv import load_dotenv
 import logging
-import secrets
-from sqlalchemy import inspect, text
-from sqlalchemy.exc import OperationalError
 import sys
 from pathlib import Path
 from jinja2 import FileSystemLoader
 
+# Endpoints ohne Positionsgruppen; sie sollen nicht auf tt-infra warten
+MASTER_DATA_FREE_ENDPOINTS = {'static', 'assets', 'main.health', 'main.service_worker', 'main.calendar_feed', 'metrics'}
+
 def create_app(config_class=Config):
+    boot_timer = BootTimer()
     load_dotenv()  # Load .env file
     
     # Configure logging based on config
@@ -52,6 +67,8 @@ def create_app(config_class=Config):
     app.jinja_loader = FileSystemLoader(str(Path(__file__).parent / "templates"))
     
     app.config.from_object(config_class)
+    register_app(app)
+    init_template_cache(app)
 
     if not app.config.get('SECRET_KEY'):
         if app.debug or app.testing:
@@ -63,15 +80,37 @@ def create_app(config_class=Config):
     app.logger.info(f"Application started with LOG_LEVEL: {config_class.LOG_LEVEL}")
     app.logger.info(f"WEBHOOK_ENABLED: {app.config.get('WEBHOOK_ENABLED', False)}, WEBHOOK_URL: {app.config.get('WEBHOOK_URL', '')}")
 
+    # JSONB-Spalten (Postgres) mit demselben Codec wie JsonType dekodieren
+    engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    engine_options.setdefault('json_deserializer', json_codec.loads)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+    boot_timer.lap('config')
+
     db.init_app(app)
     migrate.init_app(app, db)
+    # Als erster after_request-Hook registriert, läuft die Kompression als letzter
+    init_compression(app)
     limiter.init_app(app)
+    init_sessions(app)
+    init_webhooks(app)
+    init_data_versions(app)
+    init_query_guards(app)
+    init_fragment_cache(app)
+    init_single_flight(app)
+    boot_timer.lap('extensions')
+    init_assets(app)
+    boot_timer.lap('assets')
 
     # Register Blueprints
     app.register_blueprint(main.bp)
     app.register_blueprint(auth.bp)
     app.register_blueprint(admin.bp)
     app.register_blueprint(api.bp)
+    app.cli.add_command(perf_cli)
+    app.cli.add_command(sessions_cli)
+    app.cli.add_command(webhooks_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(templates_cli)
 
     # Context processors and filters
     @app.context_processor
@@ -96,14 +135,18 @@ def create_app(config_class=Config):
 
     @app.before_request
     def refresh_shared_master_data():
-        refresh_position_groups()
+        if request.endpoint in MASTER_DATA_FREE_ENDPOINTS:
+            return
+        with measure('infra'):
+            refresh_position_groups()
 
-    def generate_csrf_token():
-        token = session.get('_csrf_token')
-        if not token:
-            token = secrets.token_urlsafe(32)
-            session['_csrf_token'] = token
-        return token
+    @app.teardown_request
+    def drop_request_caches(exc):
+        # g lebt im App-Context, der mehrere Requests umfassen kann (z.B. in Tests)
+        reset_auth_context()
+        reset_activity_type_rows()
+        reset_data_versions()
+        reset_position_group_snapshot()
 
     @app.context_processor
     def inject_csrf_token():
@@ -112,14 +155,14 @@ def create_app(config_class=Config):
     @app.context_processor
     def inject_platform_links():
         auth_base_url = app.config.get('AUTH_BASE_URL', 'http://localhost:8085').rstrip('/')
-        teams = get_available_teams()
-        active_team_code = get_active_team_code()
+        auth = get_auth_context()
         return {
+            'auth': auth,
             'auth_base_url': auth_base_url,
             'auth_dashboard_url': f'{auth_base_url}/',
-            'available_teams': teams,
-            'active_team_code': active_team_code,
-            'active_team_name': get_active_team_name(),
+            'available_teams': auth.teams,
+            'active_team_code': auth.active_team_code,
+            'active_team_name': auth.active_team_name,
         }
 
     @app.before_request
@@ -138,20 +181,22 @@ def create_app(config_class=Config):
 
     @app.template_filter('parse_groups')
     def parse_groups(groups_json):
-        if isinstance(groups_json, (list, dict)):
-            return groups_json
-        try:
-            return json.loads(groups_json)
-        except (json.JSONDecodeError, TypeError):
-            return []
+        if not isinstance(groups_json, (list, dict)):
+            try:
+                groups_json = json_codec.loads(groups_json)
+            except (json_codec.JSONDecodeError, TypeError):
+                return []
+        if isinstance(groups_json, dict):
+            return order_topics_by_group(groups_json)
+        return groups_json
 
     @app.template_filter('from_json')
     def from_json(json_string):
         if isinstance(json_string, (list, dict)):
             return json_string
         try:
-            return json.loads(json_string)
-        except (json.JSONDecodeError, TypeError):
+            return json_codec.loads(json_string)
+        except (json_codec.JSONDecodeError, TypeError):
             return {}
 
     @app.template_filter('get_activity_color')
@@ -163,121 +208,16 @@ def create_app(config_class=Config):
         from .utils import build_group_cells
         return build_group_cells(activity)
 
-    def ensure_activity_types():
-        if not ACTIVITY_TYPE_DEFAULTS:
-            return
-        defaults_by_key = {item['key']: item for item in ACTIVITY_TYPE_DEFAULTS}
-        rows = ActivityType.query.all()
-        existing_keys = {row.key for row in rows}
-        missing = [item for item in ACTIVITY_TYPE_DEFAULTS if item['key'] not in existing_keys]
-        if missing:
-            for item in missing:
-                db.session.add(ActivityType(**item))
-            db.session.commit()
-            rows = ActivityType.query.all()
-
-        changed = False
-        for row in rows:
-            defaults = defaults_by_key.get(row.key)
-            if not defaults:
-                continue
-            for field in ('label', 'behavior', 'badge_class', 'sort_order'):
-                if getattr(row, field, None) in (None, ''):
-                    setattr(row, field, defaults[field])
-                    changed = True
-            if row.light_color in (None, '', '#E8E8E8') and defaults.get('light_color'):
-                row.light_color = defaults['light_color']
-                changed = True
-            if row.dark_color in (None, '', '#4A4A4A') and defaults.get('dark_color'):
-                row.dark_color = defaults['dark_color']
-                changed = True
-        if changed:
-            db.session.commit()
-
-    def ensure_user_auth_claim_columns():
-        inspector = inspect(db.engine)
-        if 'user' not in inspector.get_table_names():
-            return
-        existing_columns = {column['name'] for column in inspector.get_columns('user')}
-        dialect = db.engine.dialect.name
-        bool_false = 'false' if dialect == 'postgresql' else '0'
-        statements = []
-        if 'auth_user_id' not in existing_columns:
-            statements.append('ALTER TABLE "user" ADD COLUMN auth_user_id INTEGER')
-        if 'platform_role' not in existing_columns:
-            statements.append("ALTER TABLE \"user\" ADD COLUMN platform_role VARCHAR(20) DEFAULT 'user'")
-        if 'display_name' not in existing_columns:
-            statements.append('ALTER TABLE "user" ADD COLUMN display_name VARCHAR(120)')
-        if 'email' not in existing_columns:
-            statements.append('ALTER TABLE "user" ADD COLUMN email VARCHAR(255)')
-        if 'profile_complete' not in existing_columns:
-            statements.append(f'ALTER TABLE "user" ADD COLUMN profile_complete BOOLEAN NOT NULL DEFAULT {bool_false}')
-        if 'memberships_json' not in existing_columns:
-            statements.append("ALTER TABLE \"user\" ADD COLUMN memberships_json TEXT NOT NULL DEFAULT '[]'")
-        if 'permissions_json' not in existing_columns:
-            statements.append("ALTER TABLE \"user\" ADD COLUMN permissions_json TEXT NOT NULL DEFAULT '[]'")
-        if 'claims_json' not in existing_columns:
-            statements.append("ALTER TABLE \"user\" ADD COLUMN claims_json TEXT NOT NULL DEFAULT '{}'")
-        for statement in statements:
-            db.session.execute(text(statement))
-        if statements:
-            db.session.commit()
-            app.logger.info('Applied agenda user auth-claim schema updates.')
-
-    def ensure_training_team_column():
-        inspector = inspect(db.engine)
-        if 'training' not in inspector.get_table_names():
-            return
-
-        existing_columns = {column['name'] for column in inspector.get_columns('training')}
-        dialect = db.engine.dialect.name
-
-        statements = []
-        if 'team_code' not in existing_columns:
-            statements.append("ALTER TABLE training ADD COLUMN team_code VARCHAR(32)")
-
-        for statement in statements:
-            db.session.execute(text(statement))
-
-        if statements:
-            db.session.commit()
-
-        # Backfill existing/null values and enforce NOT NULL semantics
-        db.session.execute(text("UPDATE training SET team_code = 'SENIORS' WHERE team_code IS NULL OR team_code = ''"))
-        if dialect == 'postgresql':
-            db.session.execute(text("ALTER TABLE training ALTER COLUMN team_code SET DEFAULT 'SENIORS'"))
-            db.session.execute(text("ALTER TABLE training ALTER COLUMN team_code SET NOT NULL"))
-        db.session.commit()
+    init_request_metrics(app)
+    init_metrics(app)
+    init_profiling(app)
+    boot_timer.lap('blueprints')
 
     with app.app_context():
         if app.config.get('AUTO_CREATE_DB'):
-            try:
-                db.create_all()
-            except OperationalError as exc:
-                if 'already exists' not in str(exc).lower():
-                    raise
-                app.logger.warning('DB init race condition detected; continuing.')
-            ensure_user_auth_claim_columns()
-            ensure_training_team_column()
-            # Backward-compat shim for existing deployments that do not run
-            # `flask db upgrade`. New installations use Alembic migrations.
-            if db.engine.dialect.name == 'sqlite':
-                table_exists = db.session.execute(
-                    text("SELECT name FROM sqlite_master WHERE type='table' AND name='activity_type'")
-                ).fetchone()
-                if table_exists:
-                    result = db.session.execute(text("PRAGMA table_info(activity_type)")).fetchall()
-                    existing_columns = {row[1] for row in result}
-                    if 'light_color' not in existing_columns:
-                        db.session.execute(text("ALTER TABLE activity_type ADD COLUMN light_color VARCHAR(7) NOT NULL DEFAULT '#E8E8E8'"))
-                    if 'dark_color' not in existing_columns:
-                        db.session.execute(text("ALTER TABLE activity_type ADD COLUMN dark_color VARCHAR(7) NOT NULL DEFAULT '#4A4A4A'"))
-
-                result = db.session.execute(text("PRAGMA table_info(training)")).fetchall()
-                existing_columns = {row[1] for row in result}
-                if 'is_hidden' not in existing_columns:
-                    db.session.execute(text("ALTER TABLE training ADD COLUMN is_hidden BOOLEAN NOT NULL DEFAULT 0"))
-                db.session.commit()
-            ensure_activity_types()
+            ensure_schema(app)
+            boot_timer.lap('schema')
             refresh_position_groups()
+            boot_timer.lap('master_data')
+    app.extensions['boot_timings'] = boot_timer.timings
     return app
@@ -2,6 +2,13 @@
 Konfigurierbare Farben für Aktivitätstypen
 Separate Farben für Light- und Dark-Mode
 """
+import logging
+
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_TYPE_FIELDS = ('key', 'label', 'behavior', 'badge_class', 'light_color', 'dark_color', 'sort_order')
 
 # Farbkonfiguration für Light-Mode (klar, aber nicht zu dominant)
 LIGHT_MODE_COLORS = {
@@ -19,27 +26,45 @@ DARK_MODE_COLORS = {
     'group': '#60A5FA'         # Bright Blue
 }
 
-def _get_color_from_db(activity_type, theme):
+def get_activity_type_rows():
+    """Alle Aktivitätstypen als Dicts (nach sort_order), pro Request nur eine Query."""
+    if has_request_context() and 'activity_type_rows' in g:
+        return g.activity_type_rows
     try:
         from .models import ActivityType
-        row = ActivityType.query.filter_by(key=activity_type).first()
-        if not row:
-            return None
-        return row.dark_color if theme == 'dark' else row.light_color
+        rows = [
+            {field: getattr(row, field) for field in ACTIVITY_TYPE_FIELDS}
+            for row in ActivityType.query.order_by(ActivityType.sort_order).all()
+        ]
     except Exception:
+        logger.warning("get_activity_type_rows: DB query failed, using defaults", exc_info=True)
+        rows = []
+    if has_request_context():
+        g.activity_type_rows = rows
+    return rows
+
+def reset_activity_type_rows():
+    g.pop('activity_type_rows', None)
+
+def get_activity_type_row(activity_type):
+    for row in get_activity_type_rows():
+        if row['key'] == activity_type:
+            return row
+    return None
+
+def _get_color_from_db(activity_type, theme):
+    row = get_activity_type_row(activity_type)
+    if not row:
         return None
+    return row['dark_color'] if theme == 'dark' else row['light_color']
 
 def get_activity_color_map(theme='light'):
-    try:
-        from .models import ActivityType
-        rows = ActivityType.query.all()
-        if not rows:
-            raise RuntimeError('No activity types configured')
-        if theme == 'dark':
-            return {row.key: row.dark_color for row in rows}
-        return {row.key: row.light_color for row in rows}
-    except Exception:
+    rows = get_activity_type_rows()
+    if not rows:
         return DARK_MODE_COLORS.copy() if theme == 'dark' else LIGHT_MODE_COLORS.copy()
+    if theme == 'dark':
+        return {row['key']: row['dark_color'] for row in rows}
+    return {row['key']: row['light_color'] for row in rows}
 
 def get_activity_color(activity_type, theme='light'):
     """
@@ -0,0 +1,195 @@
+"""
+Statische Dateien mit Content-Hash im Dateinamen.
+
+Beim Start wird `app/static` gehasht (`style.css` → `style.3f2a9c1b7d4e.css`)
+und unter `/assets/…` mit `Cache-Control: immutable` ausgeliefert; Templates
+nutzen dafür `static_url()`. Komprimierbare Dateien erhalten `.gz`- und, falls
+das optionale Paket `brotli` installiert ist, `.br`-Geschwister im Build-
+Ordner (ASSETS_BUILD_DIR), die je nach Accept-Encoding ausgeliefert werden.
+Die Geschwister sind über den Hash adressiert und werden nie veraltet;
+`flask assets build` erzeugt sie vorab, z.B. im Docker-Build.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+import click
+from flask import abort, current_app, request, send_file, url_for
+from flask.cli import AppGroup, with_appcontext
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+EXTENSION_KEY = 'assets'
+MANIFEST_FILENAME = 'manifest.json'
+ASSETS_BUILD_DIRNAME = 'assets'
+HASH_LENGTH = 12
+# Ein Jahr; die URL ändert sich mit dem Inhalt
+IMMUTABLE_MAX_AGE = 31536000
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.map', '.webmanifest'}
+COMPRESS_MIN_BYTES = 1024
+# Muss unter fester URL bleiben und bekommt den Asset-Stand injiziert
+UNHASHED_FILES = {'service-worker.js'}
+SKIPPED_SUFFIXES = ('.gz', '.br', '.backup')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+assets_cli = AppGroup('assets', help='Statische Dateien mit Content-Hash.')
+
+
+def _hashed_name(filename, digest):
+    stem, extension = os.path.splitext(filename)
+    return f'{stem}.{digest[:HASH_LENGTH]}{extension}'
+
+
+def _compress(source_path, target_base):
+    with open(source_path, 'rb') as handle:
+        data = handle.read()
+    written = []
+    targets = [('.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        targets.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+    for suffix, compress in targets:
+        target = target_base + suffix
+        if os.path.exists(target):
+            continue
+        compressed = compress(data)
+        if len(compressed) >= len(data):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f'{target}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as handle:
+            handle.write(compressed)
+        os.replace(temp_path, target)
+        written.append(target)
+    return written
+
+
+class AssetManifest:
+    """Zuordnung logischer Pfad ↔ gehashter Pfad für einen Static-Ordner."""
+
+    def __init__(self, static_folder, build_dir):
+        self.static_folder = static_folder
+        self.build_dir = build_dir
+        self.hashed = {}
+        self.sources = {}
+
+    def scan(self):
+        for root, _dirs, files in os.walk(self.static_folder):
+            for name in sorted(files):
+                if name.startswith('.') or name.endswith(SKIPPED_SUFFIXES):
+                    continue
+                source = os.path.join(root, name)
+                logical = os.path.relpath(source, self.static_folder).replace(os.sep, '/')
+                if logical in UNHASHED_FILES:
+                    continue
+                with open(source, 'rb') as handle:
+                    digest = hashlib.sha256(handle.read()).hexdigest()
+                hashed = _hashed_name(logical, digest)
+                self.hashed[logical] = hashed
+                self.sources[hashed] = logical
+        return self
+
+    @property
+    def version(self):
+        payload = json.dumps(self.hashed, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()[:HASH_LENGTH]
+
+    def compress(self):
+        """Schreibt fehlende .gz/.br-Geschwister; gibt die neu geschriebenen Pfade zurück."""
+        written = []
+        for hashed, logical in self.sources.items():
+            if os.path.splitext(logical)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            source = os.path.join(self.static_folder, logical)
+            if os.path.getsize(source) < COMPRESS_MIN_BYTES:
+                continue
+            written.extend(_compress(source, os.path.join(self.build_dir, hashed)))
+        return written
+
+    def write(self):
+        os.makedirs(self.build_dir, exist_ok=True)
+        path = os.path.join(self.build_dir, MANIFEST_FILENAME)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump({'version': self.version, 'files': self.hashed}, handle, indent=2, sort_keys=True)
+        os.replace(temp_path, path)
+        return path
+
+    def compressed_variant(self, hashed, accept_encodings):
+        for encoding, suffix in ENCODINGS:
+            if not accept_encodings[encoding]:
+                continue
+            path = os.path.join(self.build_dir, hashed + suffix)
+            if os.path.isfile(path):
+                return encoding, path
+        return None, None
+
+
+def get_asset_manifest(app=None):
+    return (app or current_app).extensions[EXTENSION_KEY]
+
+
+def static_url(filename):
+    """URL einer statischen Datei; gehasht, falls sie im Manifest steht."""
+    hashed = get_asset_manifest().hashed.get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets', filename=hashed)
+
+
+def serve_asset(filename):
+    manifest = get_asset_manifest()
+    logical = manifest.sources.get(filename)
+    if logical is None:
+        abort(404)
+    mimetype = mimetypes.guess_type(logical)[0] or 'application/octet-stream'
+    encoding, path = manifest.compressed_variant(filename, request.accept_encodings)
+    response = send_file(
+        path or os.path.join(manifest.static_folder, logical),
+        mimetype=mimetype,
+        max_age=IMMUTABLE_MAX_AGE,
+        conditional=True,
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if os.path.splitext(logical)[1] in COMPRESSIBLE_EXTENSIONS:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def build_manifest(app):
+    build_dir = app.config.get('ASSETS_BUILD_DIR') or os.path.join(app.instance_path, ASSETS_BUILD_DIRNAME)
+    return AssetManifest(app.static_folder, build_dir).scan()
+
+
+def init_assets(app):
+    manifest = build_manifest(app)
+    app.extensions[EXTENSION_KEY] = manifest
+    if app.config.get('ASSETS_PRECOMPRESS', True):
+        try:
+            manifest.compress()
+            manifest.write()
+        except OSError:
+            # Ohne beschreibbaren Build-Ordner wird unkomprimiert ausgeliefert
+            app.logger.warning('Could not write precompressed assets to %s.', manifest.build_dir)
+    app.add_url_rule('/assets/<path:filename>', endpoint='assets', view_func=serve_asset)
+    app.add_template_global(static_url)
+
+
+@assets_cli.command('build')
+@with_appcontext
+def build_command():
+    """Hasht app/static und schreibt .gz/.br-Geschwister und das Manifest."""
+    manifest = build_manifest(current_app)
+    written = manifest.compress()
+    path = manifest.write()
+    click.echo(f'{len(manifest.hashed)} Dateien, {len(written)} neu komprimiert, Version {manifest.version}')
+    click.echo(f'Manifest: {path}')
+    if brotli is None:
+        click.echo('Hinweis: brotli ist nicht installiert, es werden nur .gz-Dateien erzeugt.')
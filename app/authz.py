@@ -1,4 +1,9 @@
+import hashlib
+import json
+
 VALID_ROLES = {"user", "admin"}
+# JWT-Felder, die sich bei jedem Token ändern, ohne den Benutzer zu betreffen
+VOLATILE_CLAIMS = {"exp", "iat", "nbf", "jti"}
 
 
 def normalize_role(value, default="user"):
@@ -55,9 +60,71 @@ def normalize_auth_payload(payload):
     }
 
 
+def auth_payload_fingerprint(auth):
+    """SHA-256 über einen normalisierten Auth-Payload (ohne flüchtige JWT-Felder)."""
+    claims = {key: value for key, value in auth["claims"].items() if key not in VOLATILE_CLAIMS}
+    encoded = json.dumps(claims, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
 def is_platform_admin(platform_role=None, permissions=None):
     return normalize_role(platform_role) == "admin" or "*" in normalize_permissions(permissions)
 
 
 def is_service_admin(service_role=None, permissions=None):
     return normalize_role(service_role) == "admin" or "*" in normalize_permissions(permissions)
+
+
+class AuthContext:
+    """Berechtigungen und Teams eines Requests, einmal aus der Session berechnet."""
+
+    def __init__(self, user_id=None, platform_role=None, service_role=None, permissions=None, memberships=None, active_team_code=None):
+        self.user_id = user_id
+        self.permissions = normalize_permissions(permissions)
+        self.permission_set = frozenset(self.permissions)
+        self.is_platform_admin = normalize_role(platform_role) == "admin" or "*" in self.permission_set
+        self.is_service_admin = normalize_role(service_role) == "admin" or "*" in self.permission_set
+
+        team_names = {}
+        for membership in normalize_memberships(memberships):
+            code = str(membership.get("team_code") or "").strip().upper()
+            if code:
+                team_names[code] = str(membership.get("team_name") or "").strip() or code
+        if not team_names:
+            team_names = {"SENIORS": "Seniors"}
+        self.team_names = {code: team_names[code] for code in sorted(team_names)}
+        self.teams = [{"code": code, "name": name} for code, name in self.team_names.items()]
+
+        requested = str(active_team_code or "").strip().upper()
+        # True, wenn die gespeicherte Auswahl ungültig war und ersetzt wurde
+        self.active_team_fallback = requested not in self.team_names
+        self.active_team_code = self.teams[0]["code"] if self.active_team_fallback else requested
+        self.active_team_name = self.team_names[self.active_team_code]
+
+        self.can_manage_agenda = (
+            self.is_platform_admin
+            or self.is_service_admin
+            or "agenda:admin" in self.permission_set
+            or "agenda:write" in self.permission_set
+            or any(
+                permission.startswith("team:") and (permission.endswith(":write") or permission.endswith(":admin"))
+                for permission in self.permissions
+            )
+        )
+        self.can_view_agenda = (
+            self.can_manage_agenda
+            or "agenda:read" in self.permission_set
+            or "profile:read" in self.permission_set
+            or any(permission.startswith("team:") and permission.endswith(":read") for permission in self.permissions)
+        )
+
+    @classmethod
+    def from_session(cls, session):
+        return cls(
+            user_id=session.get("user_id"),
+            platform_role=session.get("platform_role"),
+            service_role=session.get("user_role"),
+            permissions=session.get("permissions"),
+            memberships=session.get("memberships"),
+            active_team_code=session.get("active_team_code"),
+        )
@@ -0,0 +1,299 @@
+"""
+Synthetische Daten und Benchmarks für den Terminplanungs-Kern.
+
+`generate_dataset` erzeugt reproduzierbar (Seed) N Teams × M wöchentliche
+Trainings × K Aktivitäten pro Saison über S Saisons, inklusive individueller
+und abgesagter Instanzen. `run_benchmarks` misst die Kernfunktionen und die
+Views index, live und /api/trainings über den Flask-Testclient; `compare_results`
+vergleicht mit einer gespeicherten Baseline. CLI: `flask perf seed|bench|compare`.
+"""
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+import gc
+import os
+import platform
+import random
+import statistics
+import time as _time
+import tracemalloc
+
+from sqlalchemy import event
+
+from .extensions import db
+from .models import Activity, ActivityInstance, Training, TrainingInstance, User
+from .utils import (
+    build_activity_timeline,
+    get_current_training_status,
+    get_upcoming_trainings,
+    load_training_data,
+    load_training_rows,
+)
+
+ACTIVITY_TYPES = ['team', 'prepractice', 'individual', 'group']
+POSITION_GROUP_KEYS = ['OL', 'DL', 'LB', 'RB', 'DB', 'TE', 'WR', 'QB']
+SEASON_LENGTH_DAYS = 280
+BENCH_USERNAME = 'benchmark'
+BENCH_SECRET = 'benchmark-internal-secret'
+
+# Relative Verschlechterung, ab der `compare_results` eine Regression meldet
+DEFAULT_THRESHOLD = 0.15
+# Fester Stichtag für `perf bench`, damit Läufe an verschiedenen Tagen dieselben Daten messen
+BENCH_TODAY = date(2026, 10, 19)
+BENCH_TIME = time(18, 30)
+
+
+def team_codes(teams):
+    return [f'TEAM{index + 1:02d}' for index in range(teams)]
+
+
+def _position_groups(rng, activity_type):
+    if activity_type in ('team', 'prepractice'):
+        return []
+    if activity_type == 'group':
+        groups = rng.sample(POSITION_GROUP_KEYS, 4)
+        return [groups[:2], groups[2:]]
+    return rng.sample(POSITION_GROUP_KEYS, rng.randint(2, len(POSITION_GROUP_KEYS)))
+
+
+def _activity_rows(rng, count, start):
+    current = datetime.combine(date.min, start)
+    rows = []
+    for order_index in range(count):
+        activity_type = rng.choice(ACTIVITY_TYPES)
+        duration = rng.choice([10, 15, 20, 25, 30])
+        rows.append({
+            'activity_type': activity_type,
+            'start_time': current.time(),
+            'duration': duration,
+            'position_groups': _position_groups(rng, activity_type),
+            'topic': f'Topic {order_index + 1}',
+            'order_index': order_index,
+        })
+        current += timedelta(minutes=duration)
+    return rows
+
+
+def generate_dataset(teams=4, trainings=3, activities=10, seasons=2, instance_ratio=0.25, seed=42, today=None):
+    """Legt synthetische Trainingsdaten an und gibt die Anzahl Zeilen pro Tabelle zurück.
+
+    Die letzte Saison läuft um `today`, damit laufende und kommende Trainings existieren.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    first_season_start = today - timedelta(days=90 + 365 * (seasons - 1))
+    counts = {'trainings': 0, 'activities': 0, 'instances': 0, 'instance_activities': 0}
+
+    for team_code in team_codes(teams):
+        for season in range(seasons):
+            season_start = first_season_start + timedelta(days=365 * season)
+            for index in range(trainings):
+                start_time = time(rng.choice([17, 18, 19]), rng.choice([0, 30]))
+                training = Training(
+                    team_code=team_code,
+                    name=f'{team_code} Training {season + 1}.{index + 1}',
+                    weekday=(index * 2) % 7,
+                    start_date=season_start,
+                    end_date=season_start + timedelta(days=SEASON_LENGTH_DAYS),
+                    start_time=start_time,
+                    is_hidden=rng.random() < 0.05,
+                )
+                db.session.add(training)
+                template = _activity_rows(rng, activities, start_time)
+                training.activities = [Activity(**row) for row in template]
+                counts['trainings'] += 1
+                counts['activities'] += len(template)
+
+                day = training.start_date + timedelta(days=(training.weekday - training.start_date.weekday()) % 7)
+                while day <= training.end_date:
+                    if rng.random() < instance_ratio:
+                        cancelled = rng.random() < 0.3
+                        instance = TrainingInstance(
+                            date=day,
+                            status='cancelled' if cancelled else 'active',
+                            start_time=start_time,
+                        )
+                        if not cancelled:
+                            rows = _activity_rows(rng, max(1, activities + rng.randint(-2, 2)), start_time)
+                            instance.activities = [ActivityInstance(**row) for row in rows]
+                            counts['instance_activities'] += len(rows)
+                        training.instances.append(instance)
+                        counts['instances'] += 1
+                    day += timedelta(days=7)
+        db.session.commit()
+    return counts
+
+
+@contextmanager
+def count_statements():
+    """Zählt SQL-Statements der App-Engine innerhalb des Blocks."""
+    counter = {'statements': 0}
+
+    def increment(*args, **kwargs):
+        counter['statements'] += 1
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', increment)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', increment)
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure_case(func, iterations=50, warmup=5):
+    """Führt `func` wiederholt aus und liefert Durchsatz, Latenzen, SQL und Speicher."""
+    for _ in range(warmup):
+        func()
+    durations = []
+    with count_statements() as counter:
+        for _ in range(iterations):
+            started = _time.perf_counter()
+            func()
+            durations.append((_time.perf_counter() - started) * 1000)
+
+    # Speicherspitze separat messen, tracemalloc verfälscht die Laufzeit
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    total_seconds = sum(durations) / 1000
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / total_seconds, 2) if total_seconds else None,
+        'mean_ms': round(statistics.fmean(durations), 3),
+        'p50_ms': round(_percentile(durations, 0.50), 3),
+        'p95_ms': round(_percentile(durations, 0.95), 3),
+        'sql_statements': round(counter['statements'] / iterations, 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def _benchmark_client(app, team_code):
+    user = User.query.filter_by(username=BENCH_USERNAME).first()
+    if user is None:
+        user = User(username=BENCH_USERNAME, role='admin')
+        user.set_password(BENCH_SECRET)
+        db.session.add(user)
+        db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+        sess['username'] = BENCH_USERNAME
+        sess['user_role'] = 'admin'
+        sess['memberships'] = [{'team_code': team_code, 'team_name': team_code}]
+        sess['active_team_code'] = team_code
+        # Webhook pro Session nur einmal auslösen
+        sess['webhook_sent'] = True
+    return client
+
+
+def benchmark_cases(app, team_code, now=None):
+    """Liefert {name: callable} für Kernfunktionen und Views."""
+    now = now or datetime.now()
+    # Wie in den Views: Zeilen statt ORM-Objekte
+    data = load_training_rows(team_code=team_code)
+    trainings, activities_by_training, _instances_by_key, _instance_activities_by_id = data
+    timelines = [(activities_by_training[training.id], training.start_date) for training in trainings]
+    client = _benchmark_client(app, team_code)
+    api_headers = {'X-TT-Internal-Secret': app.config.get('INTERNAL_API_SECRET') or ''}
+
+    def get(path, **kwargs):
+        def request():
+            response = client.get(path, **kwargs)
+            if response.status_code != 200:
+                raise RuntimeError(f'{path} returned {response.status_code}')
+        return request
+
+    return {
+        'load_training_data': lambda: load_training_data(team_code=team_code),
+        'load_training_rows': lambda: load_training_rows(team_code=team_code),
+        'get_upcoming_trainings': lambda: get_upcoming_trainings(*data, now),
+        'get_current_training_status': lambda: get_current_training_status(*data, now),
+        'build_activity_timeline': lambda: [build_activity_timeline(activities, base_date) for activities, base_date in timelines],
+        'view:index': get('/'),
+        'view:live': get('/live'),
+        'view:api_trainings': get(f'/api/trainings?teams={team_code}', headers=api_headers),
+    }
+
+
+def run_benchmarks(app, iterations=50, warmup=5, cases=None, dataset=None, today=None):
+    """Misst alle (oder die ausgewählten) Cases im App-Context von `app`.
+
+    `today` sollte der Stichtag von `generate_dataset` sein; die Kernfunktionen
+    rechnen dann mit `today` um BENCH_TIME statt mit der aktuellen Uhrzeit.
+    """
+    if not app.config.get('INTERNAL_API_SECRET'):
+        app.config['INTERNAL_API_SECRET'] = BENCH_SECRET
+    first_team = db.session.query(Training.team_code).order_by(Training.team_code).limit(1).scalar() or 'SENIORS'
+    now = datetime.combine(today, BENCH_TIME) if today else None
+    available = benchmark_cases(app, first_team, now=now)
+    selected = cases or list(available)
+    results = {}
+    for name in selected:
+        results[name] = measure_case(available[name], iterations=iterations, warmup=warmup)
+    return {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': db.engine.dialect.name,
+            'team_code': first_team,
+            'iterations': iterations,
+            'today': today.isoformat() if today else None,
+            'dataset': dataset,
+        },
+        'cases': results,
+    }
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Listet Regressionen gegenüber der Baseline (Latenz, Durchsatz, SQL-Anzahl)."""
+    regressions = []
+    for name, now in current.get('cases', {}).items():
+        before = baseline.get('cases', {}).get(name)
+        if not before:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if before[metric] and now[metric] > before[metric] * (1 + threshold):
+                regressions.append({'case': name, 'metric': metric, 'baseline': before[metric], 'current': now[metric]})
+        if before['ops_per_sec'] and now['ops_per_sec'] < before['ops_per_sec'] * (1 - threshold):
+            regressions.append({'case': name, 'metric': 'ops_per_sec', 'baseline': before['ops_per_sec'], 'current': now['ops_per_sec']})
+        # Mehr SQL-Statements sind immer eine Regression (N+1)
+        if now['sql_statements'] > before['sql_statements']:
+            regressions.append({'case': name, 'metric': 'sql_statements', 'baseline': before['sql_statements'], 'current': now['sql_statements']})
+    return regressions
+
+
+def create_benchmark_app(workdir, database_uri=None):
+    """App mit eigener SQLite-DB in `workdir`, damit keine echten Daten berührt werden.
+
+    Der Aufrufer besitzt `workdir` (z.B. ein `tempfile.TemporaryDirectory`) und
+    räumt es auf.
+    """
+    from . import create_app
+    from .config import Config
+
+    class BenchmarkConfig(Config):
+        TESTING = True
+        SECRET_KEY = Config.SECRET_KEY or 'benchmark-secret'
+        SQLALCHEMY_DATABASE_URI = database_uri or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        SESSION_SQLITE_PATH = os.path.join(workdir, 'sessions.db')
+        ASSETS_BUILD_DIR = os.path.join(workdir, 'assets')
+        JINJA_CACHE_DIR = os.path.join(workdir, 'jinja-cache')
+        # Sonst lesen die Views ab der zweiten Iteration das Ergebnis aus SINGLE_FLIGHT_DIR
+        SINGLE_FLIGHT_SHARED = False
+        AUTO_CREATE_DB = False
+        WEBHOOK_ENABLED = False
+        REQUEST_METRICS_ENABLED = False
+        INTERNAL_API_SECRET = BENCH_SECRET
+        LOG_LEVEL = 'WARNING'
+
+    return create_app(BenchmarkConfig)
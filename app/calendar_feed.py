@@ -0,0 +1,199 @@
+"""
+iCalendar-Feed pro Team (`/calendar/<team>.ics?token=…`).
+
+Kalender-Apps fragen den Feed regelmäßig ab, daher ist er auf 304 ausgelegt:
+ETag und Last-Modified ergeben sich allein aus dem Datenstand des Teams
+(app/data_version.py) und dem Tag, sodass eine unveränderte Abfrage nur eine
+Query kostet; die Positionsgruppen aus tt-infra lädt der Feed nicht
+(MASTER_DATA_FREE_ENDPOINTS in app/__init__.py). Der Feed selbst wird nur neu erzeugt, wenn sich der Datenstand
+oder der Tag ändert, und liegt bis dahin im Fragment-Cache des Workers.
+
+Trainingszeiten gelten in CALENDAR_TIMEZONE und werden als UTC (`…Z`)
+ausgegeben; so braucht der Feed keine VTIMEZONE-Definition.
+
+Der Token ist ein HMAC über den Teamcode (CALENDAR_FEED_SECRET, sonst
+SECRET_KEY); ein neues Secret macht alle bisherigen Abo-URLs ungültig.
+"""
+from datetime import datetime, time, timedelta, timezone
+import hashlib
+import hmac
+from zoneinfo import ZoneInfo
+
+from flask import current_app, make_response, request
+
+from .activity_colors import get_activity_type_row
+from .data_version import get_data_version
+from .fragment_cache import get_fragment_cache
+from .utils import get_timeline_from_activities, get_upcoming_trainings, load_training_rows, resolve_activities_for_date
+
+CALENDAR_MIMETYPE = 'text/calendar'
+PRODID = '-//TT Agenda//Trainingsplan//DE'
+UID_DOMAIN = 'tt-agenda'
+TOKEN_LENGTH = 32
+# Sekunden, die Clients den Feed ohne Nachfrage verwenden dürfen
+FEED_MAX_AGE = 900
+LINE_LIMIT = 75
+
+
+def _feed_secret():
+    secret = current_app.config.get('CALENDAR_FEED_SECRET') or current_app.config['SECRET_KEY']
+    return secret.encode('utf-8')
+
+
+def calendar_token(team_code):
+    digest = hmac.new(_feed_secret(), f'calendar:{team_code}'.encode('utf-8'), hashlib.sha256).hexdigest()
+    return digest[:TOKEN_LENGTH]
+
+
+def verify_calendar_token(team_code, token):
+    return bool(token) and hmac.compare_digest(calendar_token(team_code), token)
+
+
+def escape_text(value):
+    """Escaping für TEXT-Werte nach RFC 5545, Abschnitt 3.3.11."""
+    return (
+        (value or '')
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def fold_line(line):
+    """Bricht Zeilen nach 75 Oktetten um, ohne UTF-8-Zeichen zu trennen."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= LINE_LIMIT:
+        return line
+    parts = []
+    current = ''
+    limit = LINE_LIMIT
+    for char in line:
+        if len((current + char).encode('utf-8')) > limit:
+            parts.append(current)
+            current = char
+            # Folgezeilen beginnen mit einem Leerzeichen
+            limit = LINE_LIMIT - 1
+        else:
+            current += char
+    parts.append(current)
+    return '\r\n '.join(parts)
+
+
+def calendar_timezone():
+    return ZoneInfo(current_app.config.get('CALENDAR_TIMEZONE', 'Europe/Zurich'))
+
+
+def _utc(value, tz):
+    """Lokale Trainingszeit in `tz` als UTC-Zeitpunkt (RFC 5545, Form 2)."""
+    return f'{value.replace(tzinfo=tz).astimezone(timezone.utc):%Y%m%dT%H%M%SZ}'
+
+
+def _activity_line(activity, start, end):
+    row = get_activity_type_row(activity.activity_type)
+    label = row['label'] if row else activity.activity_type
+    line = f'{start:%H:%M}–{end:%H:%M} {label}'
+    if activity.topic:
+        line += f': {activity.topic}'
+    if activity.position_groups:
+        # Gruppen-Aktivitäten speichern Kombinationen als Listen, z.B. [['OL', 'DL'], ['LB', 'RB']]
+        groups = ['/'.join(group) if isinstance(group, list) else str(group) for group in activity.position_groups]
+        line += f" ({', '.join(groups)})"
+    return line
+
+
+def _event_lines(item, activities, data_version, stamp, tz):
+    training = item['training']
+    date = item['date']
+    start = datetime.combine(date, item['start_time'])
+    end = datetime.combine(date, item['end_time'])
+    if end <= start:
+        end += timedelta(days=1)
+
+    description = []
+    if item['is_cancelled']:
+        description.append('Training abgesagt.')
+    elif item['is_individual']:
+        description.append('Angepasstes Training:')
+    if not item['is_cancelled']:
+        timeline, _start_dt, _end_dt = get_timeline_from_activities(activities, date)
+        description.extend(_activity_line(activity, activity_start, activity_end) for activity, activity_start, activity_end in timeline or [])
+
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{training.id}-{date:%Y%m%d}@{UID_DOMAIN}',
+        f'DTSTAMP:{stamp:%Y%m%dT%H%M%SZ}',
+        f'DTSTART:{_utc(start, tz)}',
+        f'DTEND:{_utc(end, tz)}',
+        f'SUMMARY:{escape_text(training.name)}',
+        f'SEQUENCE:{data_version.team}',
+        f"STATUS:{'CANCELLED' if item['is_cancelled'] else 'CONFIRMED'}",
+    ]
+    if description:
+        lines.append(f"DESCRIPTION:{escape_text(chr(10).join(description))}")
+    lines.append('END:VEVENT')
+    return lines
+
+
+def build_calendar(team_code, data_version, today, stamp):
+    """Erzeugt den Feed für alle Termine ab `today - CALENDAR_PAST_DAYS`."""
+    tz = calendar_timezone()
+    past_days = current_app.config.get('CALENDAR_PAST_DAYS', 14)
+    data = load_training_rows(team_code=team_code)
+    _trainings, activities_by_training, instances_by_key, instance_activities_by_id = data
+    window_start = datetime.combine(today - timedelta(days=past_days), time.min)
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(f"Training {team_code}")}',
+        # Nur Anzeigehinweis für Clients; die Zeiten selbst sind UTC
+        f'X-WR-TIMEZONE:{tz.key}',
+    ]
+    for item in get_upcoming_trainings(*data, window_start):
+        activities, _is_cancelled = resolve_activities_for_date(
+            item['training'], item['date'], activities_by_training, instances_by_key, instance_activities_by_id
+        )
+        lines.extend(_event_lines(item, activities, data_version, stamp, tz))
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(fold_line(line) for line in lines) + '\r\n'
+
+
+def feed_validators(team_code, today):
+    """ETag und Last-Modified (UTC), ohne den Feed zu erzeugen."""
+    data_version = get_data_version(team_code)
+    etag = hashlib.sha256(f'{team_code}:{data_version.token}:{today.isoformat()}'.encode('utf-8')).hexdigest()[:32]
+    # Mitternacht in der Kalenderzone; updated_at ist naives UTC
+    midnight = datetime.combine(today, time.min, tzinfo=calendar_timezone()).astimezone(timezone.utc)
+    updated_at = data_version.updated_at.replace(tzinfo=timezone.utc) if data_version.updated_at else midnight
+    last_modified = max(updated_at, midnight).replace(microsecond=0)
+    return data_version, etag, last_modified
+
+
+def calendar_response(team_code):
+    today = datetime.now(calendar_timezone()).date()
+    data_version, etag, last_modified = feed_validators(team_code, today)
+
+    response = make_response('')
+    response.mimetype = CALENDAR_MIMETYPE
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.max_age = FEED_MAX_AGE
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    cache = get_fragment_cache()
+    key = ('calendar', team_code, etag)
+    entry = cache.get(key)
+    if entry is None:
+        entry = (build_calendar(team_code, data_version, today, last_modified), None)
+        cache.set(key, entry)
+    response.set_data(entry[0])
+    response.headers['Content-Disposition'] = f'inline; filename="{team_code}.ics"'
+    return response
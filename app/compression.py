@@ -0,0 +1,155 @@
+"""
+Dynamische Kompression von HTML- und JSON-Antworten.
+
+Komprimiert wird mit Brotli (falls das optionale Paket `brotli` installiert
+ist) oder gzip, je nach Accept-Encoding. Kleine Antworten unter
+COMPRESSION_MIN_SIZE bleiben unkomprimiert, gestreamte Antworten werden
+chunkweise komprimiert. Bereits kodierte Antworten (vorkomprimierte Assets)
+und Dateien (`send_file`) werden nicht angefasst. Blueprints in
+COMPRESSION_SKIP_BLUEPRINTS (z.B. `api`) bleiben unkomprimiert.
+
+ETags komprimierter Antworten werden schwach (`W/"…"`): die Bytes
+unterscheiden sich, der Inhalt nicht, und `If-None-Match` vergleicht schwach,
+sodass 304-Antworten weiterhin funktionieren. Ein 304 auf einen Request, der
+komprimiert worden wäre, trägt dasselbe schwache ETag.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'text/javascript',
+    'text/xml',
+    'text/calendar',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+}
+
+
+class _GzipStream:
+    def __init__(self, level):
+        # wbits 31: gzip-Header und -Trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, chunk):
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def process(self, chunk):
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _compress_body(encoding, data, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _stream(encoding, level):
+    return _BrotliStream(level) if encoding == 'br' else _GzipStream(level)
+
+
+def _compressed_chunks(iterable, stream):
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield stream.process(chunk)
+        yield stream.finish()
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+
+
+def choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def parse_blueprint_list(raw_value):
+    """Parst `api,admin` zu einer Menge von Blueprint-Namen."""
+    return {name.strip() for name in (raw_value or '').split(',') if name.strip()}
+
+
+def _weaken_etag(response):
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def init_compression(app):
+    """Registriert die Kompression; vor allen anderen after_request-Hooks aufrufen,
+    damit sie als letzte läuft."""
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+    if isinstance(app.config.get('COMPRESSION_SKIP_BLUEPRINTS'), str):
+        app.config['COMPRESSION_SKIP_BLUEPRINTS'] = parse_blueprint_list(app.config['COMPRESSION_SKIP_BLUEPRINTS'])
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        # Auch unkomprimierte Varianten hängen vom Header ab (Caches, Service Worker)
+        response.vary.add('Accept-Encoding')
+        if (
+            request.method == 'HEAD'
+            or response.status_code < 200
+            or response.status_code in (204, 206)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.cache_control.no_transform
+            or request.blueprint in (app.config.get('COMPRESSION_SKIP_BLUEPRINTS') or ())
+        ):
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        if response.status_code == 304:
+            # make_conditional lässt den Body stehen; das 304 trägt dasselbe ETag wie die 200-Antwort
+            if response.is_streamed or len(response.get_data()) >= app.config.get('COMPRESSION_MIN_SIZE', 500):
+                _weaken_etag(response)
+            return response
+        if encoding == 'br':
+            level = app.config.get('COMPRESSION_BROTLI_QUALITY', 5)
+        else:
+            level = app.config.get('COMPRESSION_LEVEL', 6)
+
+        if response.is_streamed:
+            response.response = _compressed_chunks(response.response, _stream(encoding, level))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < app.config.get('COMPRESSION_MIN_SIZE', 500):
+                return response
+            response.set_data(_compress_body(encoding, data, level))
+
+        response.headers['Content-Encoding'] = encoding
+        _weaken_etag(response)
+        return response
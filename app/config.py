@@ -17,6 +17,13 @@ class Config:
     AUTH_BASE_URL = os.environ.get('AUTH_BASE_URL', 'http://localhost:8085').rstrip('/')
     WEBHOOK_ENABLED = os.environ.get('WEBHOOK_ENABLED', 'false').lower() == 'true'
     WEBHOOK_URL = os.environ.get('WEBHOOK_URL', 'https://n8n.3624.ch/webhook/messaging')
+    # Versand im Hintergrund (app/webhooks.py)
+    WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', '20'))
+    WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', '8'))
+    WEBHOOK_RETRY_BASE_SECONDS = int(os.environ.get('WEBHOOK_RETRY_BASE_SECONDS', '5'))
+    WEBHOOK_RETRY_MAX_SECONDS = int(os.environ.get('WEBHOOK_RETRY_MAX_SECONDS', '3600'))
+    # Tage, die `dead`-Ereignisse zur Analyse bleiben; 0 behält sie unbegrenzt
+    WEBHOOK_DEAD_RETENTION_DAYS = int(os.environ.get('WEBHOOK_DEAD_RETENTION_DAYS', '14'))
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
     AUTO_CREATE_DB = os.environ.get('AUTO_CREATE_DB', 'true').lower() == 'true'
     SSO_SHARED_SECRET = os.environ.get('SSO_SHARED_SECRET') or SECRET_KEY
@@ -25,5 +32,52 @@ class Config:
     SSO_SYNC_ROLE = os.environ.get('SSO_SYNC_ROLE', 'true').lower() == 'true'
     INTERNAL_API_SECRET = os.environ.get('INTERNAL_API_SECRET') or SSO_SHARED_SECRET
     TT_INFRA_INTERNAL_URL = os.environ.get('TT_INFRA_INTERNAL_URL', 'http://localhost:8084')
+    # Startzeit-Budget für `flask perf boot` und tests/test_perf.py
+    BOOT_BUDGET_MS = float(os.environ.get('BOOT_BUDGET_MS', '5000'))
+    # Request-Metriken (Server-Timing-Header und Log-Zeile pro Request)
+    REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', 'true').lower() == 'true'
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    # Warnung, wenn ein Request mehr SQL-Statements absetzt; pro Endpoint: "admin.admin_trainings=20,main.index=15"
+    QUERY_BUDGET_DEFAULT = int(os.environ.get('QUERY_BUDGET_DEFAULT', '30'))
+    QUERY_BUDGETS = os.environ.get('QUERY_BUDGETS', '')
+    # Prometheus-Endpoint /metrics (Header X-TT-Internal-Secret); Verzeichnis für Gunicorn-Multiprocess
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    PROMETHEUS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    # Profiling einzelner Requests per ?_profile=1 (nur Admins), Berichte unter /admin/perf
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')
+    PROFILE_BUFFER_SIZE = int(os.environ.get('PROFILE_BUFFER_SIZE', '20'))
+    # Dynamische Kompression (gzip, Brotli falls installiert); Blueprints ausnehmen z.B. mit "api"
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '500'))
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', '6'))
+    COMPRESSION_SKIP_BLUEPRINTS = os.environ.get('COMPRESSION_SKIP_BLUEPRINTS', '')
+    # Jinja-Bytecode-Cache (app/templating.py), Standard instance/jinja-cache
+    JINJA_BYTECODE_CACHE_ENABLED = os.environ.get('JINJA_BYTECODE_CACHE_ENABLED', 'true').lower() == 'true'
+    JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR')
+    # Gehashte statische Dateien (app/assets.py); Build-Ordner für .gz/.br, Standard instance/assets
+    ASSETS_BUILD_DIR = os.environ.get('ASSETS_BUILD_DIR')
+    ASSETS_PRECOMPRESS = os.environ.get('ASSETS_PRECOMPRESS', 'true').lower() == 'true'
+    # Anzahl kommender Termine, deren Live-Ansicht der Service Worker offline vorhält
+    OFFLINE_PREFETCH_OCCURRENCES = int(os.environ.get('OFFLINE_PREFETCH_OCCURRENCES', '5'))
+    # Gerenderte Admin-Tabellen pro Team und Datenstand (app/fragment_cache.py); 0 deaktiviert
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', '128'))
+    # iCalendar-Feed /calendar/<team>.ics (app/calendar_feed.py); Token-Secret, sonst SECRET_KEY
+    CALENDAR_FEED_SECRET = os.environ.get('CALENDAR_FEED_SECRET')
+    CALENDAR_TIMEZONE = os.environ.get('CALENDAR_TIMEZONE', 'Europe/Zurich')
+    CALENDAR_PAST_DAYS = int(os.environ.get('CALENDAR_PAST_DAYS', '14'))
+    # Single-Flight für kommende Trainings (app/single_flight.py); Lock-/Ergebnisdateien, Standard instance/single-flight
+    SINGLE_FLIGHT_SHARED = os.environ.get('SINGLE_FLIGHT_SHARED', 'true').lower() == 'true'
+    SINGLE_FLIGHT_DIR = os.environ.get('SINGLE_FLIGHT_DIR')
+    SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', '10'))
+    # Lock-Datei für Schema-Prüfungen beim Start unter SQLite (app/schema.py), Standard instance/schema.lock
+    SCHEMA_LOCK_PATH = os.environ.get('SCHEMA_LOCK_PATH')
+    # Nicht vorgeladene Beziehungen werfen statt nachzuladen (app/queries.py; in Tests aktiv)
+    RAISE_ON_LAZY_LOAD = os.environ.get('RAISE_ON_LAZY_LOAD', 'false').lower() == 'true'
+    # Serverseitige Sessions: sqlite (Datei im Instance-Ordner), database oder cookie
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sqlite').lower()
+    SESSION_SQLITE_PATH = os.environ.get('SESSION_SQLITE_PATH')
+    SESSION_SWEEP_INTERVAL = int(os.environ.get('SESSION_SWEEP_INTERVAL', '300'))
+    SESSION_REFRESH_INTERVAL = int(os.environ.get('SESSION_REFRESH_INTERVAL', '3600'))
     # Rate limiting: override with redis://host:port/0 for multi-worker production
     RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
@@ -0,0 +1,189 @@
+"""
+Datenstand pro Team für Caches.
+
+Jede Änderung an Trainings, Aktivitäten oder Instanzen erhöht beim Flush in
+derselben Transaktion die Versionsnummer des Teams in `team_data_version`;
+Änderungen an Aktivitätstypen erhöhen die globale Version (GLOBAL_SCOPE).
+Caches (Fragmente, Kalender-Feeds, …) nehmen `get_data_version(team)` in
+ihren Schlüssel auf und werden so über alle Worker hinweg ungültig, ohne
+dass Worker sich gegenseitig benachrichtigen müssen.
+"""
+from datetime import datetime
+
+from flask import g, has_request_context
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import Activity, ActivityInstance, ActivityType, TeamDataVersion, Training, TrainingInstance
+
+GLOBAL_SCOPE = '*'
+
+_listeners_installed = False
+
+
+class DataVersion:
+    """Version eines Teams inklusive globaler Version; `token` eignet sich als Cache-Schlüssel."""
+
+    __slots__ = ('team_code', 'team', 'global_', 'updated_at')
+
+    def __init__(self, team_code, team=0, global_=0, updated_at=None):
+        self.team_code = team_code
+        self.team = team
+        self.global_ = global_
+        self.updated_at = updated_at
+
+    @property
+    def token(self):
+        return f'{self.team}.{self.global_}'
+
+    def __repr__(self):
+        return f'<DataVersion {self.team_code} {self.token}>'
+
+
+def _parent(session, obj, relationship, model, parent_id):
+    # Nur bereits geladene Beziehungen lesen (kein Lazy-Load, auch unter raiseload);
+    # sonst per Primärschlüssel, meist direkt aus der Identity-Map
+    parent = obj.__dict__.get(relationship)
+    if parent is None and parent_id is not None:
+        parent = session.get(model, parent_id)
+    return parent
+
+
+def _team_code_for(session, obj):
+    if isinstance(obj, Training):
+        return obj.team_code
+    if isinstance(obj, (Activity, TrainingInstance)):
+        training = _parent(session, obj, 'training', Training, obj.training_id)
+        return training.team_code if training else None
+    if isinstance(obj, ActivityInstance):
+        instance = _parent(session, obj, 'training_instance', TrainingInstance, obj.training_instance_id)
+        return _team_code_for(session, instance) if instance else None
+    if isinstance(obj, ActivityType):
+        return GLOBAL_SCOPE
+    return None
+
+
+def _collect_changes(session, flush_context, instances):
+    scopes = session.info.setdefault('data_version_scopes', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        scope = _team_code_for(session, obj)
+        if scope:
+            scopes.add(scope)
+        if isinstance(obj, Training):
+            # Wechselt ein Training das Team, ändert sich auch das alte Team
+            scopes.update(code for code in inspect(obj).attrs.team_code.history.deleted if code)
+
+
+def _bump_on_flush(session, flush_context):
+    scopes = session.info.pop('data_version_scopes', None)
+    if scopes:
+        bump_data_versions(scopes, connection=session.connection())
+
+
+def bump_data_versions(scopes, connection=None):
+    """Erhöht die Versionen der angegebenen Teams (oder GLOBAL_SCOPE)."""
+    table = TeamDataVersion.__table__
+    now = datetime.utcnow()
+
+    def bump(conn):
+        for scope in sorted(scopes):
+            updated = conn.execute(
+                update(table).where(table.c.team_code == scope).values(version=table.c.version + 1, updated_at=now)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(table).values(team_code=scope, version=1, updated_at=now))
+
+    if connection is not None:
+        bump(connection)
+    else:
+        with db.engine.begin() as conn:
+            bump(conn)
+    if has_request_context():
+        g.pop('data_versions', None)
+
+
+def read_data_versions():
+    """Alle Versionen als {scope: version}; leer, wenn die Tabelle (noch) fehlt."""
+    table = TeamDataVersion.__table__
+    try:
+        with db.engine.connect() as conn:
+            return dict(conn.execute(select(table.c.team_code, table.c.version)).all())
+    except SQLAlchemyError:
+        return {}
+
+
+def advance_data_versions(floor):
+    """Hebt jede Version auf max(`floor`, gespeichert) + 1, z.B. nach einem Restore.
+
+    Ein wiederhergestellter Stand trägt die Versionen von damals. Ohne den
+    Sprung über `floor` (die Versionen vor dem Restore) könnte ein Token einen
+    früheren Stand wiederholen, den Caches anderer Worker, Single-Flight-Dateien
+    oder Kalender-ETags bei den Clients noch kennen.
+    """
+    table = TeamDataVersion.__table__
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        # Backups aus der Zeit vor team_data_version haben die Tabelle nicht
+        table.create(conn, checkfirst=True)
+        stored = dict(conn.execute(select(table.c.team_code, table.c.version)).all())
+        for scope in sorted(set(floor) | set(stored) | {GLOBAL_SCOPE}):
+            version = max(floor.get(scope, 0), stored.get(scope, 0)) + 1
+            if scope in stored:
+                conn.execute(update(table).where(table.c.team_code == scope).values(version=version, updated_at=now))
+            else:
+                conn.execute(insert(table).values(team_code=scope, version=version, updated_at=now))
+    if has_request_context():
+        g.pop('data_versions', None)
+
+
+def get_data_version(team_code):
+    """Aktueller Datenstand eines Teams; einmal pro Request und Team gelesen."""
+    cache = g.setdefault('data_versions', {}) if has_request_context() else {}
+    if team_code in cache:
+        return cache[team_code]
+    table = TeamDataVersion.__table__
+    rows = db.session.execute(
+        select(table.c.team_code, table.c.version, table.c.updated_at).where(table.c.team_code.in_([team_code, GLOBAL_SCOPE]))
+    ).all()
+    by_scope = {row.team_code: row for row in rows}
+    team_row = by_scope.get(team_code)
+    global_row = by_scope.get(GLOBAL_SCOPE)
+    timestamps = [row.updated_at for row in (team_row, global_row) if row is not None]
+    version = DataVersion(
+        team_code,
+        team=team_row.version if team_row else 0,
+        global_=global_row.version if global_row else 0,
+        updated_at=max(timestamps) if timestamps else None,
+    )
+    cache[team_code] = version
+    return version
+
+
+def get_data_token(team_codes=None):
+    """Gemeinsamer Datenstand mehrerer Teams (None: alle Teams) als String, mit einer Query."""
+    table = TeamDataVersion.__table__
+    query = select(table.c.team_code, table.c.version)
+    if team_codes is not None:
+        query = query.where(table.c.team_code.in_(sorted(set(team_codes)) + [GLOBAL_SCOPE]))
+        versions = dict(db.session.execute(query).all())
+        return '.'.join(str(versions.get(scope, 0)) for scope in sorted(set(team_codes)) + [GLOBAL_SCOPE])
+    # Versionen steigen nur, daher ändern sich Anzahl oder Summe bei jeder Änderung
+    versions = [version for _scope, version in db.session.execute(query).all()]
+    return f'{len(versions)}.{sum(versions)}'
+
+
+def reset_data_versions():
+    g.pop('data_versions', None)
+
+
+def init_data_versions(app):
+    global _listeners_installed
+    if not _listeners_installed:
+        # Auf der Session-Klasse, damit auch Sessions außerhalb von db.session zählen
+        event.listen(Session, 'before_flush', _collect_changes)
+        event.listen(Session, 'after_flush', _bump_on_flush)
+        _listeners_installed = True
@@ -0,0 +1,65 @@
+"""
+Fork-Sicherheit für Gunicorn mit `preload_app`.
+
+Mit Preload erzeugt der Master die App einmal (Templates, Stammdaten,
+Registries) und die Worker erben sie per Copy-on-Write. Verbindungen dürfen
+dabei nicht geteilt werden: `gunicorn.conf.py` ruft im `post_fork`-Hook
+`reinit_after_fork()` auf, das im Worker den Engine-Pool verwirft (ohne die
+Verbindungen des Masters zu schließen) und die registrierten Ressourcen pro
+Worker neu anlegt (Session-Store, Webhook-HTTP-Session, Locks).
+"""
+import gc
+import logging
+import weakref
+
+from .extensions import db
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = 'after_fork'
+
+# Alle im Prozess erzeugten Apps; der post_fork-Hook kennt das App-Objekt nicht
+_apps = weakref.WeakSet()
+
+
+def register_app(app):
+    app.extensions.setdefault(EXTENSION_KEY, [])
+    _apps.add(app)
+
+
+def register_after_fork(app, callback):
+    """`callback()` läuft in jedem neuen Worker-Prozess, bevor er Requests annimmt."""
+    app.extensions.setdefault(EXTENSION_KEY, []).append(callback)
+
+
+def reinit_app_after_fork(app):
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False: die Sockets gehören weiter dem Master bzw. anderen Workern
+            engine.dispose(close=False)
+    for callback in app.extensions.get(EXTENSION_KEY, []):
+        callback()
+
+
+def reinit_after_fork():
+    for app in list(_apps):
+        reinit_app_after_fork(app)
+
+
+def prepare_for_fork():
+    """Im Master vor dem ersten Fork: Templates laden und Objekte aus der GC nehmen.
+
+    `gc.freeze()` verhindert, dass der Garbage Collector geerbte Objekte
+    anfasst und damit die Copy-on-Write-Seiten in jedem Worker kopiert.
+    """
+    from .templating import load_templates
+
+    for app in list(_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                # Der Master bedient keine Requests; offene Verbindungen nicht vererben
+                engine.dispose()
+        loaded, failed = load_templates(app)
+        logger.info('Preloaded %s templates before fork (%s skipped).', loaded, len(failed))
+    gc.collect()
+    gc.freeze()
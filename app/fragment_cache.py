@@ -0,0 +1,85 @@
+"""
+Cache für gerenderte HTML-Fragmente.
+
+Der Schlüssel enthält den Datenstand des Teams (app/data_version.py), daher
+muss nie explizit invalidiert werden: nach einer Änderung passt der alte
+Eintrag nicht mehr und fällt irgendwann aus dem LRU. Fragmente werden mit
+einem Platzhalter statt des CSRF-Tokens gerendert; beim Ausliefern wird der
+Token der aktuellen Session eingesetzt, sodass ein Eintrag für alle Admins
+des Teams gilt.
+"""
+from collections import OrderedDict
+import threading
+
+from flask import current_app
+from markupsafe import Markup
+
+from .forking import register_after_fork
+from .metrics import observe_fragment_cache
+from .utils import generate_csrf_token
+
+EXTENSION_KEY = 'fragment_cache'
+CSRF_PLACEHOLDER = '__TT_FRAGMENT_CSRF__'
+
+
+class FragmentCache:
+    """Threadsicherer LRU-Cache pro Prozess; Werte sind (html, meta)-Paare."""
+
+    def __init__(self, size=128):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        observe_fragment_cache(entry is not None)
+        return entry
+
+    def set(self, key, entry):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def reset_after_fork(self):
+        # Einträge bleiben gültig (Copy-on-Write), nur das Lock wird neu angelegt
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def get_fragment_cache(app=None):
+    return (app or current_app).extensions[EXTENSION_KEY]
+
+
+def cached_fragment(key, render):
+    """Liefert `(Markup, meta)`; `render(csrf_token)` erzeugt bei Bedarf `(html, meta)`."""
+    cache = get_fragment_cache()
+    entry = cache.get(key)
+    if entry is None:
+        entry = render(lambda: CSRF_PLACEHOLDER)
+        cache.set(key, entry)
+    html, meta = entry
+    return Markup(html.replace(CSRF_PLACEHOLDER, generate_csrf_token())), meta
+
+
+def init_fragment_cache(app):
+    cache = FragmentCache(app.config.get('FRAGMENT_CACHE_SIZE', 128))
+    app.extensions[EXTENSION_KEY] = cache
+    register_after_fork(app, cache.reset_after_fork)
@@ -0,0 +1,27 @@
+"""
+JSON-Codec für Datenbank- und Template-Daten.
+
+Dekodiert mit orjson, falls installiert, sonst mit der Standardbibliothek.
+Kodiert wird immer mit `json.dumps`, damit gespeicherte Werte unabhängig
+vom installierten Codec byte-identisch bleiben.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - abhängig von der Installation
+    orjson = None
+
+# orjson.JSONDecodeError ist eine Unterklasse von json.JSONDecodeError
+JSONDecodeError = json.JSONDecodeError
+
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+loads = orjson.loads if orjson is not None else json.loads
+
+
+def codec_name():
+    return 'orjson' if orjson is not None else 'json'
@@ -0,0 +1,146 @@
+"""
+Prometheus-Metriken unter `/metrics`.
+
+Mit gesetztem PROMETHEUS_MULTIPROC_DIR schreibt jeder Gunicorn-Worker seine
+Werte in dieses Verzeichnis und `/metrics` aggregiert über alle Worker
+(siehe gunicorn.conf.py). Ohne das Verzeichnis gelten die Werte pro Prozess.
+Die Request-Werte stammen aus den Request-Metriken in app/perf.py.
+"""
+import os
+import time
+
+from flask import Response, current_app, request
+
+from .forking import register_after_fork
+from .perf import current_metrics
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_metrics = None
+
+
+class _Metrics:
+    def __init__(self):
+        from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+        # Eigene Registry, damit mehrfaches create_app (Tests) nichts doppelt registriert
+        self.registry = CollectorRegistry()
+        self.request_duration = Histogram(
+            'tt_agenda_request_duration_seconds', 'Request-Dauer pro Endpoint.',
+            ['endpoint', 'method'], buckets=LATENCY_BUCKETS, registry=self.registry,
+        )
+        self.db_queries = Histogram(
+            'tt_agenda_request_db_queries', 'SQL-Statements pro Request.',
+            ['endpoint'], buckets=QUERY_COUNT_BUCKETS, registry=self.registry,
+        )
+        self.db_duration = Histogram(
+            'tt_agenda_request_db_seconds', 'SQL-Zeit pro Request.',
+            ['endpoint'], buckets=LATENCY_BUCKETS, registry=self.registry,
+        )
+        self.infra_duration = Histogram(
+            'tt_agenda_infra_request_seconds', 'Dauer der tt-infra-Aufrufe.',
+            ['call'], buckets=LATENCY_BUCKETS, registry=self.registry,
+        )
+        self.infra_failures = Counter(
+            'tt_agenda_infra_failures', 'Fehlgeschlagene tt-infra-Aufrufe.',
+            ['call'], registry=self.registry,
+        )
+        self.rate_limited = Counter(
+            'tt_agenda_rate_limited', 'Vom Rate-Limiter abgewiesene Requests.',
+            ['endpoint'], registry=self.registry,
+        )
+        self.fragment_cache = Counter(
+            'tt_agenda_fragment_cache_lookups', 'Zugriffe auf den Fragment-Cache (hit/miss).',
+            ['result'], registry=self.registry,
+        )
+        self.single_flight = Counter(
+            'tt_agenda_single_flight_calls', 'Single-Flight-Aufrufe, selbst berechnet oder geteilt.',
+            ['result'], registry=self.registry,
+        )
+        self.worker_start = Gauge(
+            'tt_agenda_worker_start_time_seconds', 'Startzeit des Workers (Unix-Zeit).',
+            registry=self.registry, multiprocess_mode='liveall',
+        )
+        self.worker_start.set(time.time())
+
+    def reset_after_fork(self):
+        # Mit preload_app läuft __init__ im Master; jeder Worker meldet seine eigene Startzeit
+        self.worker_start.set(time.time())
+
+    def render(self):
+        from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+
+        if multiprocess_dir():
+            from prometheus_client import multiprocess
+
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = self.registry
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def multiprocess_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+def observe_infra(call, started, failed=False):
+    """Erfasst einen tt-infra-Aufruf; ohne aktivierte Metriken ein No-op."""
+    if _metrics is None:
+        return
+    _metrics.infra_duration.labels(call).observe(time.perf_counter() - started)
+    if failed:
+        _metrics.infra_failures.labels(call).inc()
+
+
+def observe_fragment_cache(hit):
+    """Zählt einen Fragment-Cache-Zugriff; ohne aktivierte Metriken ein No-op."""
+    if _metrics is None:
+        return
+    _metrics.fragment_cache.labels('hit' if hit else 'miss').inc()
+
+
+def observe_single_flight(shared):
+    """Zählt einen Single-Flight-Aufruf; ohne aktivierte Metriken ein No-op."""
+    if _metrics is None:
+        return
+    _metrics.single_flight.labels('shared' if shared else 'computed').inc()
+
+
+def init_metrics(app):
+    """Registriert `/metrics`; benötigt REQUEST_METRICS_ENABLED."""
+    global _metrics
+    if not app.config.get('METRICS_ENABLED', True) or not app.config.get('REQUEST_METRICS_ENABLED', True):
+        return
+    if app.config.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Muss vor dem ersten Import von prometheus_client gesetzt sein
+        os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', app.config['PROMETHEUS_MULTIPROC_DIR'])
+    if multiprocess_dir():
+        os.makedirs(multiprocess_dir(), exist_ok=True)
+    if _metrics is None:
+        _metrics = _Metrics()
+    register_after_fork(app, _metrics.reset_after_fork)
+
+    # Läuft vor emit_request_metrics (after_request in umgekehrter Reihenfolge)
+    @app.after_request
+    def observe_request(response):
+        metrics = current_metrics()
+        if metrics is None or request.endpoint == 'metrics':
+            return response
+        endpoint = request.endpoint or 'unknown'
+        _metrics.request_duration.labels(endpoint, request.method).observe(metrics.total_ms() / 1000)
+        _metrics.db_queries.labels(endpoint).observe(metrics.db_queries)
+        _metrics.db_duration.labels(endpoint).observe(metrics.timings['db'] / 1000)
+        if response.status_code == 429:
+            _metrics.rate_limited.labels(endpoint).inc()
+        return response
+
+    @app.route('/metrics', endpoint='metrics')
+    def metrics_endpoint():
+        expected = current_app.config.get('INTERNAL_API_SECRET')
+        provided = request.headers.get('X-TT-Internal-Secret')
+        if not (expected and provided and provided == expected):
+            return {'error': 'unauthorized'}, 401
+        body, content_type = _metrics.render()
+        return Response(body, content_type=content_type)
@@ -1,34 +1,59 @@
+from datetime import datetime
 from .extensions import db
 from werkzeug.security import generate_password_hash, check_password_hash
-import json
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.types import TypeDecorator, Text
-from .authz import normalize_auth_payload
+from . import json_codec
+from .authz import auth_payload_fingerprint, normalize_auth_payload
 
 
 class JsonType(TypeDecorator):
-    """Speichert Python-Objekte (list/dict) als JSON-String in der Datenbank.
-    Bestehende JSON-Strings in der DB werden korrekt deserialisiert.
+    """Speichert Python-Objekte (list/dict) als JSON in der Datenbank.
+
+    Auf Postgres als JSONB (abfragbar, ohne Parsing beim Laden), sonst als
+    TEXT. Bestehende JSON-Strings in der DB werden korrekt deserialisiert.
     """
     impl = Text
     cache_ok = True
 
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(Text())
+
     def process_bind_param(self, value, dialect):
         if value is None:
             return None
+        if dialect.name == 'postgresql':
+            if isinstance(value, str):
+                # Bereits serialisiert (Rückwärtskompatibilität)
+                try:
+                    return json_codec.loads(value)
+                except (json_codec.JSONDecodeError, TypeError):
+                    return None
+            return value
         if isinstance(value, str):
             # Bereits serialisiert (Rückwärtskompatibilität)
             return value
-        return json.dumps(value, ensure_ascii=False)
+        return json_codec.dumps(value)
 
     def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, (str, bytes)):
+            # JSONB wird bereits vom Treiber dekodiert
+            return value
         if not value:
             return None
         try:
-            return json.loads(value)
-        except (json.JSONDecodeError, TypeError):
+            return json_codec.loads(value)
+        except (json_codec.JSONDecodeError, TypeError):
             return None
 
 class Training(db.Model):
+    __table_args__ = (
+        db.Index('ix_training_team_hidden_dates', 'team_code', 'is_hidden', 'start_date', 'end_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     team_code = db.Column(db.String(32), nullable=False, default='SENIORS', index=True)
     name = db.Column(db.String(100), nullable=False)
@@ -37,12 +62,14 @@ class Training(db.Model):
     end_date = db.Column(db.Date, nullable=False)
     start_time = db.Column(db.Time, nullable=False)
     is_hidden = db.Column(db.Boolean, default=False, nullable=False)
-    activities = db.relationship('Activity', backref='training', lazy=True, cascade='all, delete-orphan')
-    instances = db.relationship('TrainingInstance', backref='training', lazy=True, cascade='all, delete-orphan')
+    # Kinder löscht die Datenbank per ON DELETE CASCADE, ohne sie vorher zu laden
+    activities = db.relationship('Activity', backref='training', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    instances = db.relationship('TrainingInstance', backref='training', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
 
 class Activity(db.Model):
+    __table_args__ = (db.Index('ix_activity_training_order', 'training_id', 'order_index'),)
     id = db.Column(db.Integer, primary_key=True)
-    training_id = db.Column(db.Integer, db.ForeignKey('training.id'), nullable=False)
+    training_id = db.Column(db.Integer, db.ForeignKey('training.id', ondelete='CASCADE'), nullable=False)
     activity_type = db.Column(db.String(20), nullable=False)
     start_time = db.Column(db.Time, nullable=False)
     duration = db.Column(db.Integer, nullable=False)
@@ -55,15 +82,16 @@ class Activity(db.Model):
 class TrainingInstance(db.Model):
     __table_args__ = (db.UniqueConstraint('training_id', 'date', name='uq_training_instance_date'),)
     id = db.Column(db.Integer, primary_key=True)
-    training_id = db.Column(db.Integer, db.ForeignKey('training.id'), nullable=False)
+    training_id = db.Column(db.Integer, db.ForeignKey('training.id', ondelete='CASCADE'), nullable=False)
     date = db.Column(db.Date, nullable=False, index=True)
     status = db.Column(db.String(20), default='active', nullable=False)
     start_time = db.Column(db.Time, nullable=False)
-    activities = db.relationship('ActivityInstance', backref='training_instance', lazy=True, cascade='all, delete-orphan')
+    activities = db.relationship('ActivityInstance', backref='training_instance', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
 
 class ActivityInstance(db.Model):
+    __table_args__ = (db.Index('ix_activity_instance_instance_order', 'training_instance_id', 'order_index'),)
     id = db.Column(db.Integer, primary_key=True)
-    training_instance_id = db.Column(db.Integer, db.ForeignKey('training_instance.id'), nullable=False)
+    training_instance_id = db.Column(db.Integer, db.ForeignKey('training_instance.id', ondelete='CASCADE'), nullable=False)
     activity_type = db.Column(db.String(20), nullable=False)
     start_time = db.Column(db.Time, nullable=False)
     duration = db.Column(db.Integer, nullable=False)
@@ -97,6 +125,7 @@ class User(db.Model):
     memberships_json = db.Column(JsonType, nullable=False, default=list)
     permissions_json = db.Column(JsonType, nullable=False, default=list)
     claims_json = db.Column(JsonType, nullable=False, default=dict)
+    auth_payload_hash = db.Column(db.String(64))
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -105,8 +134,12 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
 
     def sync_from_sso_claims(self, payload):
+        """Übernimmt die SSO-Claims; gibt False zurück, wenn sich nichts geändert hat."""
         auth = normalize_auth_payload(payload)
         claims = auth['claims']
+        payload_hash = auth_payload_fingerprint(auth)
+        if self.id is not None and self.auth_payload_hash == payload_hash:
+            return False
 
         self.auth_user_id = int(claims['sub'])
         self.username = (claims.get('username') or self.username).strip()
@@ -118,3 +151,39 @@ class User(db.Model):
         self.memberships_json = auth['memberships']
         self.permissions_json = auth['permissions']
         self.claims_json = claims
+        self.auth_payload_hash = payload_hash
+        return True
+
+class SchemaState(db.Model):
+    """Fingerprint des zuletzt geprüften Schemas (siehe app/schema.py)."""
+    key = db.Column(db.String(40), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ServerSession(db.Model):
+    """Serverseitige Session-Daten für SESSION_BACKEND=database (siehe app/sessions.py)."""
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class WebhookEvent(db.Model):
+    """Spool für ausstehende Webhooks (siehe app/webhooks.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), nullable=False)
+    payload = db.Column(JsonType, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_webhook_event_status_due', 'status', 'next_attempt_at'),)
+
+
+class TeamDataVersion(db.Model):
+    """Datenstand pro Team, wird bei jeder Änderung erhöht (siehe app/data_version.py)."""
+    team_code = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,354 @@
+"""
+Performance-Werkzeuge: Boot-Zeitmessung, Request-Metriken und `flask perf` CLI.
+"""
+from contextlib import contextmanager
+from datetime import date
+from functools import wraps
+import json
+import logging
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+from flask import before_render_template, g, request, template_rendered
+from flask.cli import AppGroup
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+BOOT_PROFILE_MARKER = 'BOOT_PROFILE '
+
+# Läuft in einem frischen Interpreter, damit Imports kalt gemessen werden
+_BOOT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app as package
+imported = time.perf_counter()
+application = package.create_app()
+created = time.perf_counter()
+response = application.test_client().get(sys.argv[1])
+finished = time.perf_counter()
+print(%r + json.dumps({
+    'imports_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'phases_ms': application.extensions.get('boot_timings', {}),
+    'first_request': {
+        'path': sys.argv[1],
+        'status': response.status_code,
+        'ms': (finished - created) * 1000,
+    },
+    'total_ms': (finished - started) * 1000,
+}))
+""" % BOOT_PROFILE_MARKER
+
+perf_cli = AppGroup('perf', help='Performance-Messungen.')
+request_logger = logging.getLogger('app.perf.requests')
+_sql_listeners_installed = False
+
+
+class BootTimer:
+    """Misst die Dauer aufeinanderfolgender Phasen in Millisekunden."""
+
+    def __init__(self):
+        self.timings = {}
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.timings[name] = round((now - self._last) * 1000, 3)
+        self._last = now
+
+
+class RequestMetrics:
+    """Zeiten (ms) und SQL-Zähler eines Requests für Server-Timing und Log."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.timings = {'db': 0.0, 'infra': 0.0, 'ctx': 0.0, 'tpl': 0.0}
+        self.template_started = None
+
+    def add(self, name, started):
+        self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms):
+        parts = [f'db;desc="{self.db_queries} queries";dur={self.timings["db"]:.1f}']
+        parts.extend(f'{name};dur={value:.1f}' for name, value in self.timings.items() if name != 'db')
+        parts.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(parts)
+
+
+def current_metrics():
+    return g.get('request_metrics') if g else None
+
+
+@contextmanager
+def measure(name):
+    """Addiert die Dauer des Blocks zur Metrik `name` des laufenden Requests."""
+    metrics = current_metrics()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.add(name, started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Am Execution-Context statt als Stack in conn.info: wirft das Statement,
+    # läuft after_cursor_execute nie und es bliebe nichts zurück
+    if context is not None:
+        context._tt_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_tt_query_started', None)
+    metrics = current_metrics()
+    if metrics is not None and started is not None:
+        metrics.db_queries += 1
+        metrics.add('db', started)
+
+
+def _install_sql_listeners():
+    # Einmal pro Prozess auf Engine-Ebene; ausserhalb eines Requests wird nichts gezählt
+    global _sql_listeners_installed
+    if not _sql_listeners_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _sql_listeners_installed = True
+
+
+def _timed_context_processor(processor):
+    @wraps(processor)
+    def wrapper():
+        with measure('ctx'):
+            return processor()
+    return wrapper
+
+
+def parse_query_budgets(raw_value):
+    """Parst `endpoint=anzahl,endpoint=anzahl` zu einem Dict."""
+    budgets = {}
+    for item in (raw_value or '').split(','):
+        endpoint, _, limit = item.partition('=')
+        if endpoint.strip() and limit.strip().isdigit():
+            budgets[endpoint.strip()] = int(limit)
+    return budgets
+
+
+def init_request_metrics(app):
+    """Misst SQL, tt-infra, Context-Processors und Templates pro Request.
+
+    Muss nach dem Registrieren aller Context-Processors aufgerufen werden.
+    """
+    if not app.config.get('REQUEST_METRICS_ENABLED', True):
+        return
+    _install_sql_listeners()
+    for name, processors in app.template_context_processors.items():
+        app.template_context_processors[name] = [_timed_context_processor(processor) for processor in processors]
+
+    if isinstance(app.config.get('QUERY_BUDGETS'), str):
+        app.config['QUERY_BUDGETS'] = parse_query_budgets(app.config['QUERY_BUDGETS'])
+
+    def start_template(sender, template, context, **extra):
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.template_started = time.perf_counter()
+
+    def finish_template(sender, template, context, **extra):
+        metrics = current_metrics()
+        if metrics is not None and metrics.template_started is not None:
+            metrics.add('tpl', metrics.template_started)
+            metrics.template_started = None
+
+    before_render_template.connect(start_template, app, weak=False)
+    template_rendered.connect(finish_template, app, weak=False)
+
+    def start_request_metrics():
+        g.request_metrics = RequestMetrics()
+
+    # Vor allen anderen before_request-Handlern, damit tt-infra mitgemessen wird
+    app.before_request_funcs.setdefault(None, []).insert(0, start_request_metrics)
+
+    @app.after_request
+    def emit_request_metrics(response):
+        metrics = g.pop('request_metrics', None)
+        if metrics is None:
+            return response
+        total_ms = metrics.total_ms()
+        if app.config.get('SERVER_TIMING_ENABLED', True):
+            response.headers['Server-Timing'] = metrics.server_timing(total_ms)
+
+        endpoint = request.endpoint or ''
+        budget = (app.config.get('QUERY_BUDGETS') or {}).get(endpoint, app.config.get('QUERY_BUDGET_DEFAULT'))
+        record = {
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'ms': round(total_ms, 1),
+            'db_queries': metrics.db_queries,
+            **{f'{name}_ms': round(value, 1) for name, value in metrics.timings.items()},
+        }
+        if budget is not None and metrics.db_queries > budget:
+            record['query_budget'] = budget
+            request_logger.warning('Query budget exceeded: %s', json.dumps(record))
+        else:
+            request_logger.info(json.dumps(record))
+        return response
+
+
+def parse_import_times(stderr, limit=15):
+    """Summiert die Eigenzeit aus `python -X importtime` pro Top-Level-Paket (ms)."""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        try:
+            self_us = int(fields[0])
+        except ValueError:
+            continue
+        package = fields[2].strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return {package: round(self_us / 1000, 3) for package, self_us in ranked[:limit]}
+
+
+def profile_boot(path='/login', env=None):
+    """Startet die App in einem neuen Prozess und liefert die Zeitaufteilung."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _BOOT_PROBE, path],
+        cwd=PROJECT_ROOT,
+        env=env if env is not None else os.environ.copy(),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith(BOOT_PROFILE_MARKER):
+            profile = json.loads(line[len(BOOT_PROFILE_MARKER):])
+            break
+    else:
+        raise RuntimeError(f'Boot-Profil fehlgeschlagen (exit {result.returncode}):\n{result.stderr[-2000:]}')
+
+    for key in ('imports_ms', 'create_app_ms', 'total_ms'):
+        profile[key] = round(profile[key], 3)
+    profile['first_request']['ms'] = round(profile['first_request']['ms'], 3)
+    profile['top_imports_ms'] = parse_import_times(result.stderr)
+    return profile
+
+
+@perf_cli.command('boot')
+@click.option('--path', default='/login', show_default=True, help='Pfad für den ersten Request.')
+@click.option('--budget-ms', type=float, default=None, help='Budget in ms (Standard: BOOT_BUDGET_MS).')
+def boot_command(path, budget_ms):
+    """Misst Imports, create_app-Phasen und den ersten Request als JSON."""
+    from flask import current_app
+
+    if budget_ms is None:
+        budget_ms = current_app.config.get('BOOT_BUDGET_MS')
+    profile = profile_boot(path)
+    if budget_ms:
+        profile['budget_ms'] = budget_ms
+        profile['within_budget'] = profile['total_ms'] <= budget_ms
+    click.echo(json.dumps(profile, indent=2))
+    if budget_ms and not profile['within_budget']:
+        raise SystemExit(1)
+
+
+def _benchmark_default(name, convert=None):
+    # app.benchmark importiert utils, das wiederum perf importiert; daher erst beim Aufruf
+    def default():
+        from . import benchmark
+        value = getattr(benchmark, name)
+        return convert(value) if convert else value
+    return default
+
+
+def _dataset_options(command):
+    for option in reversed([
+        click.option('--teams', default=4, show_default=True, help='Anzahl Teams.'),
+        click.option('--trainings', default=3, show_default=True, help='Wöchentliche Trainings pro Team und Saison.'),
+        click.option('--activities', default=10, show_default=True, help='Aktivitäten pro Training.'),
+        click.option('--seasons', default=2, show_default=True, help='Anzahl Saisons.'),
+        click.option('--seed', default=42, show_default=True, help='Zufalls-Seed.'),
+    ]):
+        command = option(command)
+    return command
+
+
+@perf_cli.command('seed')
+@_dataset_options
+@click.option('--yes', is_flag=True, help='Ohne Rückfrage in die konfigurierte Datenbank schreiben.')
+def seed_command(teams, trainings, activities, seasons, seed, yes):
+    """Schreibt synthetische Trainingsdaten in die konfigurierte Datenbank."""
+    from .benchmark import generate_dataset
+    from .extensions import db
+
+    if not yes:
+        click.confirm(f'Synthetische Daten in {db.engine.url.render_as_string(hide_password=True)} schreiben?', abort=True)
+    counts = generate_dataset(teams=teams, trainings=trainings, activities=activities, seasons=seasons, seed=seed)
+    click.echo(json.dumps(counts, indent=2))
+
+
+@perf_cli.command('bench')
+@_dataset_options
+@click.option('--iterations', default=50, show_default=True, help='Messläufe pro Case.')
+@click.option('--warmup', default=5, show_default=True, help='Aufwärmläufe pro Case.')
+@click.option('--case', 'cases', multiple=True, help='Nur diese Cases messen (mehrfach möglich).')
+@click.option('--today', type=click.DateTime(formats=['%Y-%m-%d']), default=_benchmark_default('BENCH_TODAY', date.isoformat),
+              show_default=True, help='Stichtag für Daten und Uhr der Kernfunktionen.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Ergebnis als JSON in diese Datei schreiben.')
+def bench_command(teams, trainings, activities, seasons, seed, iterations, warmup, cases, today, output):
+    """Misst Kernfunktionen und Views auf einer temporären DB mit synthetischen Daten."""
+    from .benchmark import create_benchmark_app, generate_dataset, run_benchmarks
+    from .extensions import db
+    from .schema import ensure_activity_types
+
+    today = today.date()
+    with tempfile.TemporaryDirectory(prefix='tt-agenda-bench-') as workdir:
+        bench_app = create_benchmark_app(workdir)
+        with bench_app.app_context():
+            db.create_all()
+            ensure_activity_types()
+            dataset = {'teams': teams, 'trainings': trainings, 'activities': activities, 'seasons': seasons, 'seed': seed}
+            dataset['rows'] = generate_dataset(
+                teams=teams, trainings=trainings, activities=activities, seasons=seasons, seed=seed, today=today,
+            )
+            result = run_benchmarks(
+                bench_app, iterations=iterations, warmup=warmup, cases=list(cases) or None, dataset=dataset, today=today,
+            )
+            db.engine.dispose()
+    payload = json.dumps(result, indent=2)
+    if output:
+        Path(output).write_text(payload + '\n', encoding='utf-8')
+    click.echo(payload)
+
+
+@perf_cli.command('compare')
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+@click.argument('current', type=click.Path(exists=True, dir_okay=False))
+@click.option('--threshold', type=float, default=_benchmark_default('DEFAULT_THRESHOLD'), show_default=True, help='Erlaubte relative Verschlechterung.')
+def compare_command(baseline, current, threshold):
+    """Vergleicht zwei `perf bench`-Ergebnisse; Exit-Code 1 bei Regressionen."""
+    from .benchmark import compare_results
+
+    regressions = compare_results(
+        json.loads(Path(baseline).read_text(encoding='utf-8')),
+        json.loads(Path(current).read_text(encoding='utf-8')),
+        threshold=threshold,
+    )
+    click.echo(json.dumps({'threshold': threshold, 'regressions': regressions}, indent=2))
+    if regressions:
+        raise SystemExit(1)
@@ -0,0 +1,206 @@
+"""
+Profiling einzelner Requests auf Anfrage.
+
+Admins hängen `?_profile=1` an eine URL (oder senden den Header
+`X-TT-Profile: 1`); der Request läuft dann unter cProfile und alle
+SQL-Statements werden mit Dauer mitgeschrieben. Der Bericht landet als
+JSON-Datei in einem Ringpuffer (PROFILE_DIR, höchstens PROFILE_BUFFER_SIZE
+Dateien) und ist unter `/admin/perf` einsehbar. Ohne PROFILING_ENABLED
+werden keine Hooks registriert.
+"""
+import cProfile
+from datetime import datetime
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import threading
+import time
+
+from flask import g, request, session
+from sqlalchemy import event
+
+from .extensions import db
+
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_HEADER = 'X-TT-Profile'
+PROFILE_ID_HEADER = 'X-TT-Profile-Id'
+PROFILE_DIRNAME = 'profiles'
+PROFILE_ID_PATTERN = re.compile(r'^\d{8}T\d{12}-[0-9a-f]{6}$')
+PROFILE_STATS_LIMIT = 60
+
+# Pro Prozess darf nur ein cProfile aktiv sein (ab Python 3.12 über
+# sys.monitoring, ein zweites enable() wirft ValueError)
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """cProfile und SQL-Mitschnitt für genau einen Request (einen Thread)."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.statements = []
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.engine = db.engine
+        self.active = False
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Am Execution-Context wie in app/perf.py; fehlschlagende Statements hinterlassen nichts
+        if threading.get_ident() == self.thread_id and context is not None:
+            context._tt_profile_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_tt_profile_started', None)
+        if threading.get_ident() != self.thread_id or started is None:
+            return
+        self.statements.append({'sql': statement, 'ms': round((time.perf_counter() - started) * 1000, 3)})
+
+    def start(self):
+        """Startet das Profil; False, wenn gerade ein anderer Request profiliert wird."""
+        if not _profiler_lock.acquire(blocking=False):
+            return False
+        self.active = True
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(self.engine, 'after_cursor_execute', self._after_cursor_execute)
+        self.profiler.enable()
+        return True
+
+    def stop(self):
+        if not self.active:
+            return
+        try:
+            self.profiler.disable()
+            if event.contains(self.engine, 'before_cursor_execute', self._before_cursor_execute):
+                event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.remove(self.engine, 'after_cursor_execute', self._after_cursor_execute)
+        finally:
+            self.active = False
+            _profiler_lock.release()
+
+    def stats_text(self, limit=PROFILE_STATS_LIMIT):
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+
+    def report(self, response):
+        return {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'user': session.get('username'),
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'sql_count': len(self.statements),
+            'sql_ms': round(sum(item['ms'] for item in self.statements), 3),
+            'sql': self.statements,
+            'stats': self.stats_text(),
+        }
+
+
+class ProfileStore:
+    """Ringpuffer aus JSON-Dateien; die ältesten Berichte werden verdrängt."""
+
+    def __init__(self, directory, size=20):
+        self.directory = directory
+        self.size = size
+
+    def _path(self, profile_id):
+        return os.path.join(self.directory, f'{profile_id}.json')
+
+    def _ids(self):
+        if not os.path.isdir(self.directory):
+            return []
+        names = (name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+        return sorted((name for name in names if PROFILE_ID_PATTERN.match(name)), reverse=True)
+
+    def save(self, report):
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f'{datetime.utcnow():%Y%m%dT%H%M%S%f}-{secrets.token_hex(3)}'
+        temp_path = self._path(profile_id) + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump({'id': profile_id, **report}, handle)
+        os.replace(temp_path, self._path(profile_id))
+        for stale_id in self._ids()[self.size:]:
+            try:
+                os.remove(self._path(stale_id))
+            except FileNotFoundError:
+                pass
+        return profile_id
+
+    def load(self, profile_id):
+        if not PROFILE_ID_PATTERN.match(profile_id or ''):
+            return None
+        try:
+            with open(self._path(profile_id), encoding='utf-8') as handle:
+                return json.load(handle)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def list(self):
+        """Berichte ohne cProfile-Text und SQL, neueste zuerst."""
+        summaries = []
+        for profile_id in self._ids():
+            report = self.load(profile_id)
+            if report is not None:
+                report.pop('stats', None)
+                report.pop('sql', None)
+                summaries.append(report)
+        return summaries
+
+
+def profiling_requested():
+    return request.args.get(PROFILE_QUERY_PARAM) == '1' or request.headers.get(PROFILE_HEADER) == '1'
+
+
+def get_profile_store(app):
+    return app.extensions.get('profile_store')
+
+
+def init_profiling(app):
+    """Registriert die Hooks; muss nach init_request_metrics aufgerufen werden."""
+    if not app.config.get('PROFILING_ENABLED', False):
+        return
+    from .utils import can_manage_agenda
+
+    directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, PROFILE_DIRNAME)
+    store = ProfileStore(directory, size=app.config.get('PROFILE_BUFFER_SIZE', 20))
+    app.extensions['profile_store'] = store
+
+    def start_profile():
+        if not profiling_requested() or 'user_id' not in session or not can_manage_agenda():
+            return
+        profile = RequestProfile()
+        if not profile.start():
+            app.logger.info('Skipping profile for %s, another request is being profiled.', request.path)
+            return
+        g.request_profile = profile
+
+    # Als erster before_request-Handler, damit auch tt-infra und Auth im Profil landen
+    app.before_request_funcs.setdefault(None, []).insert(0, start_profile)
+
+    @app.after_request
+    def store_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        profile.stop()
+        try:
+            profile_id = store.save(profile.report(response))
+        except OSError:
+            app.logger.exception('Could not store request profile.')
+            return response
+        response.headers[PROFILE_ID_HEADER] = profile_id
+        app.logger.info('Stored request profile %s for %s', profile_id, request.path)
+        return response
+
+    @app.teardown_request
+    def stop_profile(exc):
+        # Nach Exceptions läuft after_request nicht; Profiler und Listener trotzdem lösen
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile.stop()
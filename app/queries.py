@@ -0,0 +1,60 @@
+"""
+Ladestrategien pro View.
+
+Alle Beziehungen in app/models.py sind `lazy=True`. Was eine View davon
+braucht, lädt sie mit den Optionen aus diesem Modul vor: `joinedload` für
+das übergeordnete Objekt (Team-Prüfung, Überschriften), `selectinload` für
+Listen. Mit RAISE_ON_LAZY_LOAD (in den Tests aktiv) bekommt jede ORM-Abfrage
+zusätzlich `raiseload('*')`; jede nicht deklarierte Beziehung wirft dann,
+statt pro Zeile nachzuladen.
+"""
+from flask import abort, current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, configure_mappers, contains_eager, joinedload, raiseload, selectinload
+
+from .extensions import db
+from .models import Activity, ActivityInstance, TrainingInstance
+
+# Die `training`-Backrefs existieren erst nach der Mapper-Konfiguration
+configure_mappers()
+
+# Aktivität samt Training für die Team-Prüfung (Bearbeiten, Verschieben, Löschen)
+ACTIVITY_WITH_TRAINING = (joinedload(Activity.training),)
+# Termin samt Training (Team-Prüfung, Kopfzeile in training_instance_edit.html)
+INSTANCE_WITH_TRAINING = (joinedload(TrainingInstance.training),)
+# Instanz-Aktivität samt Termin und Training
+INSTANCE_ACTIVITY_WITH_TRAINING = (
+    joinedload(ActivityInstance.training_instance).joinedload(TrainingInstance.training),
+)
+# Termin mit seinen Aktivitäten (abgesagten Termin reaktivieren)
+INSTANCE_WITH_ACTIVITIES = (selectinload(TrainingInstance.activities),)
+# Angepasste Termine in all_trainings_table.html; die Abfrage joint Training bereits
+INSTANCE_LIST_JOINED_TRAINING = (contains_eager(TrainingInstance.training),)
+
+_listeners_installed = False
+
+
+def get_or_404(model, ident, options=()):
+    """Wie `db.get_or_404`, aber mit Ladeoptionen."""
+    obj = db.session.get(model, ident, options=options)
+    if obj is None:
+        abort(404)
+    return obj
+
+
+def _raise_on_lazy_load(execute_state):
+    if not execute_state.is_select or execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    if not execute_state.all_mappers:
+        return
+    if not (has_app_context() and current_app.config.get('RAISE_ON_LAZY_LOAD')):
+        return
+    # Explizite Optionen der View haben Vorrang vor dem Wildcard
+    execute_state.statement = execute_state.statement.options(raiseload('*'))
+
+
+def init_query_guards(app):
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Session, 'do_orm_execute', _raise_on_lazy_load)
+        _listeners_installed = True
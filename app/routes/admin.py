@@ -4,9 +4,22 @@ import json
 import os
 import sqlite3
 import tempfile
+from sqlalchemy.exc import SQLAlchemyError
 from ..models import Training, Activity, TrainingInstance, ActivityInstance, ActivityType
 from ..extensions import db
-from ..utils import admin_required, WEEKDAYS, POSITION_GROUPS, get_active_team_code, get_activity_behavior, get_activity_color, recalculate_times, recalculate_instance_times
+from ..utils import admin_required, WEEKDAYS, get_active_team_code, get_position_groups, get_activity_behavior, get_activity_color, recalculate_times, recalculate_instance_times
+from ..profiling import PROFILE_QUERY_PARAM, get_profile_store
+from ..data_version import advance_data_versions, get_data_version, read_data_versions
+from ..fragment_cache import cached_fragment, get_fragment_cache
+from ..single_flight import get_single_flight
+from ..queries import (
+    ACTIVITY_WITH_TRAINING,
+    INSTANCE_ACTIVITY_WITH_TRAINING,
+    INSTANCE_LIST_JOINED_TRAINING,
+    INSTANCE_WITH_ACTIVITIES,
+    INSTANCE_WITH_TRAINING,
+    get_or_404,
+)
 from ..forms import validate_training_form, validate_hidden_training_form, sanitize_color
 
 bp = Blueprint('admin', __name__)
@@ -56,17 +69,86 @@ def _team_scoped_training_or_404(training_id):
 
 
 def _team_scoped_instance_or_404(instance_id):
-    instance = db.get_or_404(TrainingInstance, instance_id)
+    instance = get_or_404(TrainingInstance, instance_id, INSTANCE_WITH_TRAINING)
     if instance.training.team_code != get_active_team_code():
         abort(404)
     return instance
 
+
+def _team_scoped_activity_or_404(activity_id):
+    activity = get_or_404(Activity, activity_id, ACTIVITY_WITH_TRAINING)
+    if activity.training.team_code != get_active_team_code():
+        abort(404)
+    return activity
+
+
+def _team_scoped_instance_activity_or_404(activity_id):
+    activity = get_or_404(ActivityInstance, activity_id, INSTANCE_ACTIVITY_WITH_TRAINING)
+    if activity.training_instance.training.team_code != get_active_team_code():
+        abort(404)
+    return activity
+
 @bp.route('/admin')
 @admin_required
 def admin_overview():
     """Redirect zur Trainings-Verwaltung (alte Overview-Seite wurde entfernt)"""
     return redirect(url_for('admin.admin_trainings'))
 
+def _all_trainings_table(q, type_filter, include_ended):
+    """Gerenderte Trainings-Tabelle und Anzahl der Einträge, gecacht pro Team und Datenstand."""
+    team_code = get_active_team_code()
+    today = date.today()
+    key = (
+        'admin_trainings_table',
+        team_code,
+        q,
+        type_filter,
+        include_ended,
+        today.isoformat(),
+        get_data_version(team_code).token,
+    )
+
+    def render(csrf_token):
+        # Templates - sortiert nach start_date absteigend (neueste zuerst)
+        trainings_query = _scoped_training_query(is_hidden=False)
+        if q:
+            trainings_query = trainings_query.filter(Training.name.ilike(f"%{q}%"))
+        if not include_ended:
+            trainings_query = trainings_query.filter(Training.end_date >= today)
+        trainings = trainings_query.order_by(Training.start_date.desc()).all() if type_filter in ['all', 'template'] else []
+
+        # Einmalig - sortiert nach start_date absteigend (neueste zuerst)
+        hidden_query = _scoped_training_query(is_hidden=True)
+        if q:
+            hidden_query = hidden_query.filter(Training.name.ilike(f"%{q}%"))
+        if not include_ended:
+            hidden_query = hidden_query.filter(Training.start_date >= today)
+        hidden_trainings = hidden_query.order_by(Training.start_date.desc()).all() if type_filter in ['all', 'hidden'] else []
+
+        # Angepasst - sortiert nach date absteigend (neueste zuerst)
+        instances_query = (
+            TrainingInstance.query.join(Training)
+            .filter(Training.team_code == team_code)
+            .options(*INSTANCE_LIST_JOINED_TRAINING)
+        )
+        if q:
+            instances_query = instances_query.filter(Training.name.ilike(f"%{q}%"))
+        if not include_ended:
+            instances_query = instances_query.filter(TrainingInstance.date >= today)
+        instances = instances_query.order_by(TrainingInstance.date.desc()).all() if type_filter in ['all', 'instance'] else []
+
+        html = render_template('includes/all_trainings_table.html',
+                               trainings=trainings,
+                               hidden_trainings=hidden_trainings,
+                               instances=instances,
+                               weekdays=WEEKDAYS,
+                               date=date,
+                               csrf_token=csrf_token)
+        return html, len(trainings) + len(hidden_trainings) + len(instances)
+
+    return cached_fragment(key, render)
+
+
 @bp.route('/admin/trainings')
 @admin_required
 def admin_trainings():
@@ -74,38 +156,10 @@ def admin_trainings():
     q = request.args.get('q', '').strip()
     type_filter = request.args.get('type', 'all')
     include_ended = request.args.get('include_ended') == '1'
-    today = date.today()
-    
-    # Templates - sortiert nach start_date absteigend (neueste zuerst)
-    trainings_query = _scoped_training_query(is_hidden=False)
-    if q:
-        trainings_query = trainings_query.filter(Training.name.ilike(f"%{q}%"))
-    if not include_ended:
-        trainings_query = trainings_query.filter(Training.end_date >= today)
-    trainings = trainings_query.order_by(Training.start_date.desc()).all() if type_filter in ['all', 'template'] else []
-    
-    # Einmalig - sortiert nach start_date absteigend (neueste zuerst)
-    hidden_query = _scoped_training_query(is_hidden=True)
-    if q:
-        hidden_query = hidden_query.filter(Training.name.ilike(f"%{q}%"))
-    if not include_ended:
-        hidden_query = hidden_query.filter(Training.start_date >= today)
-    hidden_trainings = hidden_query.order_by(Training.start_date.desc()).all() if type_filter in ['all', 'hidden'] else []
-    
-    # Angepasst - sortiert nach date absteigend (neueste zuerst)
-    instances_query = TrainingInstance.query.join(Training).filter(Training.team_code == get_active_team_code())
-    if q:
-        instances_query = instances_query.filter(Training.name.ilike(f"%{q}%"))
-    if not include_ended:
-        instances_query = instances_query.filter(TrainingInstance.date >= today)
-    instances = instances_query.order_by(TrainingInstance.date.desc()).all() if type_filter in ['all', 'instance'] else []
-    
-    return render_template('admin_trainings.html', 
-                         trainings=trainings,
-                         hidden_trainings=hidden_trainings,
-                         instances=instances,
-                         weekdays=WEEKDAYS,
-                         date=date)
+    trainings_table, trainings_count = _all_trainings_table(q, type_filter, include_ended)
+    return render_template('admin_trainings.html',
+                         trainings_table=trainings_table,
+                         trainings_count=trainings_count)
 
 @bp.route('/admin/trainings/partial')
 @admin_required
@@ -114,35 +168,8 @@ def trainings_partial():
     q = request.args.get('q', '').strip()
     type_filter = request.args.get('type', 'all')
     include_ended = request.args.get('include_ended') == '1'
-    today = date.today()
-    
-    trainings_query = _scoped_training_query(is_hidden=False)
-    if q:
-        trainings_query = trainings_query.filter(Training.name.ilike(f"%{q}%"))
-    if not include_ended:
-        trainings_query = trainings_query.filter(Training.end_date >= today)
-    trainings = trainings_query.order_by(Training.start_date.desc()).all() if type_filter in ['all', 'template'] else []
-    
-    hidden_query = _scoped_training_query(is_hidden=True)
-    if q:
-        hidden_query = hidden_query.filter(Training.name.ilike(f"%{q}%"))
-    if not include_ended:
-        hidden_query = hidden_query.filter(Training.start_date >= today)
-    hidden_trainings = hidden_query.order_by(Training.start_date.desc()).all() if type_filter in ['all', 'hidden'] else []
-    
-    instances_query = TrainingInstance.query.join(Training).filter(Training.team_code == get_active_team_code())
-    if q:
-        instances_query = instances_query.filter(Training.name.ilike(f"%{q}%"))
-    if not include_ended:
-        instances_query = instances_query.filter(TrainingInstance.date >= today)
-    instances = instances_query.order_by(TrainingInstance.date.desc()).all() if type_filter in ['all', 'instance'] else []
-    
-    return render_template('includes/all_trainings_table.html', 
-                         trainings=trainings,
-                         hidden_trainings=hidden_trainings,
-                         instances=instances,
-                         weekdays=WEEKDAYS,
-                         date=date)
+    trainings_table, _count = _all_trainings_table(q, type_filter, include_ended)
+    return trainings_table
 
 @bp.route('/admin/activity-types', methods=['GET', 'POST'])
 @admin_required
@@ -246,6 +273,28 @@ def delete_hidden_training(id):
     flash('Einmaliges Training gelöscht!', 'success')
     return redirect(url_for('admin.admin_trainings'))
 
+@bp.route('/admin/perf', methods=['GET'])
+@admin_required
+def admin_perf():
+    """Gespeicherte Request-Profile (Ringpuffer, neueste zuerst)"""
+    store = get_profile_store(current_app)
+    return render_template(
+        'admin_perf.html',
+        profiling_enabled=store is not None,
+        profiles=store.list() if store else [],
+        profile_param=PROFILE_QUERY_PARAM,
+    )
+
+@bp.route('/admin/perf/<profile_id>', methods=['GET'])
+@admin_required
+def admin_perf_profile(profile_id):
+    """Einzelnes Request-Profil mit cProfile-Ausgabe und SQL-Statements"""
+    store = get_profile_store(current_app)
+    report = store.load(profile_id) if store else None
+    if report is None:
+        abort(404)
+    return render_template('admin_perf_profile.html', report=report)
+
 @bp.route('/admin/backup/download', methods=['GET'])
 @admin_required
 def admin_backup_download():
@@ -311,6 +360,8 @@ def admin_backup_restore():
         flash('Backup-Datei ist ungültig oder beschädigt.', 'danger')
         return redirect(url_for('admin.admin_backup'))
 
+    # Versionen vor dem Tausch merken; der Restore darf keine alten Tokens wiederholen
+    live_versions = read_data_versions()
     if os.path.exists(db_path):
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_old = f"{db_path}.{timestamp}.bak"
@@ -319,6 +370,12 @@ def admin_backup_restore():
     os.replace(temp_file.name, db_path)
     db.session.close()
     db.engine.dispose()
+    get_fragment_cache().clear()
+    get_single_flight().clear()
+    try:
+        advance_data_versions(live_versions)
+    except SQLAlchemyError:
+        current_app.logger.warning('Could not advance data versions after restore.')
 
     flash('Backup erfolgreich wiederhergestellt. Bitte Anwendung neu starten.', 'success')
     return redirect(url_for('admin.admin_backup'))
@@ -361,7 +418,7 @@ def edit_training(id):
                     flash(msg, 'danger')
             activities = Activity.query.filter_by(training_id=id).order_by(Activity.order_index).all()
             instances = TrainingInstance.query.filter_by(training_id=id).order_by(TrainingInstance.date.asc()).all()
-            return render_template('training_edit.html', training=training, activities=activities, instances=instances, activities_json=json.dumps([]), weekdays=WEEKDAYS, position_groups=POSITION_GROUPS)
+            return render_template('training_edit.html', training=training, activities=activities, instances=instances, activities_json=json.dumps([]), weekdays=WEEKDAYS, position_groups=get_position_groups())
         old_start_time = training.start_time
         new_start_time = datetime.strptime(request.form['start_time'], '%H:%M').time()
         
@@ -390,7 +447,7 @@ def edit_training(id):
         'topics_json': a.topics_json,
         'color': a.color if hasattr(a, 'color') and a.color else get_activity_color(a.activity_type, 'light')
     } for a in activities]
-    return render_template('training_edit.html', training=training, activities=activities, instances=instances, activities_json=json.dumps(activities_json), weekdays=WEEKDAYS, position_groups=POSITION_GROUPS)
+    return render_template('training_edit.html', training=training, activities=activities, instances=instances, activities_json=json.dumps(activities_json), weekdays=WEEKDAYS, position_groups=get_position_groups())
 
 def _parse_instance_date(training):
     date_str = request.form.get('date')
@@ -427,7 +484,7 @@ def create_training_instance(id):
     if not instance_date:
         return redirect(training_edit_url(training))
 
-    existing = TrainingInstance.query.filter_by(training_id=id, date=instance_date).first()
+    existing = TrainingInstance.query.filter_by(training_id=id, date=instance_date).options(*INSTANCE_WITH_ACTIVITIES).first()
     if existing:
         if existing.status == 'cancelled':
             existing.status = 'active'
@@ -519,7 +576,7 @@ def delete_training_instance(id):
 def edit_training_instance(id):
     instance = _team_scoped_instance_or_404(id)
     activities = ActivityInstance.query.filter_by(training_instance_id=id).order_by(ActivityInstance.order_index).all()
-    return render_template('training_instance_edit.html', training=instance.training, instance=instance, activities=activities, weekdays=WEEKDAYS, position_groups=POSITION_GROUPS)
+    return render_template('training_instance_edit.html', training=instance.training, instance=instance, activities=activities, weekdays=WEEKDAYS, position_groups=get_position_groups())
 
 @bp.route('/training/instance/<int:instance_id>/activity/add', methods=['GET', 'POST'])
 @admin_required
@@ -550,18 +607,18 @@ def add_instance_activity(instance_id):
 
         behavior = get_activity_behavior(activity_type)
         if behavior == 'team':
-            position_groups = POSITION_GROUPS
+            position_groups = list(get_position_groups())
             topic = request.form.get('topic', '')
         elif behavior == 'individual':
-            position_groups = POSITION_GROUPS
+            position_groups = list(get_position_groups())
             mode = request.form.get('individual_mode', 'same')
             topics_per_group = {}
             if mode == 'same':
                 common_topic = request.form.get('individual_common_topic', '')
-                for group in POSITION_GROUPS:
+                for group in get_position_groups():
                     topics_per_group[group] = common_topic
             else:
-                for group in POSITION_GROUPS:
+                for group in get_position_groups():
                     topics_per_group[group] = request.form.get(f'individual_topic_{group}', '')
             topics_json = topics_per_group
             topic = None
@@ -612,16 +669,14 @@ def add_instance_activity(instance_id):
         flash('Aktivität erfolgreich hinzugefügt!', 'success')
         return redirect(url_for('admin.edit_training_instance', id=instance_id))
 
-    return render_template('activity_form.html', training=instance.training, instance=instance, activity=None, position_groups=POSITION_GROUPS, individual_mode_same=True, individual_common_topic='', individual_topics={})
+    return render_template('activity_form.html', training=instance.training, instance=instance, activity=None, position_groups=get_position_groups(), individual_mode_same=True, individual_common_topic='', individual_topics={})
 
 @bp.route('/training/instance/activity/<int:id>/edit', methods=['GET', 'POST'])
 @admin_required
 def edit_instance_activity(id):
-    activity = db.get_or_404(ActivityInstance, id)
+    activity = _team_scoped_instance_activity_or_404(id)
     instance = activity.training_instance
     training = instance.training
-    if training.team_code != get_active_team_code():
-        abort(404)
 
     individual_mode_same = True
     individual_common_topic = ''
@@ -645,18 +700,18 @@ def edit_instance_activity(id):
 
         behavior = get_activity_behavior(activity_type)
         if behavior == 'team':
-            position_groups = POSITION_GROUPS
+            position_groups = list(get_position_groups())
             activity.topic = request.form.get('topic', '')
         elif behavior == 'individual':
-            position_groups = POSITION_GROUPS
+            position_groups = list(get_position_groups())
             mode = request.form.get('individual_mode', 'same')
             topics_per_group = {}
             if mode == 'same':
                 common_topic = request.form.get('individual_common_topic', '')
-                for group in POSITION_GROUPS:
+                for group in get_position_groups():
                     topics_per_group[group] = common_topic
             else:
-                for group in POSITION_GROUPS:
+                for group in get_position_groups():
                     topics_per_group[group] = request.form.get(f'individual_topic_{group}', '')
             topics_json = topics_per_group
             activity.topic = None
@@ -701,14 +756,12 @@ def edit_instance_activity(id):
         flash('Aktivität erfolgreich aktualisiert!', 'success')
         return redirect(url_for('admin.edit_training_instance', id=instance.id))
 
-    return render_template('activity_form.html', training=training, instance=instance, activity=activity, position_groups=POSITION_GROUPS, individual_mode_same=individual_mode_same, individual_common_topic=individual_common_topic, individual_topics=individual_topics)
+    return render_template('activity_form.html', training=training, instance=instance, activity=activity, position_groups=get_position_groups(), individual_mode_same=individual_mode_same, individual_common_topic=individual_common_topic, individual_topics=individual_topics)
 
 @bp.route('/training/instance/activity/<int:id>/delete', methods=['POST'])
 @admin_required
 def delete_instance_activity(id):
-    activity = db.get_or_404(ActivityInstance, id)
-    if activity.training_instance.training.team_code != get_active_team_code():
-        abort(404)
+    activity = _team_scoped_instance_activity_or_404(id)
     instance_id = activity.training_instance_id
 
     db.session.delete(activity)
@@ -722,9 +775,7 @@ def delete_instance_activity(id):
 @bp.route('/training/instance/activity/<int:id>/move_up', methods=['POST'])
 @admin_required
 def move_instance_activity_up(id):
-    activity = db.get_or_404(ActivityInstance, id)
-    if activity.training_instance.training.team_code != get_active_team_code():
-        abort(404)
+    activity = _team_scoped_instance_activity_or_404(id)
     instance_id = activity.training_instance_id
 
     prev_activity = ActivityInstance.query.filter(
@@ -748,9 +799,7 @@ def move_instance_activity_up(id):
 @bp.route('/training/instance/activity/<int:id>/move_down', methods=['POST'])
 @admin_required
 def move_instance_activity_down(id):
-    activity = db.get_or_404(ActivityInstance, id)
-    if activity.training_instance.training.team_code != get_active_team_code():
-        abort(404)
+    activity = _team_scoped_instance_activity_or_404(id)
     instance_id = activity.training_instance_id
 
     next_activity = ActivityInstance.query.filter(
@@ -886,8 +935,9 @@ def copy_training_instance(id):
         )
         db.session.add(new_activity)
     
+    training_name = original_instance.training.name
     db.session.commit()
-    flash(f'Angepasster Termin für "{original_instance.training.name}" wurde erfolgreich auf {next_date.strftime("%d.%m.%Y")} kopiert!', 'success')
+    flash(f'Angepasster Termin für "{training_name}" wurde erfolgreich auf {next_date.strftime("%d.%m.%Y")} kopiert!', 'success')
     return redirect(url_for('admin.admin_trainings'))
 
 @bp.route('/activity/add', methods=['GET', 'POST'])
@@ -930,18 +980,18 @@ def add_activity():
         
         behavior = get_activity_behavior(activity_type)
         if behavior == 'team':
-            position_groups = POSITION_GROUPS
+            position_groups = list(get_position_groups())
             topic = request.form.get('topic', '')
         elif behavior == 'individual':
-            position_groups = POSITION_GROUPS
+            position_groups = list(get_position_groups())
             mode = request.form.get('individual_mode', 'same')
             topics_per_group = {}
             if mode == 'same':
                 common_topic = request.form.get('individual_common_topic', '')
-                for group in POSITION_GROUPS:
+                for group in get_position_groups():
                     topics_per_group[group] = common_topic
             else:
-                for group in POSITION_GROUPS:
+                for group in get_position_groups():
                     topics_per_group[group] = request.form.get(f'individual_topic_{group}', '')
             topics_json = topics_per_group
             topic = None
@@ -992,15 +1042,13 @@ def add_activity():
         flash('Aktivität erfolgreich hinzugefügt!', 'success')
         return redirect(training_edit_url(training))
     
-    return render_template('activity_form.html', training=training, training_edit_url=training_edit_url(training), activity=None, position_groups=POSITION_GROUPS, individual_mode_same=True, individual_common_topic='', individual_topics={})
+    return render_template('activity_form.html', training=training, training_edit_url=training_edit_url(training), activity=None, position_groups=get_position_groups(), individual_mode_same=True, individual_common_topic='', individual_topics={})
 
 @bp.route('/activity/<int:id>/edit', methods=['GET', 'POST'])
 @admin_required
 def edit_activity(id):
-    activity = db.get_or_404(Activity, id)
+    activity = _team_scoped_activity_or_404(id)
     training = activity.training
-    if training.team_code != get_active_team_code():
-        abort(404)
     
     individual_mode_same = True
     individual_common_topic = ''
@@ -1024,18 +1072,18 @@ def edit_activity(id):
         
         behavior = get_activity_behavior(activity_type)
         if behavior == 'team':
-            position_groups = POSITION_GROUPS
+            position_groups = list(get_position_groups())
             activity.topic = request.form.get('topic', '')
         elif behavior == 'individual':
-            position_groups = POSITION_GROUPS
+            position_groups = list(get_position_groups())
             mode = request.form.get('individual_mode', 'same')
             topics_per_group = {}
             if mode == 'same':
                 common_topic = request.form.get('individual_common_topic', '')
-                for group in POSITION_GROUPS:
+                for group in get_position_groups():
                     topics_per_group[group] = common_topic
             else:
-                for group in POSITION_GROUPS:
+                for group in get_position_groups():
                     topics_per_group[group] = request.form.get(f'individual_topic_{group}', '')
             topics_json = topics_per_group
             activity.topic = None
@@ -1080,14 +1128,12 @@ def edit_activity(id):
         flash('Aktivität erfolgreich aktualisiert!', 'success')
         return redirect(training_edit_url(training))
     
-    return render_template('activity_form.html', training=training, training_edit_url=training_edit_url(training), activity=activity, position_groups=POSITION_GROUPS, individual_mode_same=individual_mode_same, individual_common_topic=individual_common_topic, individual_topics=individual_topics)
+    return render_template('activity_form.html', training=training, training_edit_url=training_edit_url(training), activity=activity, position_groups=get_position_groups(), individual_mode_same=individual_mode_same, individual_common_topic=individual_common_topic, individual_topics=individual_topics)
 
 @bp.route('/activity/<int:id>/update', methods=['POST'])
 @admin_required
 def update_activity(id):
-    activity = db.get_or_404(Activity, id)
-    if activity.training.team_code != get_active_team_code():
-        abort(404)
+    activity = _team_scoped_activity_or_404(id)
     data = request.json
 
     activity.activity_type = data['activity_type']
@@ -1131,9 +1177,7 @@ def reorder_activities():
 @bp.route('/activity/<int:id>/delete', methods=['POST'])
 @admin_required
 def delete_activity(id):
-    activity = db.get_or_404(Activity, id)
-    if activity.training.team_code != get_active_team_code():
-        abort(404)
+    activity = _team_scoped_activity_or_404(id)
     training_id = activity.training_id
     training = activity.training  # Referenz vor dem Löschen sichern
 
@@ -1150,9 +1194,8 @@ def delete_activity(id):
 @bp.route('/activity/<int:id>/move_up', methods=['POST'])
 @admin_required
 def move_activity_up(id):
-    activity = db.get_or_404(Activity, id)
-    if activity.training.team_code != get_active_team_code():
-        abort(404)
+    activity = _team_scoped_activity_or_404(id)
+    training = activity.training
     training_id = activity.training_id
     
     # Finde die Aktivität, die direkt vor der aktuellen liegt (höchster order_index kleiner als aktueller)
@@ -1174,14 +1217,13 @@ def move_activity_up(id):
             act.order_index = i
         db.session.commit()
     
-    return redirect(training_edit_url(activity.training))
+    return redirect(training_edit_url(training))
 
 @bp.route('/activity/<int:id>/move_down', methods=['POST'])
 @admin_required
 def move_activity_down(id):
-    activity = db.get_or_404(Activity, id)
-    if activity.training.team_code != get_active_team_code():
-        abort(404)
+    activity = _team_scoped_activity_or_404(id)
+    training = activity.training
     training_id = activity.training_id
     
     # Finde die Aktivität, die direkt nach der aktuellen liegt (kleinster order_index größer als aktueller)
@@ -1203,4 +1245,4 @@ def move_activity_down(id):
             act.order_index = i
         db.session.commit()
     
-    return redirect(training_edit_url(activity.training))
+    return redirect(training_edit_url(training))
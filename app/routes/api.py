@@ -1,13 +1,16 @@
-from datetime import datetime, timezone
-
 from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy.exc import IntegrityError
 
+from ..authz import normalize_auth_payload
 from ..extensions import db
-from ..models import User, Training, Activity, TrainingInstance, ActivityInstance
-from ..utils import get_upcoming_trainings
+from ..models import User
+from ..utils import get_or_create_sso_user, get_upcoming_occurrences
+from ..webhooks import get_dispatcher
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
+MAX_USER_SYNC_BATCH = 500
+
 
 def _authorized():
     expected = current_app.config.get('INTERNAL_API_SECRET')
@@ -26,49 +29,6 @@ def _parse_team_codes(raw_value):
     return team_codes
 
 
-def _load_upcoming_trainings(team_codes=None):
-    trainings_query = Training.query
-    if team_codes:
-        trainings_query = trainings_query.filter(Training.team_code.in_(team_codes))
-
-    trainings = trainings_query.all()
-    training_ids = [training.id for training in trainings]
-
-    activities_by_training = {training.id: [] for training in trainings}
-    if training_ids:
-        for activity in (
-            Activity.query
-            .filter(Activity.training_id.in_(training_ids))
-            .order_by(Activity.training_id, Activity.order_index)
-            .all()
-        ):
-            activities_by_training[activity.training_id].append(activity)
-
-    instances_by_key = {}
-    instance_activities_by_id = {}
-    if training_ids:
-        instances = TrainingInstance.query.filter(TrainingInstance.training_id.in_(training_ids)).all()
-        instance_ids = [instance.id for instance in instances]
-        instances_by_key = {(instance.training_id, instance.date): instance for instance in instances}
-        if instance_ids:
-            for activity in (
-                ActivityInstance.query
-                .filter(ActivityInstance.training_instance_id.in_(instance_ids))
-                .order_by(ActivityInstance.training_instance_id, ActivityInstance.order_index)
-                .all()
-            ):
-                instance_activities_by_id.setdefault(activity.training_instance_id, []).append(activity)
-
-    upcoming = get_upcoming_trainings(
-        trainings,
-        activities_by_training,
-        instances_by_key,
-        instance_activities_by_id,
-        datetime.now(timezone.utc),
-    )
-    return upcoming
-
-
 def _serialize_training(item):
     training = item['training']
     date = item.get('date')
@@ -101,7 +61,7 @@ def trainings():
         return jsonify({'error': 'unauthorized'}), 401
 
     team_codes = _parse_team_codes(request.args.get('teams'))
-    upcoming = _load_upcoming_trainings(team_codes or None)
+    upcoming = get_upcoming_occurrences(team_codes or None)
     return jsonify({
         'trainings': [_serialize_training(item) for item in upcoming],
         'teams': team_codes,
@@ -114,7 +74,7 @@ def training_detail(occurrence_id):
         return jsonify({'error': 'unauthorized'}), 401
 
     team_codes = _parse_team_codes(request.args.get('teams'))
-    upcoming = _load_upcoming_trainings(team_codes or None)
+    upcoming = get_upcoming_occurrences(team_codes or None)
     for item in upcoming:
         payload = _serialize_training(item)
         if payload['id'] == occurrence_id:
@@ -135,3 +95,69 @@ def delete_user(auth_user_id):
     db.session.delete(user)
     db.session.commit()
     return jsonify({'status': 'deleted', 'auth_user_id': auth_user_id}), 200
+
+
+@bp.route('/internal/users/sync', methods=['POST'])
+def sync_users():
+    """Bulk-Provisionierung durch tt-auth, damit SSO-Logins nur noch lesen.
+
+    Erwartet {"users": [<claims>, ...]} im Format der SSO-Token-Claims.
+    """
+    if not _authorized():
+        return jsonify({'error': 'unauthorized'}), 401
+
+    payload = request.get_json(silent=True) or {}
+    entries = payload.get('users')
+    if not isinstance(entries, list):
+        return jsonify({'error': 'users must be a list'}), 400
+    if len(entries) > MAX_USER_SYNC_BATCH:
+        return jsonify({'error': 'batch_too_large', 'max': MAX_USER_SYNC_BATCH}), 413
+
+    auto_provision = current_app.config.get('SSO_AUTO_PROVISION_USERS', True)
+    sync_role = current_app.config.get('SSO_SYNC_ROLE', True)
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+    errors = []
+    for index, entry in enumerate(entries):
+        claims = normalize_auth_payload(entry if isinstance(entry, dict) else {})['claims']
+        try:
+            int(claims.get('sub'))
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'invalid_sub'})
+            continue
+        if not (claims.get('username') or '').strip():
+            errors.append({'index': index, 'error': 'missing_username'})
+            continue
+
+        try:
+            # Savepoint pro Eintrag: ein Konflikt (z. B. vergebener Benutzername)
+            # verwirft nur diesen Eintrag. Der Flush beim Verlassen macht neue
+            # Benutzer für spätere Einträge sichtbar.
+            with db.session.begin_nested():
+                user, created = get_or_create_sso_user(claims, auto_provision)
+                changed = False
+                if user and sync_role:
+                    changed = user.sync_from_sso_claims(claims)
+        except IntegrityError:
+            errors.append({'index': index, 'error': 'conflict'})
+            continue
+        if not user:
+            counts['skipped'] += 1
+            continue
+        if created:
+            counts['created'] += 1
+        elif changed:
+            counts['updated'] += 1
+        else:
+            counts['unchanged'] += 1
+
+    if counts['created'] or counts['updated']:
+        db.session.commit()
+    return jsonify({'status': 'ok', **counts, 'errors': errors}), 200
+
+
+@bp.route('/internal/webhooks/stats', methods=['GET'])
+def webhook_stats():
+    if not _authorized():
+        return jsonify({'error': 'unauthorized'}), 401
+
+    return jsonify(get_dispatcher(current_app).stats())
@@ -1,12 +1,11 @@
-import secrets
 from urllib.parse import urlencode, urljoin, urlparse
 
 import jwt
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
 from ..authz import normalize_auth_payload
-from ..models import User
+from ..sessions import regenerate_session
+from ..utils import get_auth_context, get_or_create_sso_user, reset_auth_context
 from ..extensions import limiter, db
-from werkzeug.security import generate_password_hash
 import logging
 
 bp = Blueprint('auth', __name__)
@@ -75,27 +74,22 @@ def sso_login():
     auth = normalize_auth_payload(payload)
     claims = auth['claims']
     username = (claims.get('username') or '').strip()
-    role = auth['service_role']
 
     if not username:
         flash('SSO-Token enthält keinen Benutzernamen.', 'danger')
         return redirect(url_for('auth.login'))
 
-    auth_user_id = int(claims['sub'])
-    user = User.query.filter_by(auth_user_id=auth_user_id).first()
+    user, changed = get_or_create_sso_user(claims, current_app.config.get('SSO_AUTO_PROVISION_USERS', True))
     if not user:
-        user = User.query.filter_by(username=username).first()
-    if not user:
-        if not current_app.config.get('SSO_AUTO_PROVISION_USERS', True):
-            flash('SSO-Benutzer ist nicht freigeschaltet.', 'danger')
-            return redirect(url_for('auth.login'))
-        user = User(username=username, role=role)
-        user.password_hash = generate_password_hash(secrets.token_hex(32))
-        db.session.add(user)
+        flash('SSO-Benutzer ist nicht freigeschaltet.', 'danger')
+        return redirect(url_for('auth.login'))
     if current_app.config.get('SSO_SYNC_ROLE', True):
-        user.sync_from_sso_claims(claims)
-    db.session.commit()
+        # Unveränderte Claims lösen keinen Schreibzugriff aus
+        changed = user.sync_from_sso_claims(claims) or changed
+    if changed:
+        db.session.commit()
 
+    regenerate_session(session)
     session['user_id'] = user.id
     session['auth_user_id'] = user.auth_user_id
     session['username'] = user.username
@@ -106,6 +100,7 @@ def sso_login():
     session['memberships'] = user.memberships_json or []
     session['permissions'] = user.permissions_json or []
     session['claims_json'] = user.claims_json or {}
+    reset_auth_context()
 
     memberships = session.get('memberships') or []
     available_codes = sorted({
@@ -138,17 +133,9 @@ def switch_team():
 
     target = (request.form.get('team_code') or '').strip().upper()
     next_url = (request.form.get('next') or '').strip()
-    memberships = session.get('memberships') or []
-    allowed = {
-        (membership.get('team_code') or '').strip().upper()
-        for membership in memberships
-        if (membership.get('team_code') or '').strip()
-    }
-    if not allowed:
-        allowed = {'SENIORS'}
-
-    if target and target in allowed:
+    if target and target in get_auth_context().team_names:
         session['active_team_code'] = target
+        reset_auth_context()
     else:
         flash('Ungültige Mannschaftsauswahl.', 'warning')
 
@@ -1,20 +1,96 @@
-from flask import Blueprint, render_template, request, session, current_app
+from flask import Blueprint, abort, jsonify, make_response, render_template, request, session, current_app, url_for
+from flask.globals import request_ctx
 from datetime import datetime
-from ..models import Training, Activity, TrainingInstance, ActivityInstance
-from ..extensions import db
-from ..utils import login_required, get_active_team_code, get_current_training_status, get_upcoming_trainings, get_timeline_from_activities, load_training_data, WEEKDAYS, POSITION_GROUPS
+from ..webhooks import get_dispatcher
+from ..assets import get_asset_manifest, static_url
+from ..calendar_feed import calendar_response, calendar_token, verify_calendar_token
+from ..utils import login_required, get_active_team_code, get_current_training_status, get_upcoming_occurrences, get_timeline_from_activities, load_training_rows, get_position_groups, WEEKDAYS
+import json
 import logging
-import requests
+import os
+
+from sqlalchemy.exc import SQLAlchemyError
 
 bp = Blueprint('main', __name__)
 logger = logging.getLogger(__name__)
 
+# Vom Service Worker bei der Installation geladen (gehashte URLs)
+SERVICE_WORKER_PRECACHE = ['manifest.json', 'tt-logo.png', 'tigers-logo.png', 'icons/icon-192x192.png']
+
 
 @bp.route('/health')
 def health():
     return {'status': 'ok'}, 200
 
 
+def _revalidatable(body, status=200):
+    """Antwort mit ETag; der Service Worker revalidiert damit seine Offline-Kopie (304)."""
+    response = make_response(body, status)
+    if status != 200:
+        return response
+    if request_ctx.flashes:
+        # Flash-Meldungen gehören nicht in die Offline-Kopie
+        response.cache_control.no_store = True
+        return response
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@bp.route('/service-worker.js')
+def service_worker():
+    # Aus dem Root ausgeliefert, damit der Scope die ganze App umfasst
+    manifest = get_asset_manifest()
+    with open(os.path.join(current_app.static_folder, 'service-worker.js'), encoding='utf-8') as handle:
+        script = handle.read()
+    script = script.replace("'__ASSET_VERSION__'", json.dumps(manifest.version)).replace(
+        "['__PRECACHE_URLS__']", json.dumps([static_url(filename) for filename in SERVICE_WORKER_PRECACHE])
+    )
+    response = make_response(script)
+    response.mimetype = 'application/javascript'
+    response.headers['Service-Worker-Allowed'] = '/'
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@bp.route('/offline/agenda.json')
+@login_required
+def offline_agenda():
+    """Kommende Termine des aktiven Teams und die URLs, die der Service Worker offline vorhält."""
+    team_code = get_active_team_code()
+    now = datetime.now()
+    upcoming = get_upcoming_occurrences([team_code], now)
+    limit = current_app.config.get('OFFLINE_PREFETCH_OCCURRENCES', 5)
+    occurrences = []
+    for item in upcoming[:limit]:
+        occurrences.append({
+            'occurrence_id': item['occurrence_id'],
+            'training_id': item['template_id'],
+            'name': item['training'].name,
+            'date': item['date'].isoformat(),
+            'start_time': item['start_time'].strftime('%H:%M'),
+            'end_time': item['end_time'].strftime('%H:%M'),
+            'is_cancelled': item['is_cancelled'],
+            'live_url': url_for('main.live', training_id=item['template_id'], date=item['date'].isoformat()),
+        })
+    payload = {
+        'team_code': team_code,
+        'occurrences': occurrences,
+        'urls': [url_for('main.index'), url_for('main.live')] + [item['live_url'] for item in occurrences],
+    }
+    return _revalidatable(jsonify(payload))
+
+
+@bp.route('/calendar/<team_code>.ics')
+def calendar_feed(team_code):
+    """Abonnierbarer Kalender; Kalender-Apps authentifizieren sich über den Token in der URL."""
+    if not verify_calendar_token(team_code, request.args.get('token')):
+        abort(404)
+    return calendar_response(team_code)
+
+
 @bp.route('/')
 @login_required
 def index():
@@ -23,54 +99,29 @@ def index():
         if current_app.config.get('WEBHOOK_ENABLED', False) and 'webhook_sent' not in session:
             username = session.get('username', 'Unknown')
             try:
-                response = requests.post(
-                    current_app.config['WEBHOOK_URL'],
-                    json={
-                        "title": "Agenda Session Start",
-                        "message": f"Es hat sich gerade der Benutzer {username} in einer neuen Session angemeldet"
-                    },
-                    timeout=5
-                )
-                if response.status_code == 200:
-                    logger.info(f"Webhook sent successfully for user {username}: {response.status_code}")
-                else:
-                    logger.error(f"Webhook failed for user {username}: {response.status_code} - {response.text}")
-            except requests.RequestException as e:
-                logger.error(f"Webhook failed for user {username}: {str(e)}")
+                get_dispatcher(current_app).enqueue({
+                    "title": "Agenda Session Start",
+                    "message": f"Es hat sich gerade der Benutzer {username} in einer neuen Session angemeldet"
+                })
+            except SQLAlchemyError as e:
+                logger.error(f"Webhook could not be queued for user {username}: {str(e)}")
             # Flag setzen, um erneuten Aufruf in dieser Session zu verhindern
             session['webhook_sent'] = True
             session.permanent = True  # Sicherstellen, dass die Session permanent ist
 
         team_code = get_active_team_code()
-        trainings = Training.query.filter_by(team_code=team_code).all()
-        training_ids = [training.id for training in trainings]
-        activities_by_training = {training.id: [] for training in trainings}
-        if training_ids:
-            activities = Activity.query.filter(Activity.training_id.in_(training_ids)).order_by(Activity.training_id, Activity.order_index).all()
-            for activity in activities:
-                activities_by_training[activity.training_id].append(activity)
-
-        instances_by_key = {}
-        instance_activities_by_id = {}
-        if training_ids:
-            instances = TrainingInstance.query.filter(TrainingInstance.training_id.in_(training_ids)).all()
-            instance_ids = [instance.id for instance in instances]
-            instances_by_key = {(instance.training_id, instance.date): instance for instance in instances}
-            if instance_ids:
-                instance_activities = ActivityInstance.query.filter(ActivityInstance.training_instance_id.in_(instance_ids)).order_by(ActivityInstance.training_instance_id, ActivityInstance.order_index).all()
-                for activity in instance_activities:
-                    instance_activities_by_id.setdefault(activity.training_instance_id, []).append(activity)
+        trainings, activities_by_training, instances_by_key, instance_activities_by_id = load_training_rows(team_code=team_code)
 
         now = datetime.now()
         today = now.date()
 
-        upcoming_trainings = get_upcoming_trainings(trainings, activities_by_training, instances_by_key, instance_activities_by_id, now)
+        upcoming_trainings = get_upcoming_occurrences([team_code], now, data=(trainings, activities_by_training, instances_by_key, instance_activities_by_id))
         current_training, current_activity, next_activity, training_status, current_date, current_activities, _current_start_dt = get_current_training_status(trainings, activities_by_training, instances_by_key, instance_activities_by_id, now)
         
-        return render_template('index.html', 
+        return _revalidatable(render_template('index.html', 
                              trainings=trainings, 
                              weekdays=WEEKDAYS,
-                             position_groups=POSITION_GROUPS,
+                             position_groups=get_position_groups(),
                              upcoming_trainings=upcoming_trainings,
                              current_training=current_training,
                              current_activity=current_activity,
@@ -78,7 +129,8 @@ def index():
                              training_status=training_status,
                              display_activities=current_activities,
                              current_date=current_date,
-                             now=now)
+                             calendar_url=url_for('main.calendar_feed', team_code=team_code, token=calendar_token(team_code), _external=True),
+                             now=now))
     except Exception as e:
         logger.error(f"Error in index route: {str(e)}")
         return render_template('error.html'), 500
@@ -88,7 +140,7 @@ def index():
 def live():
     try:
         team_code = get_active_team_code()
-        trainings, activities_by_training, instances_by_key, instance_activities_by_id = load_training_data(team_code=team_code)
+        trainings, activities_by_training, instances_by_key, instance_activities_by_id = load_training_rows(team_code=team_code)
 
         now = datetime.now()
         today = now.date()
@@ -108,8 +160,9 @@ def live():
 
         display_activities = None
         if selected_training_id and selected_date:
-            training = db.get_or_404(Training, selected_training_id)
-            if training.team_code != team_code:
+            # Die Zeilen des Teams sind schon geladen; fremde Trainings sind darin nicht enthalten
+            training = next((row for row in trainings if row.id == selected_training_id), None)
+            if training is None:
                 return render_template('error.html'), 404
             if training.start_date <= selected_date <= training.end_date and training.weekday == selected_date.weekday():
                 instance = instances_by_key.get((training.id, selected_date))
@@ -138,29 +191,29 @@ def live():
                     elif now < start_dt:
                         training_status = 'upcoming'
                         next_activity = timeline[0][0]
-            return render_template('live.html', 
+            return _revalidatable(render_template('live.html', 
                                  weekdays=WEEKDAYS,
-                                 position_groups=POSITION_GROUPS,
+                                 position_groups=get_position_groups(),
                                  current_training=current_training,
                                  current_activity=current_activity,
                                  next_activity=next_activity,
                                  training_status=training_status,
                                  display_activities=display_activities,
                                  current_date=selected_date,
-                                 now=now)
+                                 now=now))
 
         current_training, current_activity, next_activity, training_status, current_date, current_activities, _current_start_dt = get_current_training_status(trainings, activities_by_training, instances_by_key, instance_activities_by_id, now)
 
-        return render_template('live.html', 
+        return _revalidatable(render_template('live.html', 
                              weekdays=WEEKDAYS,
-                             position_groups=POSITION_GROUPS,
+                             position_groups=get_position_groups(),
                              current_training=current_training,
                              current_activity=current_activity,
                              next_activity=next_activity,
                              training_status=training_status,
                              display_activities=current_activities,
                              current_date=current_date,
-                             now=now)
+                             now=now))
     except Exception as e:
         logger.error(f"Error in live route: {str(e)}")
         return render_template('error.html'), 500
@@ -0,0 +1,363 @@
+"""
+Schema-Prüfungen beim Start (AUTO_CREATE_DB).
+
+Bestehende Deployments ohne `flask db upgrade` werden über Kompatibilitäts-
+Shims nachgezogen. Damit nicht jeder Worker-Start die Datenbank inspiziert,
+wird nach erfolgreichem Durchlauf ein Fingerprint des erwarteten Schemas in
+`schema_state` gespeichert; stimmt er beim nächsten Start, genügt ein Read.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import hashlib
+import json
+import os
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from . import json_codec
+from .extensions import db
+from .models import ActivityType, JsonType, SchemaState
+from .utils import ACTIVITY_TYPE_DEFAULTS
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+SCHEMA_STATE_KEY = 'app'
+# Erhöhen, wenn sich die Shims ändern, ohne dass sich die Modelle ändern
+SCHEMA_SHIM_VERSION = 1
+# Beliebige, aber feste Kennung für pg_advisory_lock
+SCHEMA_ADVISORY_LOCK_ID = 74_163_026
+SCHEMA_LOCK_FILENAME = 'schema.lock'
+# Wie in der Migration a3d8f2c6e9b1: Postgres-Standardnamen, unter SQLite für unbenannte Constraints
+FOREIGN_KEY_NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def schema_fingerprint(engine):
+    """Hash über Modell-Metadaten, Shim-Version und Aktivitätstyp-Defaults."""
+    dialect = engine.dialect
+    parts = [f'shim:{SCHEMA_SHIM_VERSION}', f'dialect:{dialect.name}']
+    for table in db.metadata.sorted_tables:
+        parts.append(f'table:{table.name}')
+        for column in table.columns:
+            parts.append(f'column:{column.name}:{column.type.compile(dialect=dialect)}:{column.nullable}')
+        for index in sorted(table.indexes, key=lambda item: item.name):
+            parts.append(f'index:{index.name}:{",".join(column.name for column in index.columns)}:{index.unique}')
+        for foreign_key in sorted(table.foreign_keys, key=lambda item: item.parent.name):
+            parts.append(f'fk:{foreign_key.parent.name}:{foreign_key.target_fullname}:{foreign_key.ondelete}')
+    parts.append(json.dumps(ACTIVITY_TYPE_DEFAULTS, sort_keys=True))
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def read_schema_fingerprint(engine):
+    try:
+        with engine.connect() as connection:
+            return connection.execute(
+                text('SELECT fingerprint FROM schema_state WHERE key = :key'),
+                {'key': SCHEMA_STATE_KEY},
+            ).scalar()
+    except (OperationalError, ProgrammingError):
+        # Tabelle existiert noch nicht
+        return None
+
+
+def write_schema_fingerprint(fingerprint):
+    state = db.session.get(SchemaState, SCHEMA_STATE_KEY)
+    if state is None:
+        state = SchemaState(key=SCHEMA_STATE_KEY)
+        db.session.add(state)
+    state.fingerprint = fingerprint
+    state.updated_at = datetime.utcnow()
+    db.session.commit()
+
+
+@contextmanager
+def schema_lock(app):
+    """Serialisiert Schema-Änderungen zwischen parallel startenden Workern."""
+    engine = db.engine
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as connection:
+            connection.execute(text('SELECT pg_advisory_lock(:id)'), {'id': SCHEMA_ADVISORY_LOCK_ID})
+            try:
+                yield
+            finally:
+                connection.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': SCHEMA_ADVISORY_LOCK_ID})
+        return
+
+    if fcntl is None:
+        yield
+        return
+
+    lock_path = app.config.get('SCHEMA_LOCK_PATH') or os.path.join(app.instance_path, SCHEMA_LOCK_FILENAME)
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def ensure_schema(app):
+    """Führt die Schema-Shims nur aus, wenn der gespeicherte Fingerprint veraltet ist.
+
+    Gibt True zurück, wenn geprüft/migriert wurde, sonst False. Die
+    Standard-Aktivitätstypen sind Daten, kein Schema, und werden immer ergänzt.
+    """
+    checked = _ensure_schema_checks(app)
+    ensure_activity_types()
+    return checked
+
+
+def _ensure_schema_checks(app):
+    expected = schema_fingerprint(db.engine)
+    if read_schema_fingerprint(db.engine) == expected:
+        app.logger.debug('Schema fingerprint up to date; skipping startup schema checks.')
+        return False
+
+    with schema_lock(app):
+        # Ein anderer Worker kann die Migration inzwischen abgeschlossen haben
+        if read_schema_fingerprint(db.engine) == expected:
+            return False
+        run_schema_checks(app)
+        write_schema_fingerprint(expected)
+    app.logger.info('Startup schema checks applied; fingerprint %s stored.', expected[:12])
+    return True
+
+
+def run_schema_checks(app):
+    try:
+        db.create_all()
+    except OperationalError as exc:
+        if 'already exists' not in str(exc).lower():
+            raise
+        app.logger.warning('DB init race condition detected; continuing.')
+    ensure_user_auth_claim_columns(app)
+    ensure_training_team_column()
+    ensure_jsonb_columns(app)
+    # Backward-compat shim for existing deployments that do not run
+    # `flask db upgrade`. New installations use Alembic migrations.
+    if db.engine.dialect.name == 'sqlite':
+        table_exists = db.session.execute(
+            text("SELECT name FROM sqlite_master WHERE type='table' AND name='activity_type'")
+        ).fetchone()
+        if table_exists:
+            result = db.session.execute(text("PRAGMA table_info(activity_type)")).fetchall()
+            existing_columns = {row[1] for row in result}
+            if 'light_color' not in existing_columns:
+                db.session.execute(text("ALTER TABLE activity_type ADD COLUMN light_color VARCHAR(7) NOT NULL DEFAULT '#E8E8E8'"))
+            if 'dark_color' not in existing_columns:
+                db.session.execute(text("ALTER TABLE activity_type ADD COLUMN dark_color VARCHAR(7) NOT NULL DEFAULT '#4A4A4A'"))
+
+        result = db.session.execute(text("PRAGMA table_info(training)")).fetchall()
+        existing_columns = {row[1] for row in result}
+        if 'is_hidden' not in existing_columns:
+            db.session.execute(text("ALTER TABLE training ADD COLUMN is_hidden BOOLEAN NOT NULL DEFAULT 0"))
+        db.session.commit()
+    ensure_foreign_key_cascades(app)
+    ensure_indexes(app)
+
+
+def ensure_activity_types():
+    if not ACTIVITY_TYPE_DEFAULTS:
+        return
+    defaults_by_key = {item['key']: item for item in ACTIVITY_TYPE_DEFAULTS}
+    rows = ActivityType.query.all()
+    existing_keys = {row.key for row in rows}
+    missing = [item for item in ACTIVITY_TYPE_DEFAULTS if item['key'] not in existing_keys]
+    if missing:
+        for item in missing:
+            db.session.add(ActivityType(**item))
+        db.session.commit()
+        rows = ActivityType.query.all()
+
+    changed = False
+    for row in rows:
+        defaults = defaults_by_key.get(row.key)
+        if not defaults:
+            continue
+        for field in ('label', 'behavior', 'badge_class', 'sort_order'):
+            if getattr(row, field, None) in (None, ''):
+                setattr(row, field, defaults[field])
+                changed = True
+        if row.light_color in (None, '', '#E8E8E8') and defaults.get('light_color'):
+            row.light_color = defaults['light_color']
+            changed = True
+        if row.dark_color in (None, '', '#4A4A4A') and defaults.get('dark_color'):
+            row.dark_color = defaults['dark_color']
+            changed = True
+    if changed:
+        db.session.commit()
+
+
+def ensure_user_auth_claim_columns(app):
+    inspector = inspect(db.engine)
+    if 'user' not in inspector.get_table_names():
+        return
+    existing_columns = {column['name'] for column in inspector.get_columns('user')}
+    dialect = db.engine.dialect.name
+    bool_false = 'false' if dialect == 'postgresql' else '0'
+    json_type = 'JSONB' if dialect == 'postgresql' else 'TEXT'
+    statements = []
+    if 'auth_user_id' not in existing_columns:
+        statements.append('ALTER TABLE "user" ADD COLUMN auth_user_id INTEGER')
+    if 'platform_role' not in existing_columns:
+        statements.append("ALTER TABLE \"user\" ADD COLUMN platform_role VARCHAR(20) DEFAULT 'user'")
+    if 'display_name' not in existing_columns:
+        statements.append('ALTER TABLE "user" ADD COLUMN display_name VARCHAR(120)')
+    if 'email' not in existing_columns:
+        statements.append('ALTER TABLE "user" ADD COLUMN email VARCHAR(255)')
+    if 'profile_complete' not in existing_columns:
+        statements.append(f'ALTER TABLE "user" ADD COLUMN profile_complete BOOLEAN NOT NULL DEFAULT {bool_false}')
+    if 'memberships_json' not in existing_columns:
+        statements.append(f"ALTER TABLE \"user\" ADD COLUMN memberships_json {json_type} NOT NULL DEFAULT '[]'")
+    if 'permissions_json' not in existing_columns:
+        statements.append(f"ALTER TABLE \"user\" ADD COLUMN permissions_json {json_type} NOT NULL DEFAULT '[]'")
+    if 'claims_json' not in existing_columns:
+        statements.append(f"ALTER TABLE \"user\" ADD COLUMN claims_json {json_type} NOT NULL DEFAULT '{{}}'")
+    if 'auth_payload_hash' not in existing_columns:
+        statements.append('ALTER TABLE "user" ADD COLUMN auth_payload_hash VARCHAR(64)')
+    for statement in statements:
+        db.session.execute(text(statement))
+    if statements:
+        db.session.commit()
+        app.logger.info('Applied agenda user auth-claim schema updates.')
+
+
+def ensure_training_team_column():
+    inspector = inspect(db.engine)
+    if 'training' not in inspector.get_table_names():
+        return
+
+    existing_columns = {column['name'] for column in inspector.get_columns('training')}
+    dialect = db.engine.dialect.name
+
+    statements = []
+    if 'team_code' not in existing_columns:
+        statements.append("ALTER TABLE training ADD COLUMN team_code VARCHAR(32)")
+
+    for statement in statements:
+        db.session.execute(text(statement))
+
+    if statements:
+        db.session.commit()
+
+    # Backfill existing/null values and enforce NOT NULL semantics
+    db.session.execute(text("UPDATE training SET team_code = 'SENIORS' WHERE team_code IS NULL OR team_code = ''"))
+    if dialect == 'postgresql':
+        db.session.execute(text("ALTER TABLE training ALTER COLUMN team_code SET DEFAULT 'SENIORS'"))
+        db.session.execute(text("ALTER TABLE training ALTER COLUMN team_code SET NOT NULL"))
+    db.session.commit()
+
+
+def jsonb_using(column):
+    """USING-Ausdruck für TEXT -> JSONB; '' ist kein gültiges JSON."""
+    using = f"NULLIF({column.name}, '')"
+    if not column.nullable:
+        # NULL würde an NOT NULL scheitern; stattdessen der leere Wert des Modells
+        empty = json_codec.dumps(column.default.arg(None)) if column.default is not None else 'null'
+        using = f"COALESCE({using}, '{empty}')"
+    return f'{using}::jsonb'
+
+
+def ensure_jsonb_columns(app):
+    if db.engine.dialect.name != 'postgresql':
+        return
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    statements = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        json_columns = {column.name: column for column in table.columns if isinstance(column.type, JsonType)}
+        if not json_columns:
+            continue
+        for column in inspector.get_columns(table.name):
+            if column['name'] not in json_columns or isinstance(column['type'], JSONB):
+                continue
+            model_column = json_columns[column['name']]
+            quoted_table = f'"{table.name}"'
+            name = column['name']
+            statements.append(f'ALTER TABLE {quoted_table} ALTER COLUMN {name} DROP DEFAULT')
+            statements.append(
+                f'ALTER TABLE {quoted_table} ALTER COLUMN {name} TYPE JSONB USING {jsonb_using(model_column)}'
+            )
+            if column.get('default') is not None and model_column.default is not None:
+                empty = json_codec.dumps(model_column.default.arg(None))
+                statements.append(f"ALTER TABLE {quoted_table} ALTER COLUMN {name} SET DEFAULT '{empty}'::jsonb")
+    for statement in statements:
+        db.session.execute(text(statement))
+    if statements:
+        db.session.commit()
+        app.logger.info('Converted agenda JSON columns to JSONB.')
+
+
+def ensure_indexes(app):
+    """Legt in den Modellen definierte Indizes an, die `create_all` bei bestehenden Tabellen auslässt."""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            index.create(db.engine, checkfirst=True)
+            created.append(index.name)
+    if created:
+        app.logger.info('Created missing indexes: %s', ', '.join(sorted(created)))
+
+
+def ensure_foreign_key_cascades(app):
+    """Zieht ON DELETE aus den Modellen auf Bestandstabellen nach (`create_all` ändert keine Constraints)."""
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    pending = {}
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        reflected = {tuple(item['constrained_columns']): item for item in inspector.get_foreign_keys(table.name)}
+        for foreign_key in table.foreign_keys:
+            if not foreign_key.ondelete:
+                continue
+            current = reflected.get((foreign_key.parent.name,))
+            if current and (current.get('options') or {}).get('ondelete', '').upper() == foreign_key.ondelete.upper():
+                continue
+            pending.setdefault(table.name, []).append((foreign_key, current))
+    if not pending:
+        return
+
+    with db.engine.connect() as connection:
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            # SQLite baut die Tabelle neu; DROP TABLE darf dabei nichts kaskadieren
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+        try:
+            operations = Operations(MigrationContext.configure(connection))
+            for table_name, foreign_keys in pending.items():
+                with operations.batch_alter_table(table_name, naming_convention=FOREIGN_KEY_NAMING_CONVENTION) as batch_op:
+                    for foreign_key, current in foreign_keys:
+                        name = (current or {}).get('name') or f'{table_name}_{foreign_key.parent.name}_fkey'
+                        if current:
+                            batch_op.drop_constraint(name, type_='foreignkey')
+                        batch_op.create_foreign_key(
+                            name,
+                            foreign_key.column.table.name,
+                            [foreign_key.parent.name],
+                            [foreign_key.column.name],
+                            ondelete=foreign_key.ondelete,
+                        )
+            connection.commit()
+        finally:
+            if sqlite:
+                connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+                connection.commit()
+    app.logger.info('Applied ON DELETE rules to foreign keys of: %s', ', '.join(sorted(pending)))
@@ -0,0 +1,328 @@
+"""
+Serverseitige Sessions.
+
+Das Cookie enthält nur noch eine zufällige Session-ID; die Daten
+(Memberships, Permissions, Claims, …) liegen in einem Store. Standard ist
+eine lokale SQLite-Datei im Instance-Ordner, alternativ die App-Datenbank
+(`SESSION_BACKEND=database`) oder Flasks signiertes Cookie (`cookie`).
+Eigene Backends werden über `register_session_backend` eingehängt.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+import click
+from flask.cli import AppGroup, with_appcontext
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface, session_json_serializer
+from sqlalchemy import delete, insert, select, update
+
+from .extensions import db
+from .forking import register_after_fork
+from .models import ServerSession
+
+SESSION_SQLITE_FILENAME = 'sessions.db'
+# Session-IDs sind 43 Zeichen (32 Byte urlsafe)
+SESSION_ID_BYTES = 32
+EPOCH = datetime(1970, 1, 1)
+
+sessions_cli = AppGroup('sessions', help='Serverseitige Sessions verwalten.')
+
+
+class ServerSideSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.expires_at = expires_at
+
+
+class SessionStore(ABC):
+    """Schnittstelle für Session-Backends. Zeiten sind naive UTC-datetimes."""
+
+    @abstractmethod
+    def load(self, sid, now):
+        """`(data, expires_at)` der Session, oder None wenn unbekannt oder abgelaufen."""
+
+    @abstractmethod
+    def save(self, sid, data, expires_at):
+        """Speichert die Daten der Session bis `expires_at`."""
+
+    @abstractmethod
+    def touch(self, sid, expires_at):
+        """Verlängert die Session bis `expires_at`, ohne die Daten neu zu schreiben."""
+
+    @abstractmethod
+    def delete(self, sid):
+        """Entfernt die Session."""
+
+    @abstractmethod
+    def sweep(self, now):
+        """Löscht abgelaufene Sessions und gibt deren Anzahl zurück."""
+
+    def reset_after_fork(self):
+        """Verwirft vom Master geerbte Verbindungen (siehe app/forking.py)."""
+
+
+def _to_epoch(value):
+    return (value - EPOCH).total_seconds()
+
+
+class SQLiteSessionStore(SessionStore):
+    """Lokale SQLite-Datei; eine Verbindung pro Thread, WAL für parallele Worker."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS server_session ('
+                'id TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS ix_server_session_expires_at ON server_session (expires_at)'
+            )
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def reset_after_fork(self):
+        # Nicht schließen: die geerbte Verbindung gehört dem Master
+        self._local = threading.local()
+
+    def load(self, sid, now):
+        row = self._connect().execute(
+            'SELECT data, expires_at FROM server_session WHERE id = ? AND expires_at > ?',
+            (sid, _to_epoch(now)),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], EPOCH + timedelta(seconds=row[1])
+
+    def save(self, sid, data, expires_at):
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO server_session (id, data, expires_at) VALUES (?, ?, ?)',
+                (sid, data, _to_epoch(expires_at)),
+            )
+
+    def touch(self, sid, expires_at):
+        with self._connect() as connection:
+            connection.execute(
+                'UPDATE server_session SET expires_at = ? WHERE id = ?',
+                (_to_epoch(expires_at), sid),
+            )
+
+    def delete(self, sid):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM server_session WHERE id = ?', (sid,))
+
+    def sweep(self, now):
+        with self._connect() as connection:
+            return connection.execute(
+                'DELETE FROM server_session WHERE expires_at <= ?', (_to_epoch(now),)
+            ).rowcount
+
+
+class DatabaseSessionStore(SessionStore):
+    """Tabelle `server_session` in der App-Datenbank (mehrere Hosts, eine DB).
+
+    Nutzt eigene Verbindungen statt `db.session`, damit das Speichern der
+    Session keine offenen Änderungen des Requests mitcommittet.
+    """
+
+    table = ServerSession.__table__
+
+    def load(self, sid, now):
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(self.table.c.data, self.table.c.expires_at).where(
+                    self.table.c.id == sid, self.table.c.expires_at > now
+                )
+            ).first()
+        if row is None:
+            return None
+        return row.data, row.expires_at
+
+    def save(self, sid, data, expires_at):
+        with db.engine.begin() as connection:
+            updated = connection.execute(
+                update(self.table).where(self.table.c.id == sid).values(data=data, expires_at=expires_at)
+            ).rowcount
+            if not updated:
+                connection.execute(insert(self.table).values(id=sid, data=data, expires_at=expires_at))
+
+    def touch(self, sid, expires_at):
+        with db.engine.begin() as connection:
+            connection.execute(update(self.table).where(self.table.c.id == sid).values(expires_at=expires_at))
+
+    def delete(self, sid):
+        with db.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.id == sid))
+
+    def sweep(self, now):
+        with db.engine.begin() as connection:
+            return connection.execute(delete(self.table).where(self.table.c.expires_at <= now)).rowcount
+
+
+def _sqlite_store(app):
+    path = app.config.get('SESSION_SQLITE_PATH') or os.path.join(app.instance_path, SESSION_SQLITE_FILENAME)
+    return SQLiteSessionStore(path)
+
+
+def _database_store(app):
+    return DatabaseSessionStore()
+
+
+SESSION_BACKENDS = {
+    'sqlite': _sqlite_store,
+    'database': _database_store,
+}
+
+
+def register_session_backend(name, factory):
+    """Registriert ein Backend; `factory(app)` liefert einen `SessionStore`."""
+    SESSION_BACKENDS[name] = factory
+
+
+class ServerSideSessionInterface(SessionInterface):
+    serializer = session_json_serializer
+    session_class = ServerSideSession
+
+    def __init__(self, store, sweep_interval=300, refresh_interval=3600):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self.refresh_interval = timedelta(seconds=refresh_interval)
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+
+    def reset_after_fork(self):
+        self._sweep_lock = threading.Lock()
+        self.store.reset_after_fork()
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            loaded = self.store.load(sid, datetime.utcnow())
+            if loaded is not None:
+                data, expires_at = loaded
+                try:
+                    return self.session_class(self.serializer.loads(data.decode('utf-8')), sid=sid, expires_at=expires_at)
+                except ValueError:
+                    app.logger.warning('Discarding unreadable server-side session.')
+        # Unbekannte IDs werden nie übernommen (Session Fixation)
+        return self.session_class()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.modified and session.sid:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        now = datetime.utcnow()
+        expires_at = now + self._lifetime(app)
+        if session.modified or not session.sid:
+            session.sid = session.sid or secrets.token_urlsafe(SESSION_ID_BYTES)
+            self.store.save(session.sid, self.serializer.dumps(dict(session)).encode('utf-8'), expires_at)
+        elif session.expires_at is None or session.expires_at < expires_at - self.refresh_interval:
+            # Gleitendes Ablaufdatum, aber höchstens ein Schreibzugriff pro Intervall
+            self.store.touch(session.sid, expires_at)
+        else:
+            expires_at = session.expires_at
+        session.expires_at = expires_at
+        self._maybe_sweep(app, now)
+
+        if not self.should_set_cookie(app, session) and not session.modified:
+            return
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite,
+        )
+        response.vary.add('Cookie')
+
+    def _maybe_sweep(self, app, now):
+        if not self.sweep_interval:
+            return
+        monotonic = time.monotonic()
+        if monotonic < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = monotonic + self.sweep_interval
+            removed = self.store.sweep(now)
+            if removed:
+                app.logger.debug('Removed %s expired sessions.', removed)
+        except Exception:  # pragma: no cover - Aufräumen darf Requests nicht scheitern lassen
+            app.logger.exception('Session sweep failed.')
+        finally:
+            self._sweep_lock.release()
+
+
+def regenerate_session(session):
+    """Vergibt nach dem Login eine neue Session-ID; die Daten bleiben erhalten."""
+    from flask import current_app
+
+    interface = current_app.session_interface
+    if isinstance(session, ServerSideSession) and session.sid:
+        interface.store.delete(session.sid)
+        session.sid = None
+        session.modified = True
+
+
+def init_sessions(app):
+    backend = app.config.get('SESSION_BACKEND', 'sqlite')
+    if backend == 'cookie':
+        app.session_interface = SecureCookieSessionInterface()
+        return
+    if backend not in SESSION_BACKENDS:
+        raise RuntimeError(f'Unknown SESSION_BACKEND: {backend}')
+    app.session_interface = ServerSideSessionInterface(
+        SESSION_BACKENDS[backend](app),
+        sweep_interval=app.config.get('SESSION_SWEEP_INTERVAL', 300),
+        refresh_interval=app.config.get('SESSION_REFRESH_INTERVAL', 3600),
+    )
+    register_after_fork(app, app.session_interface.reset_after_fork)
+
+
+@sessions_cli.command('sweep')
+@with_appcontext
+def sweep_command():
+    """Löscht abgelaufene serverseitige Sessions."""
+    from flask import current_app
+
+    interface = current_app.session_interface
+    if not isinstance(interface, ServerSideSessionInterface):
+        click.echo('SESSION_BACKEND=cookie: nichts zu tun.')
+        return
+    click.echo(f'{interface.store.sweep(datetime.utcnow())} abgelaufene Sessions gelöscht.')
@@ -0,0 +1,197 @@
+"""
+Single-Flight für teure, identische Berechnungen.
+
+Laufen mehrere Requests mit demselben Schlüssel gleichzeitig, rechnet nur der
+erste; die übrigen warten auf sein Ergebnis. Zwischen Workern koordiniert eine
+Lock-Datei pro Schlüssel (fcntl, wie in app/schema.py): wer das Lock hält,
+rechnet und legt das Ergebnis als JSON daneben, wer danach kommt, liest es.
+Ergebnisse müssen daher JSON-serialisierbar sein. Der Schlüssel enthält
+Datenstand und Minute, veraltete Dateien werden beim Schreiben aufgeräumt.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import current_app
+
+from .forking import register_after_fork
+from .metrics import observe_single_flight
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+EXTENSION_KEY = 'single_flight'
+SINGLE_FLIGHT_DIRNAME = 'single-flight'
+# Ergebnisdateien älter als das sind sicher aus einer früheren Minute
+STALE_AFTER_SECONDS = 300
+LOCK_POLL_SECONDS = 0.01
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Bündelt gleichzeitige Aufrufe pro Schlüssel; `directory` aktiviert die Worker-Koordination."""
+
+    def __init__(self, directory=None, timeout=10.0):
+        self.directory = directory
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.computed = 0
+        self.shared = 0
+
+    def reset_after_fork(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        if not leader:
+            if not call.event.wait(self.timeout):
+                # Der laufende Aufruf hängt; lieber selbst rechnen als Requests blockieren
+                return compute()
+            if call.error is not None:
+                raise call.error
+            self._count_shared()
+            return call.result
+
+        try:
+            call.result = self._compute_shared(key, compute)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _compute(self, compute):
+        self.computed += 1
+        observe_single_flight(shared=False)
+        return compute()
+
+    def _count_shared(self):
+        self.shared += 1
+        observe_single_flight(shared=True)
+
+    def _paths(self, key):
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32]
+        base = os.path.join(self.directory, digest)
+        return base + '.lock', base + '.json'
+
+    def _compute_shared(self, key, compute):
+        if self.directory is None or fcntl is None:
+            return self._compute(compute)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            lock_path, result_path = self._paths(key)
+            lock_file = open(lock_path, 'a')
+        except OSError:
+            return self._compute(compute)
+
+        with lock_file:
+            if not self._acquire(lock_file):
+                return self._compute(compute)
+            try:
+                stored = self._read(result_path, key)
+                if stored is not None:
+                    self._count_shared()
+                    return stored['result']
+                result = self._compute(compute)
+                self._write(result_path, key, result)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _acquire(self, lock_file):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(LOCK_POLL_SECONDS)
+
+    @staticmethod
+    def _read(path, key):
+        try:
+            with open(path, encoding='utf-8') as handle:
+                stored = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return stored if stored.get('key') == repr(key) else None
+
+    def _write(self, path, key, result):
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as handle:
+                json.dump({'key': repr(key), 'result': result}, handle)
+            os.replace(temp_path, path)
+        except (OSError, TypeError):
+            # Nicht serialisierbar oder kein Platz: Ergebnis gilt dann nur in diesem Worker
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        self._sweep()
+
+    def clear(self):
+        """Löscht alle gespeicherten Ergebnisse (z.B. nach einem Restore der Datenbank)."""
+        if self.directory is None:
+            return
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.endswith('.json'):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _sweep(self):
+        cutoff = time.time() - STALE_AFTER_SECONDS
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def get_single_flight(app=None):
+    return (app or current_app).extensions[EXTENSION_KEY]
+
+
+def init_single_flight(app):
+    directory = None
+    if app.config.get('SINGLE_FLIGHT_SHARED', True):
+        directory = app.config.get('SINGLE_FLIGHT_DIR') or os.path.join(app.instance_path, SINGLE_FLIGHT_DIRNAME)
+    flight = SingleFlight(directory, timeout=app.config.get('SINGLE_FLIGHT_TIMEOUT', 10.0))
+    app.extensions[EXTENSION_KEY] = flight
+    register_after_fork(app, flight.reset_after_fork)
@@ -1,13 +1,60 @@
-const CACHE_NAME = 'tt-agenda-static-v2';
-const PRECACHE_URLS = [
-  '/static/css/style.css',
-  '/static/manifest.json',
-  '/static/tigers-logo.png'
-];
+// Beide Werte setzt /service-worker.js aus dem Asset-Manifest (app/assets.py); ändert sich
+// eine statische Datei, ändert sich das Skript und der alte Static-Cache wird verworfen
+const ASSET_VERSION = '__ASSET_VERSION__';
+const PRECACHE_URLS = ['__PRECACHE_URLS__'];
+const STATIC_CACHE = `tt-agenda-static-${ASSET_VERSION}`;
+const PAGE_CACHE = 'tt-agenda-pages-v1';
+const AGENDA_URL = '/offline/agenda.json';
+// Seiten, die stale-while-revalidate aus dem Cache kommen (Agenda und Live-Timelines)
+const OFFLINE_PATHS = ['/', '/live', AGENDA_URL];
+// Diese Formulare wechseln Benutzer oder Team; die Offline-Kopien passen danach nicht mehr
+const RESET_PATHS = ['/logout', '/team/switch'];
+const PREFETCH_INTERVAL_MS = 5 * 60 * 1000;
+
+const DB_NAME = 'tt-agenda-offline';
+const DB_VERSION = 1;
+
+// --- IndexedDB: ETags pro URL, Agenda-Daten und Metadaten ---
+
+function openDb() {
+  return new Promise((resolve, reject) => {
+    const request = indexedDB.open(DB_NAME, DB_VERSION);
+    request.onupgradeneeded = () => {
+      const db = request.result;
+      db.createObjectStore('pages', { keyPath: 'url' });
+      db.createObjectStore('meta', { keyPath: 'key' });
+    };
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+function idb(storeName, mode, operation) {
+  return openDb().then(db => new Promise((resolve, reject) => {
+    const transaction = db.transaction(storeName, mode);
+    const request = operation(transaction.objectStore(storeName));
+    transaction.oncomplete = () => { db.close(); resolve(request ? request.result : undefined); };
+    transaction.onerror = () => { db.close(); reject(transaction.error); };
+  }));
+}
+
+const pageRecords = {
+  get: url => idb('pages', 'readonly', store => store.get(url)),
+  put: record => idb('pages', 'readwrite', store => store.put(record)),
+  clear: () => idb('pages', 'readwrite', store => store.clear())
+};
+
+const meta = {
+  get: key => idb('meta', 'readonly', store => store.get(key)).then(record => record && record.value),
+  put: (key, value) => idb('meta', 'readwrite', store => store.put({ key, value })),
+  clear: () => idb('meta', 'readwrite', store => store.clear())
+};
+
+// --- Lifecycle ---
 
 self.addEventListener('install', event => {
   event.waitUntil(
-    caches.open(CACHE_NAME).then(cache => cache.addAll(PRECACHE_URLS))
+    caches.open(STATIC_CACHE).then(cache => cache.addAll(PRECACHE_URLS))
   );
   self.skipWaiting();
 });
@@ -17,7 +64,7 @@ self.addEventListener('activate', event => {
     caches.keys().then(cacheNames =>
       Promise.all(
         cacheNames.map(cacheName => {
-          if (cacheName !== CACHE_NAME) {
+          if (cacheName !== STATIC_CACHE && cacheName !== PAGE_CACHE) {
             return caches.delete(cacheName);
           }
           return Promise.resolve();
@@ -28,6 +75,99 @@ self.addEventListener('activate', event => {
   self.clients.claim();
 });
 
+// --- Offline-Seiten ---
+
+function pageKey(url) {
+  return url.pathname + url.search;
+}
+
+function isOfflinePage(request, url) {
+  return request.method === 'GET' && url.origin === self.location.origin && OFFLINE_PATHS.includes(url.pathname);
+}
+
+function clearOfflineData() {
+  return Promise.all([caches.delete(PAGE_CACHE), pageRecords.clear(), meta.clear()]).catch(() => {});
+}
+
+function notifyClients(message) {
+  return self.clients.matchAll().then(clients => clients.forEach(client => client.postMessage(message)));
+}
+
+// Lädt eine Seite mit If-None-Match nach; bei 304 bleibt die gespeicherte Kopie gültig
+async function revalidate(key) {
+  const record = await pageRecords.get(key).catch(() => undefined);
+  const cache = await caches.open(PAGE_CACHE);
+  const cached = record ? await cache.match(key) : undefined;
+  const headers = {};
+  if (record && record.etag && cached) {
+    headers['If-None-Match'] = record.etag;
+  }
+  const response = await fetch(key, { headers, credentials: 'same-origin', cache: 'no-store', redirect: 'manual' });
+  if (response.status === 304 && cached) {
+    await pageRecords.put({ ...record, checkedAt: Date.now() });
+    return { response: cached, changed: false };
+  }
+  if (response.type === 'opaqueredirect') {
+    // Session abgelaufen: Weiterleitung zum Login, Offline-Kopien des Benutzers verwerfen
+    await clearOfflineData();
+    return { response, changed: false };
+  }
+  if (response.status !== 200 || (response.headers.get('Cache-Control') || '').includes('no-store')) {
+    return { response, changed: false };
+  }
+  await cache.put(key, response.clone());
+  await pageRecords.put({ url: key, etag: response.headers.get('ETag'), checkedAt: Date.now() });
+  return { response, changed: Boolean(cached) };
+}
+
+function staleWhileRevalidate(event, key) {
+  const network = revalidate(key).then(result => {
+    if (result.changed) {
+      notifyClients({ type: 'offline-page-updated', url: key });
+    }
+    return result.response;
+  });
+  event.waitUntil(network.catch(() => {}));
+
+  return caches.open(PAGE_CACHE)
+    .then(cache => cache.match(key))
+    .then(cached => cached || network)
+    .catch(() => caches.match('/').then(fallback => fallback || Response.error()));
+}
+
+// Holt die Agenda, legt sie in IndexedDB ab und lädt alle zugehörigen Seiten vor
+async function prefetchAgenda(force) {
+  const lastPrefetch = await meta.get('lastPrefetch').catch(() => undefined);
+  if (!force && lastPrefetch && Date.now() - lastPrefetch < PREFETCH_INTERVAL_MS) {
+    return;
+  }
+  const { response } = await revalidate(AGENDA_URL);
+  if (response.status !== 200) {
+    return;
+  }
+  const agenda = await response.clone().json();
+  const previousTeam = await meta.get('teamCode');
+  if (previousTeam && previousTeam !== agenda.team_code) {
+    await clearOfflineData();
+    await revalidate(AGENDA_URL);
+  }
+  await meta.put('teamCode', agenda.team_code);
+  await meta.put('agenda', agenda);
+  await Promise.all(agenda.urls.map(url => revalidate(url).catch(() => undefined)));
+  await meta.put('lastPrefetch', Date.now());
+}
+
+self.addEventListener('message', event => {
+  const data = event.data || {};
+  if (data.type === 'prefetch') {
+    event.waitUntil(prefetchAgenda(Boolean(data.force)).catch(() => {}));
+  } else if (data.type === 'clear') {
+    event.waitUntil(clearOfflineData());
+  }
+});
+
+// --- Statische Dateien ---
+
 function isCacheableStaticRequest(request) {
   if (request.method !== 'GET') {
     return false;
@@ -36,31 +176,42 @@ function isCacheableStaticRequest(request) {
   if (url.origin !== self.location.origin) {
     return false;
   }
-  return url.pathname.startsWith('/static/') || url.pathname.startsWith('/shared/');
+  return url.pathname.startsWith('/assets/') || url.pathname.startsWith('/static/') || url.pathname.startsWith('/shared/');
 }
 
-self.addEventListener('fetch', event => {
-  if (!isCacheableStaticRequest(event.request)) {
-    return;
-  }
+function cacheFirst(request) {
+  return caches.match(request).then(cached => {
+    if (cached) {
+      return cached;
+    }
 
-  event.respondWith(
-    caches.match(event.request).then(cached => {
-      if (cached) {
-        return cached;
+    return fetch(request).then(response => {
+      if (!response || response.status !== 200 || response.type === 'error') {
+        return response;
       }
 
-      return fetch(event.request).then(response => {
-        if (!response || response.status !== 200 || response.type === 'error') {
-          return response;
-        }
-
-        const clone = response.clone();
-        caches.open(CACHE_NAME).then(cache => {
-          cache.put(event.request, clone);
-        });
-        return response;
+      const clone = response.clone();
+      caches.open(STATIC_CACHE).then(cache => {
+        cache.put(request, clone);
       });
-    })
-  );
+      return response;
+    });
+  });
+}
+
+self.addEventListener('fetch', event => {
+  const request = event.request;
+  const url = new URL(request.url);
+
+  if (request.method === 'POST' && url.origin === self.location.origin && RESET_PATHS.includes(url.pathname)) {
+    event.respondWith(clearOfflineData().then(() => fetch(request)));
+    return;
+  }
+  if (isOfflinePage(request, url)) {
+    event.respondWith(staleWhileRevalidate(event, pageKey(url)));
+    return;
+  }
+  if (isCacheableStaticRequest(request)) {
+    event.respondWith(cacheFirst(request));
+  }
 });
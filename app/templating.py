@@ -0,0 +1,72 @@
+"""
+Persistenter Jinja-Bytecode-Cache.
+
+Kompilierte Templates werden in JINJA_CACHE_DIR (Standard
+`instance/jinja-cache`) abgelegt, damit Worker nach einem Neustart nicht jedes
+Template neu kompilieren. Jinja prüft pro Eintrag eine Prüfsumme des
+Quelltexts, geänderte Templates werden also automatisch neu kompiliert.
+`flask templates compile` füllt den Cache vorab, z.B. im Docker-Build.
+"""
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError
+
+JINJA_CACHE_DIRNAME = 'jinja-cache'
+
+templates_cli = AppGroup('templates', help='Jinja-Templates vorkompilieren.')
+
+
+def init_template_cache(app):
+    """Muss vor dem ersten Zugriff auf `app.jinja_env` aufgerufen werden."""
+    if not app.config.get('JINJA_BYTECODE_CACHE_ENABLED', True):
+        return
+    directory = app.config.get('JINJA_CACHE_DIR') or os.path.join(app.instance_path, JINJA_CACHE_DIRNAME)
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        app.logger.warning('Jinja bytecode cache directory %s is not writable; cache disabled.', directory)
+        return
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(directory)}
+
+
+def load_templates(app, on_error=None):
+    """Lädt alle HTML-Templates in den Jinja-Cache; gibt (geladen, fehlgeschlagen) zurück.
+
+    Im Gunicorn-Master mit `preload_app` aufgerufen, teilen sich die Worker die
+    kompilierten Templates per Copy-on-Write.
+    """
+    env = app.jinja_env
+    loaded = 0
+    failed = []
+    for name in env.list_templates():
+        if not name.endswith('.html'):
+            continue
+        try:
+            env.get_template(name)
+        except TemplateSyntaxError as exc:
+            # Nicht mehr gerenderte Alt-Templates sollen Build und Start nicht abbrechen
+            failed.append(name)
+            if on_error is not None:
+                on_error(name, exc)
+        else:
+            loaded += 1
+    return loaded, failed
+
+
+@templates_cli.command('compile')
+@click.option('--strict', is_flag=True, help='Exit-Code 1, wenn ein Template nicht kompiliert.')
+@with_appcontext
+def compile_command(strict):
+    """Kompiliert alle Templates in den Bytecode-Cache."""
+    compiled, failed = load_templates(
+        current_app,
+        on_error=lambda name, exc: click.echo(f'Übersprungen: {name} ({exc.message}, Zeile {exc.lineno})', err=True),
+    )
+    cache = current_app.jinja_env.bytecode_cache
+    target = cache.directory if isinstance(cache, FileSystemBytecodeCache) else 'kein Bytecode-Cache'
+    click.echo(f'{compiled} Templates kompiliert ({target}).')
+    if strict and failed:
+        raise SystemExit(1)
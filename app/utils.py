@@ -1,14 +1,24 @@
-from datetime import datetime, timedelta
-from flask import session, flash, redirect, url_for, request
+from collections import namedtuple
+from datetime import datetime, time as dt_time, timedelta
+from flask import g, has_request_context, session, flash, redirect, url_for, request
 from functools import wraps
 import json
 import logging
 import os
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Union
 import requests
-from .models import Activity, ActivityInstance, Training, TrainingInstance, ActivityType
-from .authz import is_platform_admin, is_service_admin, normalize_permissions
+from sqlalchemy import select
+import secrets
+import time
+from types import MappingProxyType
+from werkzeug.security import generate_password_hash
+from .models import Activity, ActivityInstance, Training, TrainingInstance, ActivityType, User
+from .authz import AuthContext
 from .extensions import db
+from .metrics import observe_infra
+from .activity_colors import get_activity_type_row, get_activity_type_rows
+from .data_version import get_data_token
+from .single_flight import get_single_flight
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +33,21 @@ POSITION_GROUP_DEFAULTS = [
     {'key': 'WR', 'label': 'WR', 'sort_order': 7},
     {'key': 'QB', 'label': 'QB', 'sort_order': 8},
 ]
-POSITION_GROUPS = [item['key'] for item in POSITION_GROUP_DEFAULTS]
-POSITION_GROUP_LABELS = {item['key']: item['label'] for item in POSITION_GROUP_DEFAULTS}
+# Unveränderlicher Stand der Positionsgruppen. refresh_position_groups ersetzt
+# ihn als Ganzes (eine Zuweisung), statt Listen in-place zu ändern; ein Request
+# liest über die Accessoren immer denselben Stand, auch unter gthread-Workern.
+PositionGroups = namedtuple('PositionGroups', ['keys', 'labels'])
+
+
+def _position_group_snapshot(pairs):
+    pairs = list(pairs)
+    return PositionGroups(
+        keys=tuple(key for key, _label in pairs),
+        labels=MappingProxyType({key: label for key, label in pairs}),
+    )
+
+
+_position_groups = _position_group_snapshot((item['key'], item['label']) for item in POSITION_GROUP_DEFAULTS)
 
 
 def _infra_base_url():
@@ -35,48 +58,85 @@ def _infra_base_url():
     ).rstrip('/')
 
 
-def refresh_position_groups():
+def _fetch_position_groups():
+    """Positionsgruppen aus tt-infra als Snapshot, None bei Fehlern oder leerer Antwort."""
+    started = time.perf_counter()
     try:
         secret = os.environ.get('INTERNAL_API_SECRET') or os.environ.get('SSO_SHARED_SECRET')
         headers = {'X-TT-Internal-Secret': secret} if secret else {}
         response = requests.get(f'{_infra_base_url()}/api/master-data/positions', headers=headers, timeout=4)
+        observe_infra('positions', started, failed=response.status_code >= 400)
         if response.status_code >= 400:
             logger.warning("refresh_position_groups: infra query failed %s %s", response.status_code, response.text)
-            return POSITION_GROUPS
+            return None
         payload = response.json() or {}
         rows = payload.get('positions') or []
-        cleaned = []
-        labels = {}
+        pairs = []
         for row in rows:
             key = (row.get('key') or '').strip().upper()
             label = (row.get('label') or key).strip()
             if not key:
                 continue
-            cleaned.append(key)
-            labels[key] = label or key
-        if cleaned:
-            POSITION_GROUPS[:] = cleaned
-            POSITION_GROUP_LABELS.clear()
-            POSITION_GROUP_LABELS.update(labels)
-        return POSITION_GROUPS
+            pairs.append((key, label or key))
+        return _position_group_snapshot(pairs) if pairs else None
+    except requests.RequestException:
+        observe_infra('positions', started, failed=True)
+        logger.warning("refresh_position_groups: infra query failed, using defaults", exc_info=True)
+        return None
     except Exception:
         logger.warning("refresh_position_groups: infra query failed, using defaults", exc_info=True)
-        return POSITION_GROUPS
+        return None
+
+
+def refresh_position_groups():
+    global _position_groups
+    snapshot = _fetch_position_groups()
+    if snapshot is not None and snapshot != _position_groups:
+        _position_groups = snapshot
+    current = _position_groups
+    if has_request_context():
+        g.position_groups = current
+    return current.keys
+
+
+def get_position_group_snapshot():
+    """Stand der Positionsgruppen; innerhalb eines Requests immer derselbe."""
+    if not has_request_context():
+        return _position_groups
+    snapshot = g.get('position_groups')
+    if snapshot is None:
+        snapshot = g.position_groups = _position_groups
+    return snapshot
+
+
+def reset_position_group_snapshot():
+    g.pop('position_groups', None)
 
 
 def get_position_group_defs():
+    snapshot = get_position_group_snapshot()
     return [
-        {'key': key, 'label': POSITION_GROUP_LABELS.get(key, key), 'sort_order': idx + 1}
-        for idx, key in enumerate(POSITION_GROUPS)
+        {'key': key, 'label': snapshot.labels.get(key, key), 'sort_order': idx + 1}
+        for idx, key in enumerate(snapshot.keys)
     ]
 
 
 def get_position_groups():
-    return POSITION_GROUPS
+    return get_position_group_snapshot().keys
 
 
 def get_position_group_labels():
-    return POSITION_GROUP_LABELS
+    return get_position_group_snapshot().labels
+
+
+def order_topics_by_group(topics):
+    """Sortiert Einzelthemen {Gruppe: Thema} in die Reihenfolge der Positionsgruppen.
+
+    JSONB speichert Objekt-Schlüssel sortiert, die Eingabereihenfolge geht
+    auf Postgres verloren. Unbekannte Gruppen folgen am Ende.
+    """
+    order = {group: index for index, group in enumerate(get_position_groups())}
+    return dict(sorted(topics.items(), key=lambda item: order.get(item[0], len(order))))
 
 ACTIVITY_TYPE_DEFAULTS = [
     {
@@ -121,11 +181,7 @@ def _activity_type_defaults_by_key():
     return {item['key']: item for item in ACTIVITY_TYPE_DEFAULTS}
 
 def get_activity_type_defs():
-    try:
-        rows = ActivityType.query.order_by(ActivityType.sort_order).all()
-    except Exception:
-        logger.warning("get_activity_type_defs: DB query failed, using defaults", exc_info=True)
-        rows = []
+    rows = get_activity_type_rows()
 
     if not rows:
         defaults = _activity_type_defaults_by_key()
@@ -139,38 +195,30 @@ def get_activity_type_defs():
         }
 
     return {
-        row.key: {
-            'label': row.label,
-            'behavior': row.behavior,
-            'badge_class': row.badge_class
+        row['key']: {
+            'label': row['label'],
+            'behavior': row['behavior'],
+            'badge_class': row['badge_class']
         }
         for row in rows
     }
 
 def get_activity_type_order():
-    try:
-        rows = ActivityType.query.order_by(ActivityType.sort_order).all()
-    except Exception:
-        logger.warning("get_activity_type_order: DB query failed, using defaults", exc_info=True)
-        rows = []
+    rows = get_activity_type_rows()
 
     if not rows:
         return [item['key'] for item in sorted(ACTIVITY_TYPE_DEFAULTS, key=lambda d: d['sort_order'])]
 
-    return [row.key for row in rows]
+    return [row['key'] for row in rows]
 
 def get_team_like_types():
     defs = get_activity_type_defs()
     return [key for key, value in defs.items() if value.get('behavior') == 'team']
 
 def get_activity_behavior(activity_type: str) -> str:
-    try:
-        row = ActivityType.query.filter_by(key=activity_type).first()
-    except Exception:
-        logger.warning("get_activity_behavior: DB query failed for '%s'", activity_type, exc_info=True)
-        row = None
-    if row and row.behavior:
-        return row.behavior
+    row = get_activity_type_row(activity_type)
+    if row and row['behavior']:
+        return row['behavior']
     defaults = _activity_type_defaults_by_key()
     return defaults.get(activity_type, {}).get('behavior', 'team')
 
@@ -195,8 +243,24 @@ def login_required(f):
     return decorated_function
 
 
+def get_auth_context():
+    """AuthContext des aktuellen Requests (einmal pro Request in `g` berechnet)."""
+    auth = g.get('auth_context')
+    if auth is None:
+        auth = AuthContext.from_session(session)
+        if auth.active_team_fallback:
+            session['active_team_code'] = auth.active_team_code
+        g.auth_context = auth
+    return auth
+
+
+def reset_auth_context():
+    """Nach Änderungen an Login- oder Team-Daten in der Session aufrufen."""
+    g.pop('auth_context', None)
+
+
 def get_user_permissions():
-    return normalize_permissions(session.get('permissions'))
+    return get_auth_context().permissions
 
 
 def get_user_memberships():
@@ -205,64 +269,42 @@ def get_user_memberships():
 
 
 def get_available_teams():
-    memberships = get_user_memberships()
-    teams = {}
-    for membership in memberships:
-        code = (membership.get('team_code') or '').strip().upper()
-        name = (membership.get('team_name') or '').strip()
-        if not code:
-            continue
-        teams[code] = name or code
-
-    if not teams:
-        teams = {'SENIORS': 'Seniors'}
-
-    return [{'code': code, 'name': teams[code]} for code in sorted(teams.keys())]
+    return get_auth_context().teams
 
 
 def get_active_team_code():
-    teams = get_available_teams()
-    available_codes = {team['code'] for team in teams}
-    active = (session.get('active_team_code') or '').strip().upper()
-
-    if active in available_codes:
-        return active
-
-    fallback = teams[0]['code']
-    session['active_team_code'] = fallback
-    return fallback
+    return get_auth_context().active_team_code
 
 
 def get_active_team_name():
-    active = get_active_team_code()
-    teams = get_available_teams()
-    for team in teams:
-        if team['code'] == active:
-            return team['name']
-    return active
+    return get_auth_context().active_team_name
 
 
 def can_manage_agenda():
-    permissions = get_user_permissions()
-    if is_platform_admin(session.get('platform_role'), permissions):
-        return True
-    if is_service_admin(session.get('user_role'), permissions):
-        return True
-    if 'agenda:admin' in permissions or 'agenda:write' in permissions:
-        return True
-    return any(
-        permission.startswith('team:') and (permission.endswith(':write') or permission.endswith(':admin'))
-        for permission in permissions
-    )
+    return get_auth_context().can_manage_agenda
 
 
 def can_view_agenda():
-    if can_manage_agenda():
-        return True
-    permissions = get_user_permissions()
-    if 'agenda:read' in permissions or 'profile:read' in permissions:
-        return True
-    return any(permission.startswith('team:') and permission.endswith(':read') for permission in permissions)
+    return get_auth_context().can_view_agenda
+
+
+def get_or_create_sso_user(claims, auto_provision=True):
+    """Sucht den Benutzer zu normalisierten SSO-Claims und legt ihn bei Bedarf an.
+
+    Gibt (user, created) zurück; user ist None, wenn keine Anlage erlaubt ist.
+    """
+    username = (claims.get('username') or '').strip()
+    user = User.query.filter_by(auth_user_id=int(claims['sub'])).first()
+    if not user and username:
+        user = User.query.filter_by(username=username).first()
+    if user:
+        return user, False
+    if not auto_provision:
+        return None, False
+    user = User(username=username, role=claims.get('service_role') or 'user')
+    user.password_hash = generate_password_hash(secrets.token_hex(32))
+    db.session.add(user)
+    return user, True
 
 
 def admin_required(f):
@@ -277,7 +319,14 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def build_activity_timeline(activities: List[Activity], base_date: datetime.date) -> List[Tuple[Activity, datetime, datetime]]:
+def generate_csrf_token():
+    token = session.get('_csrf_token')
+    if not token:
+        token = secrets.token_urlsafe(32)
+        session['_csrf_token'] = token
+    return token
+
+def build_activity_timeline(activities: List['ActivityLike'], base_date: datetime.date) -> List[Tuple['ActivityLike', datetime, datetime]]:
     """Erstellt eine Timeline mit Datetimes, inkl. Mitternachts-Überlauf."""
     timeline = []
     current_date = base_date
@@ -307,7 +356,7 @@ def get_training_timeline(training: Training, base_date: datetime.date) -> Tuple
 
     return activities, timeline, start_dt, end_dt
 
-def get_timeline_from_activities(activities: List[Activity], base_date: datetime.date) -> Tuple[Optional[List[Tuple[Activity, datetime, datetime]]], Optional[datetime], Optional[datetime]]:
+def get_timeline_from_activities(activities: List['ActivityLike'], base_date: datetime.date) -> Tuple[Optional[List[Tuple['ActivityLike', datetime, datetime]]], Optional[datetime], Optional[datetime]]:
     """Berechnet die Timeline aus einer gegebenen Aktivitätsliste."""
     if not activities:
         return None, None, None
@@ -352,7 +401,7 @@ def resolve_activities_for_date(training: Training, date: datetime.date, activit
         return instance_activities_by_id.get(instance.id, []), False
     return activities_by_training.get(training.id, []), False
 
-def load_training_data(team_code=None):
+def load_training_data(team_code=None, team_codes=None):
     """Lädt alle Trainings, Aktivitäten und Instanzen effizient aus der DB.
 
     Gibt ein 4-Tuple zurück:
@@ -361,6 +410,8 @@ def load_training_data(team_code=None):
     trainings_query = Training.query
     if team_code:
         trainings_query = trainings_query.filter_by(team_code=team_code)
+    if team_codes:
+        trainings_query = trainings_query.filter(Training.team_code.in_(team_codes))
     trainings = trainings_query.all()
     training_ids = [t.id for t in trainings]
 
@@ -388,6 +439,53 @@ def load_training_data(team_code=None):
     return trainings, activities_by_training, instances_by_key, instance_activities_by_id
 
 
+# Schreibgeschützte Zeilen für Übersicht, Live-View und API: nur die gelesenen
+# Spalten, ohne ORM-Instrumentierung und außerhalb der Identity-Map
+TrainingRow = namedtuple('TrainingRow', ['id', 'team_code', 'name', 'weekday', 'start_date', 'end_date', 'start_time', 'is_hidden'])
+ActivityRow = namedtuple('ActivityRow', ['id', 'training_id', 'activity_type', 'start_time', 'duration', 'position_groups', 'topic', 'order_index', 'topics_json', 'color'])
+InstanceRow = namedtuple('InstanceRow', ['id', 'training_id', 'date', 'status', 'start_time'])
+InstanceActivityRow = namedtuple('InstanceActivityRow', ['id', 'training_instance_id', 'activity_type', 'start_time', 'duration', 'position_groups', 'topic', 'order_index', 'topics_json', 'color'])
+
+
+def _select_rows(row_type, model, *criteria, order_by=()):
+    statement = select(*(getattr(model, field) for field in row_type._fields)).where(*criteria).order_by(*order_by)
+    return [row_type._make(row) for row in db.session.execute(statement)]
+
+
+def load_training_rows(team_code=None, team_codes=None):
+    """Wie `load_training_data`, aber mit `TrainingRow`, `ActivityRow`, `InstanceRow` und `InstanceActivityRow`."""
+    criteria = []
+    if team_code:
+        criteria.append(Training.team_code == team_code)
+    if team_codes:
+        criteria.append(Training.team_code.in_(team_codes))
+    trainings = _select_rows(TrainingRow, Training, *criteria)
+    training_ids = [t.id for t in trainings]
+
+    activities_by_training: Dict[int, List[ActivityRow]] = {t.id: [] for t in trainings}
+    instances_by_key: Dict[tuple, InstanceRow] = {}
+    instance_activities_by_id: Dict[int, List[InstanceActivityRow]] = {}
+    if not training_ids:
+        return trainings, activities_by_training, instances_by_key, instance_activities_by_id
+
+    for activity in _select_rows(ActivityRow, Activity, Activity.training_id.in_(training_ids), order_by=(Activity.training_id, Activity.order_index)):
+        activities_by_training[activity.training_id].append(activity)
+
+    instances = _select_rows(InstanceRow, TrainingInstance, TrainingInstance.training_id.in_(training_ids))
+    instances_by_key = {(i.training_id, i.date): i for i in instances}
+    instance_ids = [i.id for i in instances]
+    if instance_ids:
+        for activity in _select_rows(
+            InstanceActivityRow,
+            ActivityInstance,
+            ActivityInstance.training_instance_id.in_(instance_ids),
+            order_by=(ActivityInstance.training_instance_id, ActivityInstance.order_index),
+        ):
+            instance_activities_by_id.setdefault(activity.training_instance_id, []).append(activity)
+
+    return trainings, activities_by_training, instances_by_key, instance_activities_by_id
+
+
 def get_current_training_status(trainings: List[Training], activities_by_training: Dict[int, List[Activity]], instances_by_key: Dict[tuple, TrainingInstance], instance_activities_by_id: Dict[int, List[ActivityInstance]], now: datetime):
     """Ermittelt laufendes oder nächstes Training basierend auf vorhandenen Aktivitäten."""
     today = now.date()
@@ -498,6 +596,53 @@ def get_upcoming_trainings(trainings: List[Training], activities_by_training: Di
     upcoming_trainings.sort(key=lambda x: (x['date'], x['start_time']))
     return upcoming_trainings
 
+# Timeline und Zellen lesen nur Spalten; ORM-Objekte und Zeilen sind austauschbar
+ActivityLike = Union[Activity, ActivityInstance, ActivityRow, InstanceActivityRow]
+
+# Unveränderliche Sicht auf ein Training für geteilte Ergebnisse (ohne Session-Bindung)
+TrainingRef = namedtuple('TrainingRef', ['id', 'name', 'weekday', 'team_code', 'is_hidden'])
+
+
+def _occurrence_row(item):
+    training = item['training']
+    row = {key: value for key, value in item.items() if key != 'training'}
+    row['training'] = [training.id, training.name, training.weekday, training.team_code, bool(training.is_hidden)]
+    row['date'] = item['date'].isoformat()
+    row['start_time'] = item['start_time'].strftime('%H:%M:%S')
+    row['end_time'] = item['end_time'].strftime('%H:%M:%S')
+    return row
+
+
+def _hydrate_occurrence(row):
+    item = dict(row)
+    item['training'] = TrainingRef(*row['training'])
+    item['date'] = datetime.strptime(row['date'], '%Y-%m-%d').date()
+    item['start_time'] = dt_time.fromisoformat(row['start_time'])
+    item['end_time'] = dt_time.fromisoformat(row['end_time'])
+    return item
+
+
+def get_upcoming_occurrences(team_codes=None, now: Optional[datetime] = None, data=None):
+    """`get_upcoming_trainings` für die Teams, gebündelt über gleichzeitige Requests und Worker.
+
+    Der Schlüssel besteht aus Teams, Minute und Datenstand; innerhalb einer
+    Minute gelten `is_running`/`is_upcoming` für deren Beginn. `data` ist das
+    Ergebnis von `load_training_rows`, falls der Aufrufer es ohnehin geladen hat.
+    Die Einträge enthalten statt des Trainings ein `TrainingRef`.
+    """
+    bucket = (now or datetime.now()).replace(second=0, microsecond=0)
+    teams = tuple(sorted(set(team_codes))) if team_codes else None
+    key = ('upcoming', teams or '*', bucket.isoformat(), get_data_token(teams))
+
+    def compute():
+        loaded = data
+        if loaded is None:
+            loaded = load_training_rows(team_codes=list(teams) if teams else None)
+        return [_occurrence_row(item) for item in get_upcoming_trainings(*loaded, bucket)]
+
+    return [_hydrate_occurrence(row) for row in get_single_flight().do(key, compute)]
+
+
 def get_text_color_for_bg(bg_color):
     """Berechnet die passende Textfarbe (schwarz/weiß) basierend auf der Hintergrundfarbe."""
     if not bg_color or not bg_color.startswith('#'):
@@ -512,7 +657,7 @@ def get_text_color_for_bg(bg_color):
     except:
         return 'black'
 
-def build_group_cells(activity: Activity) -> List[Dict[str, Any]]:
+def build_group_cells(activity: 'ActivityLike') -> List[Dict[str, Any]]:
     all_groups = get_position_groups()
     group_tone_map = {
         'OL': 0,
@@ -0,0 +1,233 @@
+"""
+Asynchroner Webhook-Versand.
+
+Requests legen Ereignisse nur in der Spool-Tabelle `webhook_event` ab und
+wecken den Worker-Thread. Der Worker liefert fällige Ereignisse in Batches
+über eine wiederverwendete HTTP-Verbindung aus, wiederholt Fehlschläge mit
+exponentiellem Backoff und markiert sie nach WEBHOOK_MAX_ATTEMPTS als `dead`.
+Da die Spool in der Datenbank liegt, überleben Ereignisse Neustarts.
+`dead`-Ereignisse bleiben WEBHOOK_DEAD_RETENTION_DAYS zur Analyse liegen und
+werden danach vom Worker (stündlich) oder per `flask webhooks sweep` gelöscht.
+"""
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+
+import click
+from flask.cli import AppGroup, with_appcontext
+import requests
+from sqlalchemy import delete, func, insert, select, update
+
+from .extensions import db
+from .forking import register_after_fork
+from .models import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = 'webhooks'
+DEAD_SWEEP_INTERVAL = 3600
+
+webhooks_cli = AppGroup('webhooks', help='Webhook-Spool verwalten.')
+
+
+class WebhookDispatcher:
+    table = WebhookEvent.__table__
+
+    def __init__(self, app, send=None):
+        self.app = app
+        self.batch_size = app.config.get('WEBHOOK_BATCH_SIZE', 20)
+        self.max_attempts = app.config.get('WEBHOOK_MAX_ATTEMPTS', 8)
+        self.retry_base = app.config.get('WEBHOOK_RETRY_BASE_SECONDS', 5)
+        self.retry_max = app.config.get('WEBHOOK_RETRY_MAX_SECONDS', 3600)
+        self.timeout = app.config.get('WEBHOOK_TIMEOUT', 5)
+        self.poll_interval = app.config.get('WEBHOOK_POLL_INTERVAL', 30)
+        self.dead_retention_days = app.config.get('WEBHOOK_DEAD_RETENTION_DAYS', 14)
+        self._next_dead_sweep = 0.0
+        self._send = send or self._post
+        self._http = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.counters = {'enqueued': 0, 'delivered': 0, 'failed_attempts': 0, 'dead': 0}
+
+    def _post(self, url, payload):
+        if self._http is None:
+            self._http = requests.Session()
+        response = self._http.post(url, json=payload, timeout=self.timeout)
+        if response.status_code >= 300:
+            raise requests.HTTPError(f'{response.status_code} {response.text[:200]}')
+
+    def retry_delay(self, attempts):
+        return timedelta(seconds=min(self.retry_base * 2 ** (attempts - 1), self.retry_max))
+
+    def enqueue(self, payload, url=None):
+        """Legt ein Ereignis in die Spool und weckt den Worker; blockiert nie auf HTTP."""
+        now = datetime.utcnow()
+        with db.engine.begin() as connection:
+            connection.execute(insert(self.table).values(
+                url=url or self.app.config['WEBHOOK_URL'],
+                payload=payload,
+                status='pending',
+                attempts=0,
+                next_attempt_at=now,
+                created_at=now,
+            ))
+        self.counters['enqueued'] += 1
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        # Lazy pro Prozess, damit der Thread nicht vor einem Gunicorn-Fork entsteht
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='webhook-dispatcher', daemon=True)
+            self._thread.start()
+
+    def reset_after_fork(self):
+        # Threads überleben den Fork nicht, HTTP-Verbindungen dürfen nicht geteilt werden
+        self._http = None
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    delivered = self.deliver_due()
+                    self._maybe_sweep_dead()
+            except Exception:
+                logger.exception('Webhook dispatch failed.')
+                delivered = 0
+            # Voller Batch: sofort weitermachen, sonst auf neue Ereignisse warten
+            if delivered < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _claim_due(self, now):
+        with db.engine.begin() as connection:
+            rows = connection.execute(
+                select(self.table.c.id, self.table.c.url, self.table.c.payload, self.table.c.attempts, self.table.c.next_attempt_at)
+                .where(self.table.c.status == 'pending', self.table.c.next_attempt_at <= now)
+                .order_by(self.table.c.next_attempt_at, self.table.c.id)
+                .limit(self.batch_size)
+            ).all()
+            claimed = []
+            lease_until = now + timedelta(seconds=self.timeout * self.batch_size + 60)
+            for row in rows:
+                # Optimistisches Claiming, damit parallele Worker nicht doppelt senden
+                result = connection.execute(
+                    update(self.table)
+                    .where(self.table.c.id == row.id, self.table.c.next_attempt_at == row.next_attempt_at)
+                    .values(next_attempt_at=lease_until)
+                )
+                if result.rowcount:
+                    claimed.append(row)
+        return claimed
+
+    def deliver_due(self, now=None):
+        """Liefert einen Batch fälliger Ereignisse aus; gibt die Anzahl bearbeiteter zurück."""
+        now = now or datetime.utcnow()
+        claimed = self._claim_due(now)
+        for row in claimed:
+            try:
+                self._send(row.url, row.payload)
+            except Exception as exc:
+                self._record_failure(row, exc, now)
+            else:
+                with db.engine.begin() as connection:
+                    connection.execute(delete(self.table).where(self.table.c.id == row.id))
+                self.counters['delivered'] += 1
+        return len(claimed)
+
+    def _record_failure(self, row, exc, now):
+        attempts = row.attempts + 1
+        dead = attempts >= self.max_attempts
+        self.counters['failed_attempts'] += 1
+        if dead:
+            self.counters['dead'] += 1
+        logger.warning('Webhook %s failed (attempt %s/%s): %s', row.id, attempts, self.max_attempts, exc)
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(self.table)
+                .where(self.table.c.id == row.id)
+                .values(
+                    attempts=attempts,
+                    status='dead' if dead else 'pending',
+                    next_attempt_at=now + self.retry_delay(attempts),
+                    last_error=str(exc)[:255],
+                )
+            )
+
+    def sweep_dead(self, now=None):
+        """Löscht `dead`-Ereignisse, die älter als die Aufbewahrungsfrist sind; gibt die Anzahl zurück."""
+        if not self.dead_retention_days:
+            return 0
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.dead_retention_days)
+        with db.engine.begin() as connection:
+            return connection.execute(
+                delete(self.table).where(self.table.c.status == 'dead', self.table.c.created_at < cutoff)
+            ).rowcount
+
+    def _maybe_sweep_dead(self):
+        monotonic = time.monotonic()
+        if monotonic < self._next_dead_sweep:
+            return
+        self._next_dead_sweep = monotonic + DEAD_SWEEP_INTERVAL
+        removed = self.sweep_dead()
+        if removed:
+            logger.info('Removed %s dead webhook events.', removed)
+
+    def stats(self):
+        with db.engine.connect() as connection:
+            by_status = dict(connection.execute(
+                select(self.table.c.status, func.count()).group_by(self.table.c.status)
+            ).all())
+        return {
+            'queue_depth': by_status.get('pending', 0),
+            'dead': by_status.get('dead', 0),
+            'worker_alive': bool(self._thread and self._thread.is_alive()),
+            'counters': dict(self.counters),
+        }
+
+
+def init_webhooks(app):
+    dispatcher = WebhookDispatcher(app)
+    app.extensions[EXTENSION_KEY] = dispatcher
+    register_after_fork(app, dispatcher.reset_after_fork)
+
+    if app.config.get('WEBHOOK_ENABLED', False):
+        @app.before_request
+        def start_webhook_dispatcher():
+            # Liefert nach einem Neustart auch die noch gespoolten Ereignisse aus
+            dispatcher.start()
+
+
+def get_dispatcher(app):
+    return app.extensions[EXTENSION_KEY]
+
+
+@webhooks_cli.command('sweep')
+@with_appcontext
+def sweep_command():
+    """Löscht `dead`-Ereignisse nach Ablauf von WEBHOOK_DEAD_RETENTION_DAYS."""
+    from flask import current_app
+
+    dispatcher = get_dispatcher(current_app)
+    if not dispatcher.dead_retention_days:
+        click.echo('WEBHOOK_DEAD_RETENTION_DAYS=0: nichts zu tun.')
+        return
+    click.echo(f'{dispatcher.sweep_dead()} fehlgeschlagene Webhooks gelöscht.')
@@ -0,0 +1,59 @@
+# Gunicorn lädt diese Datei automatisch aus dem Arbeitsverzeichnis.
+# Räumt das Prometheus-Multiprocess-Verzeichnis auf (siehe app/metrics.py) und
+# startet mehrere gthread-Worker mit vorab geladener App (siehe app/forking.py).
+# Alle Werte lassen sich per GUNICORN_*-Umgebungsvariable überschreiben.
+import os
+import shutil
+
+
+def _cpu_count():
+    # Berücksichtigt CPU-Affinität (z.B. `docker run --cpuset-cpus`)
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def _default_workers(cpus, threads):
+    # Klassisch 2 * CPUs + 1; mit Threads pro Worker genügen weniger Prozesse.
+    # Obergrenze, damit SQLite-Schreiblocks und RAM im Rahmen bleiben.
+    workers = 2 * cpus + 1 if threads <= 1 else cpus + 1
+    return max(2, min(workers, int(os.environ.get('GUNICORN_MAX_WORKERS', '8'))))
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+workers = int(os.environ.get('GUNICORN_WORKERS') or _default_workers(_cpu_count(), threads))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        # Werte eines früheren Master-Prozesses verwerfen
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def when_ready(server):
+    # Mit preload_app ist die App hier schon geladen, die Worker existieren noch nicht
+    if server.cfg.preload_app:
+        from app.forking import prepare_for_fork
+
+        prepare_for_fork()
+
+
+def post_fork(server, worker):
+    from app.forking import reinit_after_fork
+
+    reinit_after_fork()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -97,6 +97,14 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            # Batch-Migrationen bauen Tabellen neu; mit aktiven Fremdschlüsseln
+            # würde DROP TABLE abhängige Zeilen per ON DELETE CASCADE löschen.
+            # Das PRAGMA wirkt nur außerhalb einer Transaktion.
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -106,6 +114,10 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+        if sqlite:
+            connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+            connection.commit()
+
 
 if context.is_offline_mode():
     run_migrations_offline()
@@ -0,0 +1,40 @@
+"""add composite query indexes
+
+Revision ID: 7c3e5a1f9b42
+Revises: 4a2c9b7d8e01
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e5a1f9b42'
+down_revision = '4a2c9b7d8e01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # TrainingInstance (training_id, date) is already covered by the
+    # uq_training_instance_date unique constraint.
+    with op.batch_alter_table('activity', schema=None) as batch_op:
+        batch_op.create_index('ix_activity_training_order', ['training_id', 'order_index'], unique=False)
+
+    with op.batch_alter_table('activity_instance', schema=None) as batch_op:
+        batch_op.create_index('ix_activity_instance_instance_order', ['training_instance_id', 'order_index'], unique=False)
+
+    with op.batch_alter_table('training', schema=None) as batch_op:
+        batch_op.create_index('ix_training_team_hidden_dates', ['team_code', 'is_hidden', 'start_date', 'end_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('training', schema=None) as batch_op:
+        batch_op.drop_index('ix_training_team_hidden_dates')
+
+    with op.batch_alter_table('activity_instance', schema=None) as batch_op:
+        batch_op.drop_index('ix_activity_instance_instance_order')
+
+    with op.batch_alter_table('activity', schema=None) as batch_op:
+        batch_op.drop_index('ix_activity_training_order')
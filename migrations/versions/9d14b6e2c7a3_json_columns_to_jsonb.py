@@ -0,0 +1,57 @@
+"""json columns to jsonb on postgres
+
+Revision ID: 9d14b6e2c7a3
+Revises: 7c3e5a1f9b42
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d14b6e2c7a3'
+down_revision = '7c3e5a1f9b42'
+branch_labels = None
+depends_on = None
+
+# (table, column, server default, Ersatz für leere Strings bei NOT NULL)
+JSON_COLUMNS = [
+    ('activity', 'position_groups', None, '[]'),
+    ('activity', 'topics_json', None, None),
+    ('activity_instance', 'position_groups', None, '[]'),
+    ('activity_instance', 'topics_json', None, None),
+    ('user', 'memberships_json', '[]', '[]'),
+    ('user', 'permissions_json', '[]', '[]'),
+    ('user', 'claims_json', '{}', '{}'),
+]
+
+
+def _using(column, empty):
+    # '' ist kein gültiges JSON; NOT-NULL-Spalten bekommen den leeren Wert statt NULL
+    if empty is None:
+        return f"NULLIF({column}, '')::jsonb"
+    return f"COALESCE(NULLIF({column}, ''), '{empty}')::jsonb"
+
+
+def upgrade():
+    # SQLite speichert JSON weiterhin als TEXT
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column, default, empty in JSON_COLUMNS:
+        op.execute(f'ALTER TABLE "{table}" ALTER COLUMN {column} DROP DEFAULT')
+        op.execute(f'ALTER TABLE "{table}" ALTER COLUMN {column} TYPE JSONB USING {_using(column, empty)}')
+        if default is not None:
+            op.execute(f"ALTER TABLE \"{table}\" ALTER COLUMN {column} SET DEFAULT '{default}'::jsonb")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column, default, _empty in JSON_COLUMNS:
+        op.execute(f'ALTER TABLE "{table}" ALTER COLUMN {column} DROP DEFAULT')
+        op.execute(f'ALTER TABLE "{table}" ALTER COLUMN {column} TYPE TEXT USING {column}::text')
+        if default is not None:
+            op.execute(f"ALTER TABLE \"{table}\" ALTER COLUMN {column} SET DEFAULT '{default}'")
@@ -0,0 +1,42 @@
+"""cascade training foreign keys
+
+Revision ID: a3d8f2c6e9b1
+Revises: f1c7a3e9d2b5
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d8f2c6e9b1'
+down_revision = 'f1c7a3e9d2b5'
+branch_labels = None
+depends_on = None
+
+FOREIGN_KEYS = [
+    ('activity', 'training_id', 'training'),
+    ('training_instance', 'training_id', 'training'),
+    ('activity_instance', 'training_instance_id', 'training_instance'),
+]
+
+# Entspricht den Standardnamen von Postgres; unter SQLite benennt Batch die
+# unbenannten, reflektierten Constraints danach, damit sie löschbar sind.
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def _replace_foreign_keys(ondelete):
+    for table, column, referred in FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _replace_foreign_keys(None)
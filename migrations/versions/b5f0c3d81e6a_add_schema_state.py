@@ -0,0 +1,29 @@
+"""add schema state
+
+Revision ID: b5f0c3d81e6a
+Revises: 9d14b6e2c7a3
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5f0c3d81e6a'
+down_revision = '9d14b6e2c7a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('schema_state',
+    sa.Column('key', sa.String(length=40), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('schema_state')
@@ -0,0 +1,26 @@
+"""add user auth payload hash
+
+Revision ID: c2a7e94d5b10
+Revises: b5f0c3d81e6a
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2a7e94d5b10'
+down_revision = 'b5f0c3d81e6a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('auth_payload_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('auth_payload_hash')
@@ -0,0 +1,34 @@
+"""add server session
+
+Revision ID: d8e3f1a4b7c2
+Revises: c2a7e94d5b10
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e3f1a4b7c2'
+down_revision = 'c2a7e94d5b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('server_session',
+    sa.Column('id', sa.String(length=64), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('server_session', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_server_session_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('server_session', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_server_session_expires_at'))
+
+    op.drop_table('server_session')
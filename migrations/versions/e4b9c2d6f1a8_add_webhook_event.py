@@ -0,0 +1,42 @@
+"""add webhook event spool
+
+Revision ID: e4b9c2d6f1a8
+Revises: d8e3f1a4b7c2
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b9c2d6f1a8'
+down_revision = 'd8e3f1a4b7c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    payload_type = postgresql.JSONB() if bind.dialect.name == 'postgresql' else sa.Text()
+    op.create_table('webhook_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(length=500), nullable=False),
+    sa.Column('payload', payload_type, nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('webhook_event', schema=None) as batch_op:
+        batch_op.create_index('ix_webhook_event_status_due', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('webhook_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_webhook_event_status_due')
+
+    op.drop_table('webhook_event')
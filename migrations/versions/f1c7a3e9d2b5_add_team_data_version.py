@@ -0,0 +1,29 @@
+"""add team data version
+
+Revision ID: f1c7a3e9d2b5
+Revises: e4b9c2d6f1a8
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c7a3e9d2b5'
+down_revision = 'e4b9c2d6f1a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('team_data_version',
+    sa.Column('team_code', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('team_code')
+    )
+
+
+def downgrade():
+    op.drop_table('team_data_version')
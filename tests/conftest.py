@@ -1,9 +1,46 @@
+from contextlib import contextmanager
+
 import pytest
+from flask import request as flask_request, request_finished, request_started
+from sqlalchemy import event
+
 from app import create_app, db
 from app.models import User
 
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'max_queries(limit): Obergrenze für SQL-Statements pro Request')
+
+
+class QueryRecorder:
+    """Sammelt die SQL-Statements, die über die App-Engine laufen."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def report(self):
+        return '\n'.join(f'  {index + 1}. {statement}' for index, statement in enumerate(self.statements))
+
+@pytest.fixture
+def isolated_paths(tmp_path):
+    """Dateien, die die App selbst anlegt, unter tmp_path statt im Instance-Ordner."""
+    return {
+        'SESSION_SQLITE_PATH': str(tmp_path / 'sessions.db'),
+        'ASSETS_BUILD_DIR': str(tmp_path / 'assets'),
+        'JINJA_CACHE_DIR': str(tmp_path / 'jinja-cache'),
+        'SINGLE_FLIGHT_DIR': str(tmp_path / 'single-flight'),
+        'SCHEMA_LOCK_PATH': str(tmp_path / 'schema.lock'),
+    }
+
 @pytest.fixture
-def app(tmp_path):
+def app(tmp_path, isolated_paths):
     db_path = tmp_path / 'test.db'
 
     class TestConfig:
@@ -15,7 +52,10 @@ def app(tmp_path):
         LOG_LEVEL = 'DEBUG'
         AUTO_CREATE_DB = False
         CREATE_DEFAULT_USERS = False
+        RAISE_ON_LAZY_LOAD = True
 
+    for name, value in isolated_paths.items():
+        setattr(TestConfig, name, value)
     app = create_app(TestConfig)
     with app.app_context():
         db.create_all()
@@ -63,3 +103,52 @@ def login_as(client, create_user, csrf_token):
             sess['user_role'] = role
         return client.get('/', follow_redirects=False)
     return _login_as
+
+
+@pytest.fixture
+def count_queries(app):
+    """`with count_queries() as queries: client.get(...)`; danach `queries.count`."""
+    @contextmanager
+    def _count_queries():
+        recorder = QueryRecorder()
+        event.listen(db.engine, 'before_cursor_execute', recorder)
+        try:
+            yield recorder
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', recorder)
+    return _count_queries
+
+
+@pytest.fixture(autouse=True)
+def enforce_max_queries(request):
+    """Prüft `@pytest.mark.max_queries(n)` für jeden Request, den der Test auslöst."""
+    marker = request.node.get_closest_marker('max_queries')
+    if marker is None:
+        yield
+        return
+
+    app = request.getfixturevalue('app')
+    limit = marker.args[0]
+    recorded = []
+
+    def started(sender, **extra):
+        recorder = QueryRecorder()
+        event.listen(db.engine, 'before_cursor_execute', recorder)
+        recorded.append([flask_request.full_path, recorder])
+
+    def finished(sender, response, **extra):
+        event.remove(db.engine, 'before_cursor_execute', recorded[-1][1])
+
+    request_started.connect(started, app)
+    request_finished.connect(finished, app)
+    try:
+        yield
+    finally:
+        request_started.disconnect(started, app)
+        request_finished.disconnect(finished, app)
+
+    over_budget = [(path, recorder) for path, recorder in recorded if recorder.count > limit]
+    assert not over_budget, '\n'.join(
+        f'{path}: {recorder.count} SQL-Statements (Budget {limit})\n{recorder.report()}'
+        for path, recorder in over_budget
+    )
@@ -332,3 +332,28 @@ def test_json_type_stores_and_reads_list(app):
         assert isinstance(loaded.topics_json, dict)
         assert loaded.topics_json.get('OL') == 'Run Block'
 
+
+
+def test_json_type_uses_jsonb_on_postgres():
+    from sqlalchemy.dialects import postgresql, sqlite
+    from sqlalchemy.dialects.postgresql import JSONB
+    from sqlalchemy.types import Text
+    from app.models import JsonType
+
+    json_type = JsonType()
+    assert isinstance(json_type.load_dialect_impl(postgresql.dialect()), JSONB)
+    assert isinstance(json_type.load_dialect_impl(sqlite.dialect()), Text)
+
+    # Legacy-Strings werden für JSONB dekodiert, bereits dekodierte Werte bleiben erhalten
+    assert json_type.process_bind_param('["OL","DL"]', postgresql.dialect()) == ['OL', 'DL']
+    assert json_type.process_result_value([], postgresql.dialect()) == []
+
+
+def test_json_codec_matches_stdlib():
+    import json
+    from app import json_codec
+
+    value = {'OL': 'Run Block', 'groups': ['ÄÖÜ', 1, 2.5, None, True], 'nested': {'x': []}}
+    encoded = json_codec.dumps(value)
+    assert encoded == json.dumps(value, ensure_ascii=False)
+    assert json_codec.loads(encoded) == json.loads(encoded)
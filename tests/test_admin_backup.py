@@ -35,3 +35,39 @@ def test_admin_backup_download_redirects_for_non_sqlite(client, login_as, monkey
 
     assert response.status_code == 302
     assert response.headers['Location'].endswith('/admin/backup')
+
+
+def test_restore_advances_data_versions_past_live_state(app, client, login_as, tmp_path):
+    import io
+    import sqlite3
+
+    from app.data_version import GLOBAL_SCOPE, bump_data_versions, read_data_versions
+    from app.extensions import db
+
+    login_as(username='admin', password='secret', role='admin')
+    bump_data_versions(['SENIORS'])
+    backup_path = tmp_path / 'backup.db'
+    db.session.remove()
+    with sqlite3.connect(str(tmp_path / 'test.db')) as source, sqlite3.connect(str(backup_path)) as target:
+        source.backup(target)
+    # Nach dem Backup ändert sich der Stand weiter
+    bump_data_versions(['SENIORS', 'U19'])
+    bump_data_versions(['SENIORS'])
+    assert read_data_versions() == {'SENIORS': 3, 'U19': 1}
+
+    stale_result = tmp_path / 'single-flight' / 'stale.json'
+    stale_result.parent.mkdir(exist_ok=True)
+    stale_result.write_text('{}')
+
+    client.get('/admin/backup')
+    with client.session_transaction() as sess:
+        token = sess['_csrf_token']
+    response = client.post('/admin/backup/restore', data={
+        'csrf_token': token,
+        'backup_file': (io.BytesIO(backup_path.read_bytes()), 'backup.db'),
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 302
+    # Jede Version liegt über Live- und Backup-Stand, kein Token wiederholt sich
+    assert read_data_versions() == {'SENIORS': 4, 'U19': 2, GLOBAL_SCOPE: 1}
+    assert not stale_result.exists()
@@ -0,0 +1,66 @@
+import gzip
+import json
+import re
+
+from app.assets import AssetManifest, get_asset_manifest, static_url
+
+
+def test_static_url_uses_content_hash(app):
+    with app.test_request_context():
+        url = static_url('manifest.json')
+        assert re.fullmatch(r'/assets/manifest\.[0-9a-f]{12}\.json', url)
+        assert static_url('does-not-exist.css') == '/static/does-not-exist.css'
+
+
+def test_web_app_manifest_keeps_stable_id(app, client):
+    # Die Manifest-URL ändert sich mit jedem Inhalt; die App-Identität hängt an "id"
+    with app.test_request_context():
+        url = static_url('manifest.json')
+    manifest = json.loads(client.get(url).data)
+    assert manifest['id'] == '/'
+
+
+def test_hashed_asset_is_immutable_and_precompressed(app, client):
+    with app.test_request_context():
+        url = static_url('js/table_enhancements.js')
+
+    plain = client.get(url)
+    assert plain.status_code == 200
+    assert 'immutable' in plain.headers['Cache-Control']
+    assert 'max-age=31536000' in plain.headers['Cache-Control']
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    assert 'Content-Encoding' not in plain.headers
+
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.mimetype == 'text/javascript'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+
+
+def test_unknown_or_stale_hash_returns_404(client):
+    assert client.get('/assets/manifest.000000000000.json').status_code == 404
+
+
+def test_manifest_version_follows_content(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'app.css').write_text('body { color: red; }')
+    (static / 'service-worker.js').write_text('// sw')
+    first = AssetManifest(str(static), str(tmp_path / 'build')).scan()
+    assert list(first.hashed) == ['app.css']
+
+    (static / 'app.css').write_text('body { color: blue; }')
+    second = AssetManifest(str(static), str(tmp_path / 'build')).scan()
+    assert second.hashed['app.css'] != first.hashed['app.css']
+    assert second.version != first.version
+
+
+def test_service_worker_gets_asset_version_and_precache_urls(app, client):
+    response = client.get('/service-worker.js')
+    body = response.get_data(as_text=True)
+    assert response.mimetype == 'application/javascript'
+    assert f'const ASSET_VERSION = "{get_asset_manifest(app).version}";' in body
+    with app.test_request_context():
+        assert static_url('tt-logo.png') in body
+    assert '__PRECACHE_URLS__' not in body
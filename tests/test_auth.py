@@ -17,3 +17,153 @@ def test_logout_clears_session(client, csrf_token):
         assert 'user_id' not in sess
         assert 'username' not in sess
         assert 'user_role' not in sess
+
+
+def _sso_token(app, **claims):
+    import time
+    import jwt
+
+    payload = {
+        'sub': '42',
+        'username': 'sso-user',
+        'aud': 'tt-agenda',
+        'iat': int(time.time()),
+        'exp': int(time.time()) + 60,
+        'memberships': [{'team_code': 'SENIORS', 'team_name': 'Seniors'}],
+        'permissions': ['agenda:read'],
+    }
+    payload.update(claims)
+    return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+
+
+def test_sso_login_skips_write_when_claims_unchanged(client, app):
+    from sqlalchemy import event
+    from app.extensions import db
+
+    response = client.get('/auth/sso', query_string={'token': _sso_token(app)})
+    assert response.status_code == 302
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        # Neues Token (andere iat/exp), gleiche Claims
+        response = client.get('/auth/sso', query_string={'token': _sso_token(app, iat=1, exp=4102444800)})
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 302
+    assert not [s for s in statements if s.lstrip().upper().startswith(('UPDATE', 'INSERT'))]
+
+
+def test_sso_login_writes_changed_memberships(client, app):
+    from app.models import User
+
+    client.get('/auth/sso', query_string={'token': _sso_token(app)})
+    client.get('/auth/sso', query_string={'token': _sso_token(app, memberships=[{'team_code': 'U19', 'team_name': 'U19'}])})
+
+    with app.app_context():
+        user = User.query.filter_by(auth_user_id=42).one()
+        assert user.memberships_json == [{'team_code': 'U19', 'team_name': 'U19'}]
+
+
+def test_bulk_user_sync_requires_secret(client):
+    response = client.post('/api/internal/users/sync', json={'users': []})
+    assert response.status_code == 401
+
+
+def test_bulk_user_sync_provisions_and_detects_unchanged(client, app):
+    app.config['INTERNAL_API_SECRET'] = 'internal-secret'
+    headers = {'X-TT-Internal-Secret': 'internal-secret'}
+    users = [
+        {'sub': 7, 'username': 'coach', 'permissions': ['agenda:write'], 'memberships': [{'team_code': 'SENIORS'}]},
+        {'sub': 8, 'username': 'player', 'permissions': ['agenda:read']},
+        {'username': 'missing-sub'},
+    ]
+
+    first = client.post('/api/internal/users/sync', json={'users': users}, headers=headers).get_json()
+    assert first['created'] == 2
+    assert first['errors'] == [{'index': 2, 'error': 'invalid_sub'}]
+
+    users[1]['permissions'] = ['agenda:read', 'profile:read']
+    second = client.post('/api/internal/users/sync', json={'users': users[:2]}, headers=headers).get_json()
+    assert second['unchanged'] == 1
+    assert second['updated'] == 1
+
+
+def test_bulk_user_sync_reports_conflicts_per_entry(client, app):
+    from app.models import User
+
+    app.config['INTERNAL_API_SECRET'] = 'internal-secret'
+    headers = {'X-TT-Internal-Secret': 'internal-secret'}
+    client.post('/api/internal/users/sync', json={'users': [
+        {'sub': 7, 'username': 'coach'},
+        {'sub': 8, 'username': 'player'},
+    ]}, headers=headers)
+
+    response = client.post('/api/internal/users/sync', json={'users': [
+        {'sub': 7, 'username': 'player'},
+        {'sub': 9, 'username': 'keeper'},
+    ]}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['errors'] == [{'index': 0, 'error': 'conflict'}]
+    assert body['created'] == 1
+    assert User.query.filter_by(auth_user_id=7).one().username == 'coach'
+    assert User.query.filter_by(auth_user_id=9).one().username == 'keeper'
+
+
+def test_bulk_user_sync_respects_sso_sync_role(client, app, create_user):
+    from app.models import User
+
+    app.config['INTERNAL_API_SECRET'] = 'internal-secret'
+    app.config['SSO_SYNC_ROLE'] = False
+    create_user(username='coach', role='user')
+
+    body = client.post('/api/internal/users/sync', json={'users': [
+        {'sub': 7, 'username': 'coach', 'service_role': 'admin'},
+    ]}, headers={'X-TT-Internal-Secret': 'internal-secret'}).get_json()
+
+    assert body['unchanged'] == 1
+    assert User.query.filter_by(username='coach').one().role == 'user'
+
+
+def test_auth_context_is_built_once_per_request(client, app, create_user, monkeypatch):
+    from app import authz
+
+    user = create_user(username='coach')
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+        sess['username'] = 'coach'
+        sess['permissions'] = ['team:u19:write']
+        sess['memberships'] = [{'team_code': 'u19', 'team_name': 'U19'}, {'team_code': 'SENIORS'}]
+        sess['active_team_code'] = 'unknown'
+
+    calls = []
+    original = authz.AuthContext.from_session.__func__
+    monkeypatch.setattr(authz.AuthContext, 'from_session', classmethod(lambda cls, data: calls.append(1) or original(cls, data)))
+
+    response = client.get('/')
+    assert response.status_code == 200
+    assert len(calls) == 1
+    with client.session_transaction() as sess:
+        assert sess['active_team_code'] == 'SENIORS'
+
+
+def test_auth_context_permissions_and_teams():
+    from app.authz import AuthContext
+
+    viewer = AuthContext(permissions=['agenda:read'], memberships=[{'team_code': 'u19', 'team_name': 'U19'}], active_team_code='u19')
+    assert viewer.can_view_agenda and not viewer.can_manage_agenda
+    assert viewer.active_team_code == 'U19' and not viewer.active_team_fallback
+    assert viewer.teams == [{'code': 'U19', 'name': 'U19'}]
+
+    admin = AuthContext(permissions=['*'])
+    assert admin.can_manage_agenda and admin.is_platform_admin
+    assert admin.active_team_code == 'SENIORS' and admin.active_team_fallback
@@ -0,0 +1,78 @@
+import gc
+import json
+from datetime import date
+import os
+
+from app.benchmark import compare_results, create_benchmark_app, generate_dataset, run_benchmarks
+from app.models import Activity, Training, TrainingInstance
+from app.schema import ensure_activity_types
+from app.single_flight import get_single_flight
+
+
+def test_generate_dataset_is_seeded(app):
+    counts = generate_dataset(teams=2, trainings=2, activities=3, seasons=2, seed=7, today=date(2026, 10, 19))
+
+    assert counts['trainings'] == Training.query.count() == 8
+    assert counts['activities'] == Activity.query.count() == 24
+    assert counts['instances'] == TrainingInstance.query.count() > 0
+    assert {row.team_code for row in Training.query.all()} == {'TEAM01', 'TEAM02'}
+    # Gleicher Seed, gleiche Daten
+    assert generate_dataset(teams=2, trainings=2, activities=3, seasons=2, seed=7, today=date(2026, 10, 19)) == counts
+
+
+def test_run_benchmarks_reports_latency_sql_and_memory(app):
+    ensure_activity_types()
+    generate_dataset(teams=1, trainings=2, activities=4, seasons=1)
+    app.config['INTERNAL_API_SECRET'] = 'internal-secret'
+
+    result = run_benchmarks(app, iterations=2, warmup=0)
+
+    assert set(result['cases']) >= {'get_upcoming_trainings', 'view:index', 'view:live', 'view:api_trainings'}
+    for metrics in result['cases'].values():
+        assert metrics['ops_per_sec'] > 0
+        assert metrics['p95_ms'] >= metrics['p50_ms'] > 0
+        assert metrics['peak_memory_kb'] > 0
+    assert result['cases']['get_upcoming_trainings']['sql_statements'] == 0
+    assert result['cases']['view:api_trainings']['sql_statements'] > 0
+    json.dumps(result)
+
+
+def test_run_benchmarks_records_fixed_today(app):
+    ensure_activity_types()
+    generate_dataset(teams=1, trainings=2, activities=4, seasons=1, today=date(2026, 10, 19))
+
+    result = run_benchmarks(app, iterations=1, warmup=0, cases=['get_upcoming_trainings'], today=date(2026, 10, 19))
+
+    assert result['meta']['today'] == '2026-10-19'
+
+
+def test_benchmark_app_measures_uncached_results(tmp_path):
+    bench_app = create_benchmark_app(os.fspath(tmp_path))
+
+    # Ohne Worker-Koordination rechnet jede Iteration selbst statt die Ergebnisdatei zu lesen
+    assert get_single_flight(bench_app).directory is None
+    assert bench_app.config['SESSION_SQLITE_PATH'].startswith(os.fspath(tmp_path))
+
+
+def test_bench_command_uses_given_today(runner, tmp_path):
+    output = tmp_path / 'bench.json'
+
+    result = runner.invoke(args=[
+        'perf', 'bench', '--teams', '1', '--trainings', '1', '--activities', '2', '--seasons', '1',
+        '--iterations', '1', '--warmup', '0', '--case', 'get_upcoming_trainings',
+        '--today', '2025-03-03', '--output', os.fspath(output),
+    ])
+
+    assert result.exit_code == 0, result.output
+    assert json.loads(output.read_text())['meta']['today'] == '2025-03-03'
+    # Die Bench-App samt gelöschtem Arbeitsverzeichnis nicht in späteren Tests (prepare_for_fork) sehen
+    gc.collect()
+
+
+def test_compare_flags_regressions():
+    case = {'ops_per_sec': 100.0, 'p50_ms': 10.0, 'p95_ms': 12.0, 'sql_statements': 4.0}
+    baseline = {'cases': {'view:index': case}}
+
+    assert compare_results(baseline, {'cases': {'view:index': dict(case, p50_ms=11.0)}}) == []
+    regressions = compare_results(baseline, {'cases': {'view:index': dict(case, p95_ms=20.0, sql_statements=12.0)}})
+    assert {item['metric'] for item in regressions} == {'p95_ms', 'sql_statements'}
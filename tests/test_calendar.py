@@ -0,0 +1,139 @@
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app import calendar_feed, utils
+from app.calendar_feed import calendar_token, escape_text, feed_validators, fold_line
+from app.data_version import DataVersion
+from app.extensions import db
+from app.models import Activity, ActivityInstance, Training, TrainingInstance
+from app.schema import ensure_activity_types
+
+TEAM = 'TEAM01'
+
+
+@pytest.fixture
+def feed_data(app):
+    ensure_activity_types()
+    today = date.today()
+    training = Training(
+        team_code=TEAM,
+        name='Training, Dienstag',
+        weekday=(today + timedelta(days=1)).weekday(),
+        start_date=today,
+        end_date=today + timedelta(days=21),
+        start_time=time(18, 0),
+    )
+    db.session.add(training)
+    db.session.flush()
+    db.session.add(Activity(training_id=training.id, activity_type='team', start_time=time(18, 0), duration=30, topic='Aufwärmen'))
+    first, second = today + timedelta(days=1), today + timedelta(days=8)
+    cancelled = TrainingInstance(training_id=training.id, date=first, status='cancelled', start_time=time(18, 0))
+    individual = TrainingInstance(training_id=training.id, date=second, status='active', start_time=time(18, 0))
+    db.session.add_all([cancelled, individual])
+    db.session.flush()
+    db.session.add(ActivityInstance(training_instance_id=individual.id, activity_type='team', start_time=time(18, 0), duration=45, topic='Scrimmage'))
+    db.session.commit()
+    return training, first, second
+
+
+def _feed_url(app, team=TEAM):
+    with app.test_request_context():
+        return f'/calendar/{team}.ics?token={calendar_token(team)}'
+
+
+def _unfold(body):
+    return body.replace('\r\n ', '')
+
+
+def test_feed_requires_valid_token(app, client, feed_data):
+    assert client.get(f'/calendar/{TEAM}.ics').status_code == 404
+    assert client.get(f'/calendar/{TEAM}.ics?token=wrong').status_code == 404
+    # Ein Token gilt nur für sein Team
+    with app.test_request_context():
+        other_token = calendar_token('TEAM02')
+    assert client.get(f'/calendar/{TEAM}.ics?token={other_token}').status_code == 404
+
+
+def test_feed_marks_cancelled_and_individual_occurrences(app, client, feed_data):
+    training, first, second = feed_data
+    response = client.get(_feed_url(app))
+    assert response.status_code == 200
+    assert response.mimetype == 'text/calendar'
+    body = _unfold(response.get_data(as_text=True))
+    events = body.split('BEGIN:VEVENT')[1:]
+
+    cancelled = next(event for event in events if f'UID:{training.id}-{first:%Y%m%d}@' in event)
+    assert 'STATUS:CANCELLED' in cancelled
+    individual = next(event for event in events if f'UID:{training.id}-{second:%Y%m%d}@' in event)
+    assert 'STATUS:CONFIRMED' in individual
+    assert 'Scrimmage' in individual and 'Aufwärmen' not in individual
+    end = datetime.combine(second, time(18, 45), tzinfo=ZoneInfo('Europe/Zurich')).astimezone(timezone.utc)
+    assert f'DTEND:{end:%Y%m%dT%H%M%SZ}' in individual
+    assert 'TZID' not in body
+    regular = [event for event in events if event not in (cancelled, individual)]
+    assert regular and all('Aufwärmen' in event for event in regular)
+    assert 'SUMMARY:Training\\, Dienstag' in body
+    assert all(len(line.encode('utf-8')) <= 75 for line in response.get_data(as_text=True).split('\r\n'))
+
+
+def test_unchanged_feed_is_revalidated_with_304(app, client, count_queries, feed_data):
+    url = _feed_url(app)
+    first = client.get(url)
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified']
+
+    with count_queries() as recorder:
+        cached = client.get(url, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert [statement for statement in recorder.statements if 'FROM training' in statement] == []
+
+    modified = client.get(url, headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert modified.status_code == 304
+
+
+def test_feed_does_not_wait_for_infra(app, client, monkeypatch, feed_data):
+    calls = []
+    monkeypatch.setattr(utils.requests, 'get', lambda *args, **kwargs: calls.append(args))
+
+    assert client.get(_feed_url(app)).status_code == 200
+    assert calls == []
+
+
+def test_feed_is_compressed(app, client, feed_data):
+    response = client.get(_feed_url(app), headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_feed_changes_when_team_data_changes(app, client, feed_data):
+    training, _first, _second = feed_data
+    url = _feed_url(app)
+    etag = client.get(url).headers['ETag']
+
+    training.name = 'Donnerstag'
+    db.session.commit()
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'SUMMARY:Donnerstag' in response.get_data(as_text=True)
+
+
+def test_last_modified_compares_utc_times(app, monkeypatch):
+    today = date(2026, 10, 19)
+    # 23:30 UTC am Vortag ist in Zürich schon der 19., also nach lokaler Mitternacht
+    updated_at = datetime(2026, 10, 18, 23, 30)
+    monkeypatch.setattr(calendar_feed, 'get_data_version', lambda team: DataVersion(team, 1, 0, updated_at))
+
+    _version, _etag, last_modified = feed_validators(TEAM, today)
+
+    assert last_modified == updated_at.replace(tzinfo=timezone.utc)
+
+
+def test_text_helpers_follow_rfc5545():
+    assert escape_text('a,b;c\\d\ne') == 'a\\,b\\;c\\\\d\\ne'
+    folded = fold_line('DESCRIPTION:' + 'ä' * 80)
+    assert all(len(part.encode('utf-8')) <= 75 for part in folded.split('\r\n'))
+    assert folded.replace('\r\n ', '') == 'DESCRIPTION:' + 'ä' * 80
@@ -0,0 +1,62 @@
+import gzip
+
+from flask import Response, stream_with_context
+
+
+def test_html_is_gzipped_with_weak_etag(client, login_as):
+    login_as()
+    plain = client.get('/')
+    compressed = client.get('/', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) < len(plain.data)
+
+    etag = compressed.headers['ETag']
+    assert etag.startswith('W/')
+    revalidated = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    # Ohne Kompression bleiben 200 und 304 beim starken ETag
+    plain_revalidated = client.get('/', headers={'If-None-Match': plain.headers['ETag']})
+    assert plain_revalidated.status_code == 304
+    assert plain_revalidated.headers['ETag'] == plain.headers['ETag']
+
+
+def test_small_responses_stay_uncompressed(client):
+    response = client.get('/health', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_blueprint_can_skip_compression(app, client):
+    app.config['INTERNAL_API_SECRET'] = 'internal-secret'
+    headers = {'Accept-Encoding': 'gzip', 'X-TT-Internal-Secret': 'internal-secret'}
+    app.config['COMPRESSION_MIN_SIZE'] = 0
+    compressed = client.get('/api/trainings', headers=headers)
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.mimetype == 'application/json'
+
+    app.config['COMPRESSION_SKIP_BLUEPRINTS'] = {'api'}
+    response = client.get('/api/trainings', headers=headers)
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_streamed_response_is_compressed_in_chunks(app, client):
+    @app.route('/_stream')
+    def stream():
+        def generate():
+            for index in range(50):
+                yield f'<p>Zeile {index}</p>\n'
+        return Response(stream_with_context(generate()), mimetype='text/html')
+
+    response = client.get('/_stream', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    body = gzip.decompress(response.data).decode('utf-8')
+    assert body.count('<p>') == 50
@@ -0,0 +1,106 @@
+import gc
+import json
+import os
+import runpy
+
+import pytest
+import requests
+
+from app.extensions import db
+from app import metrics
+from app.forking import prepare_for_fork, reinit_after_fork
+from app.webhooks import get_dispatcher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _fork_and_inspect(app, reinit):
+    """Forkt wie Gunicorn und meldet, welche Verbindungen das Kind mit dem Elternprozess teilt."""
+    db.session.remove()
+    with db.engine.connect() as connection:
+        parent_dbapi = connection.connection.dbapi_connection
+    store = app.session_interface.store
+    parent_session_connection = store._connect()
+    dispatcher = get_dispatcher(app)
+    dispatcher._http = parent_http = requests.Session()
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - läuft im Kindprozess
+        try:
+            if reinit:
+                reinit_after_fork()
+            with db.engine.connect() as connection:
+                engine_shared = connection.connection.dbapi_connection is parent_dbapi
+            result = {
+                'engine': engine_shared,
+                'sessions': store._connect() is parent_session_connection,
+                'http': dispatcher._http is parent_http,
+            }
+            os.write(write_fd, json.dumps(result).encode('utf-8'))
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as handle:
+        payload = handle.read()
+    os.waitpid(pid, 0)
+    return json.loads(payload)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='os.fork nicht verfügbar')
+def test_fork_without_reinit_shares_connections(app):
+    # Gegenprobe: ohne post_fork-Hook erbt der Worker die Verbindungen des Masters
+    shared = _fork_and_inspect(app, reinit=False)
+    assert shared == {'engine': True, 'sessions': True, 'http': True}
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='os.fork nicht verfügbar')
+def test_post_fork_reinit_shares_no_connection(app):
+    shared = _fork_and_inspect(app, reinit=True)
+    assert shared == {'engine': False, 'sessions': False, 'http': False}
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='os.fork nicht verfügbar')
+def test_post_fork_reinit_resets_worker_start_time(app):
+    gauge = metrics._metrics.worker_start
+    # Startzeit des Masters (preload_app) deutlich in der Vergangenheit
+    gauge.set(1000.0)
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - läuft im Kindprozess
+        try:
+            reinit_after_fork()
+            os.write(write_fd, json.dumps(gauge._value.get()).encode('utf-8'))
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as handle:
+        worker_start = json.loads(handle.read())
+    os.waitpid(pid, 0)
+
+    assert worker_start > 1000.0
+    assert gauge._value.get() == 1000.0
+
+
+def test_prepare_for_fork_preloads_templates(app):
+    try:
+        prepare_for_fork()
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+    cached = {name for _env, name in app.jinja_env.cache.keys()} if app.jinja_env.cache else set()
+    assert {'index.html', 'base.html', 'login.html'} <= cached
+
+
+def test_worker_count_heuristics():
+    config = runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+    default_workers = config['_default_workers']
+    assert default_workers(cpus=4, threads=4) == 5
+    assert default_workers(cpus=1, threads=4) == 2
+    assert default_workers(cpus=2, threads=1) == 5
+    assert default_workers(cpus=16, threads=1) == 8
+    assert config['preload_app'] is True
+    assert callable(config['post_fork'])
@@ -0,0 +1,128 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+from app.data_version import get_data_version
+from app.extensions import db
+from app.fragment_cache import CSRF_PLACEHOLDER, FragmentCache, get_fragment_cache
+from app.models import ActivityInstance, ActivityType, Training, TrainingInstance
+from app.schema import ensure_activity_types
+
+TEAM = 'TEAM01'
+
+
+def _login(client, user, team=TEAM):
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+        sess['username'] = user.username
+        sess['user_role'] = 'admin'
+        sess['memberships'] = [{'team_code': team, 'team_name': team}]
+        sess['active_team_code'] = team
+        sess['webhook_sent'] = True
+    return client
+
+
+@pytest.fixture
+def admin_client(app, client, create_user):
+    ensure_activity_types()
+    return _login(client, create_user(username='coach', role='admin'))
+
+
+def _training(name='Dienstag', team=TEAM):
+    today = date.today()
+    training = Training(
+        team_code=team,
+        name=name,
+        weekday=today.weekday(),
+        start_date=today - timedelta(days=7),
+        end_date=today + timedelta(days=60),
+        start_time=time(18, 0),
+    )
+    db.session.add(training)
+    db.session.commit()
+    return training
+
+
+def _training_queries(recorder):
+    return [statement for statement in recorder.statements if 'FROM training' in statement]
+
+
+def test_second_request_is_served_from_cache(app, admin_client, count_queries):
+    _training()
+    first = admin_client.get('/admin/trainings')
+    assert first.status_code == 200
+
+    with count_queries() as recorder:
+        second = admin_client.get('/admin/trainings')
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert _training_queries(recorder) == []
+    assert get_fragment_cache(app).hits >= 1
+
+
+def test_changes_invalidate_the_fragment(admin_client):
+    training = _training('Alter Name')
+    assert b'Alter Name' in admin_client.get('/admin/trainings/partial').data
+
+    training.name = 'Neuer Name'
+    db.session.commit()
+    body = admin_client.get('/admin/trainings/partial').data
+    assert b'Neuer Name' in body
+    assert b'Alter Name' not in body
+
+    db.session.delete(training)
+    db.session.commit()
+    assert b'Neuer Name' not in admin_client.get('/admin/trainings/partial').data
+
+
+def test_each_session_gets_its_own_csrf_token(app, create_user):
+    ensure_activity_types()
+    _training()
+    first = _login(app.test_client(), create_user(username='coach1', role='admin'))
+    second = _login(app.test_client(), create_user(username='coach2', role='admin'))
+
+    first_body = first.get('/admin/trainings/partial').get_data(as_text=True)
+    second_body = second.get('/admin/trainings/partial').get_data(as_text=True)
+    with first.session_transaction() as sess:
+        first_token = sess['_csrf_token']
+    with second.session_transaction() as sess:
+        second_token = sess['_csrf_token']
+
+    assert first_token != second_token
+    assert first_token in first_body and second_token not in first_body
+    assert second_token in second_body and first_token not in second_body
+    assert CSRF_PLACEHOLDER not in first_body + second_body
+
+
+def test_data_version_tracks_nested_changes_per_team(app):
+    training = _training()
+    _training('Andere', team='TEAM02')
+    with app.test_request_context():
+        before = get_data_version(TEAM).token
+        other_before = get_data_version('TEAM02').token
+
+    instance = TrainingInstance(training_id=training.id, date=date.today(), start_time=time(18, 0))
+    db.session.add(instance)
+    db.session.commit()
+    db.session.add(ActivityInstance(training_instance_id=instance.id, activity_type='drill', start_time=time(18, 0), duration=10))
+    db.session.commit()
+
+    with app.test_request_context():
+        assert get_data_version(TEAM).token != before
+        assert get_data_version('TEAM02').token == other_before
+
+    db.session.add(ActivityType(key='extra', label='Extra', behavior='individual', badge_class='badge'))
+    db.session.commit()
+    with app.test_request_context():
+        assert get_data_version('TEAM02').token != other_before
+
+
+def test_lru_evicts_oldest_entry():
+    cache = FragmentCache(size=2)
+    cache.set('a', ('A', 1))
+    cache.set('b', ('B', 1))
+    cache.get('a')
+    cache.set('c', ('C', 1))
+    assert cache.get('b') is None
+    assert cache.get('a') == ('A', 1)
+    assert len(cache) == 2
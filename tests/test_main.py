@@ -16,3 +16,62 @@ def test_login_redirects_to_auth(client, csrf_token):
 def test_login_requires_csrf(client):
     response = client.post('/login', data={'username': 'test', 'password': 'test'})
     assert response.status_code == 400
+
+def test_service_worker_served_from_root_scope(client):
+    response = client.get('/service-worker.js')
+    assert response.status_code == 200
+    assert response.headers['Service-Worker-Allowed'] == '/'
+    assert 'no-cache' in response.headers['Cache-Control']
+    assert b'staleWhileRevalidate' in response.data
+
+def test_offline_agenda_lists_prefetch_urls_and_revalidates(client, login_as):
+    from datetime import date, time, timedelta
+    from app import db
+    from app.models import Activity, Training
+
+    today = date.today()
+    training = Training(team_code='SENIORS', name='Abendtraining', weekday=today.weekday(),
+                        start_date=today, end_date=today + timedelta(days=30), start_time=time(23, 0))
+    training.activities = [Activity(activity_type='team', start_time=time(23, 0), duration=30, order_index=0)]
+    db.session.add(training)
+    db.session.commit()
+    login_as()
+
+    response = client.get('/offline/agenda.json')
+    assert response.status_code == 200
+    assert 'private' in response.headers['Cache-Control']
+    payload = response.get_json()
+    occurrence = payload['occurrences'][0]
+    assert occurrence['live_url'] == f'/live?training_id={training.id}&date={occurrence["date"]}'
+    assert payload['urls'][:2] == ['/', '/live']
+    assert occurrence['live_url'] in payload['urls']
+
+    revalidated = client.get('/offline/agenda.json', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+def test_index_supports_etag_revalidation(client, login_as):
+    login_as()
+    response = client.get('/')
+    assert response.status_code == 200
+    assert response.headers.get('ETag')
+    assert client.get('/', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def test_live_renders_selected_training_from_rows(client, login_as):
+    from datetime import date, time, timedelta
+    from app import db
+    from app.models import Activity, Training
+
+    today = date.today()
+    own = Training(team_code='SENIORS', name='Eigenes Training', weekday=today.weekday(),
+                   start_date=today, end_date=today + timedelta(days=30), start_time=time(23, 0))
+    own.activities = [Activity(activity_type='team', start_time=time(23, 0), duration=30, topic='Walkthrough', order_index=0)]
+    other = Training(team_code='OTHER', name='Fremdes Training', weekday=today.weekday(),
+                     start_date=today, end_date=today + timedelta(days=30), start_time=time(23, 0))
+    db.session.add_all([own, other])
+    db.session.commit()
+    login_as()
+
+    response = client.get(f'/live?training_id={own.id}&date={today.isoformat()}')
+    assert response.status_code == 200
+    assert 'Walkthrough' in response.get_data(as_text=True)
+    assert client.get(f'/live?training_id={other.id}&date={today.isoformat()}').status_code == 404
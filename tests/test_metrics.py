@@ -0,0 +1,36 @@
+from app.fragment_cache import FragmentCache
+from app.single_flight import SingleFlight
+
+
+def test_metrics_requires_internal_secret(client):
+    assert client.get('/metrics').status_code == 401
+
+
+def test_metrics_exposes_request_histograms(client, app, login_as):
+    app.config['INTERNAL_API_SECRET'] = 'internal-secret'
+    login_as()
+    client.get('/')
+
+    response = client.get('/metrics', headers={'X-TT-Internal-Secret': 'internal-secret'})
+
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'tt_agenda_request_duration_seconds_bucket{endpoint="main.index"' in body
+    assert 'tt_agenda_request_db_queries_count{endpoint="main.index"}' in body
+    assert 'tt_agenda_worker_start_time_seconds' in body
+    assert 'tt_agenda_infra_request_seconds' in body
+
+
+def test_metrics_count_fragment_cache_and_single_flight(client, app):
+    app.config['INTERNAL_API_SECRET'] = 'internal-secret'
+    cache = FragmentCache()
+    cache.set('fragment', ('<p></p>', {}))
+    cache.get('fragment')
+    cache.get('missing')
+    SingleFlight().do('upcoming', lambda: [])
+
+    body = client.get('/metrics', headers={'X-TT-Internal-Secret': 'internal-secret'}).get_data(as_text=True)
+
+    assert 'tt_agenda_fragment_cache_lookups_total{result="hit"}' in body
+    assert 'tt_agenda_fragment_cache_lookups_total{result="miss"}' in body
+    assert 'tt_agenda_single_flight_calls_total{result="computed"}' in body
@@ -0,0 +1,80 @@
+import json
+import logging
+import os
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.config import Config
+from app.extensions import db
+from app.perf import parse_import_times, parse_query_budgets, profile_boot
+
+
+def test_boot_time_within_budget(tmp_path, isolated_paths):
+    env = os.environ.copy()
+    env.update({
+        'SECRET_KEY': 'boot-budget-secret',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'boot.db'}",
+        'AUTO_CREATE_DB': 'true',
+        'WEBHOOK_ENABLED': 'false',
+        'LOG_LEVEL': 'WARNING',
+        **isolated_paths,
+    })
+
+    profile = profile_boot('/login', env=env)
+
+    assert profile['first_request']['status'] == 200
+    assert set(profile['phases_ms']) >= {'config', 'extensions', 'blueprints', 'schema', 'master_data'}
+    assert profile['total_ms'] <= Config.BOOT_BUDGET_MS, (
+        f"Boot took {profile['total_ms']:.0f} ms (budget {Config.BOOT_BUDGET_MS:.0f} ms): {profile}"
+    )
+
+
+def test_parse_import_times_groups_by_package():
+    stderr = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       120 |        120 |   _json',
+        'import time:       300 |        420 | json',
+        'import time:      4000 |       4000 |   flask.app',
+        'import time:      1000 |       5000 | flask',
+        'some unrelated log line',
+    ])
+
+    assert parse_import_times(stderr) == {'flask': 5.0, 'json': 0.3, '_json': 0.12}
+
+
+def test_request_emits_server_timing_and_log_line(login_as, client, caplog):
+    login_as()
+    with caplog.at_level(logging.INFO, logger='app.perf.requests'):
+        response = client.get('/')
+
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('db;desc="') and 'tpl;dur=' in timing and 'infra;dur=' in timing
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['endpoint'] == 'main.index'
+    assert record['db_queries'] > 0
+
+
+def test_query_budget_warning(app, login_as, client, caplog):
+    login_as()
+    app.config['QUERY_BUDGETS'] = {'main.index': 0}
+    with caplog.at_level(logging.WARNING, logger='app.perf.requests'):
+        client.get('/')
+
+    warnings = [record for record in caplog.records if 'Query budget exceeded' in record.getMessage()]
+    assert json.loads(warnings[0].getMessage().split(': ', 1)[1])['query_budget'] == 0
+
+
+def test_parse_query_budgets():
+    assert parse_query_budgets('admin.admin_trainings=20, main.index=15,broken,x=y') == {
+        'admin.admin_trainings': 20,
+        'main.index': 15,
+    }
+
+
+def test_failing_statement_leaves_no_query_timer(app):
+    with db.engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.exec_driver_sql('SELECT * FROM missing_table')
+        assert not connection.info.get('query_started')
+        assert connection.exec_driver_sql('SELECT 1').scalar() == 1
@@ -0,0 +1,195 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+from app import utils
+from app.utils import (
+    get_position_group_defs,
+    get_position_group_labels,
+    get_position_groups,
+    refresh_position_groups,
+)
+
+SNAPSHOTS = [
+    [{'key': 'OL', 'label': 'Offense Line'}, {'key': 'DL', 'label': 'Defense Line'}],
+    [{'key': 'QB', 'label': 'Quarterback'}, {'key': 'WR', 'label': 'Receiver'}, {'key': 'TE', 'label': 'Tight End'}],
+]
+
+
+class _FakeResponse:
+    status_code = 200
+    text = ''
+
+    def __init__(self, positions):
+        self._payload = {'positions': positions}
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture
+def alternating_infra(monkeypatch):
+    payloads = itertools.cycle(SNAPSHOTS)
+    lock = threading.Lock()
+
+    def fake_get(url, headers=None, timeout=None):
+        with lock:
+            positions = next(payloads)
+        return _FakeResponse(positions)
+
+    monkeypatch.setattr(utils.requests, 'get', fake_get)
+    original = utils._position_groups
+    yield
+    utils._position_groups = original
+
+
+def test_snapshot_is_immutable(app, alternating_infra):
+    refresh_position_groups()
+    with app.test_request_context():
+        keys = get_position_groups()
+        labels = get_position_group_labels()
+    assert isinstance(keys, tuple)
+    with pytest.raises(TypeError):
+        labels['OL'] = 'changed'
+
+
+def test_request_keeps_its_snapshot_while_others_refresh(app, alternating_infra):
+    with app.test_request_context():
+        refresh_position_groups()
+        pinned = get_position_groups()
+        # Ein anderer Thread tauscht den globalen Stand aus
+        worker = threading.Thread(target=refresh_position_groups)
+        worker.start()
+        worker.join()
+        assert utils._position_groups.keys != pinned
+        assert get_position_groups() is pinned
+        assert [item['key'] for item in get_position_group_defs()] == list(pinned)
+    with app.test_request_context():
+        assert get_position_groups() == utils._position_groups.keys
+
+
+def test_readers_never_see_half_updated_groups(app, alternating_infra):
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        while not stop.is_set():
+            refresh_position_groups()
+
+    def reader():
+        for _ in range(300):
+            with app.test_request_context():
+                keys = get_position_groups()
+                labels = get_position_group_labels()
+                defs = get_position_group_defs()
+                if set(keys) != set(labels) or [item['key'] for item in defs] != list(keys):
+                    errors.append((keys, dict(labels)))
+
+    writers = [threading.Thread(target=writer) for _ in range(2)]
+    for thread in writers:
+        thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _index: reader(), range(8)))
+    finally:
+        stop.set()
+        for thread in writers:
+            thread.join()
+    assert errors == []
+
+
+# --- Echte Nebenläufigkeit: Gunicorn mit gthread und mehreren Prozessen ---
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class _InfraHandler(BaseHTTPRequestHandler):
+    payloads = itertools.cycle(SNAPSHOTS)
+    lock = threading.Lock()
+    hits = 0
+
+    def do_GET(self):
+        with self.lock:
+            type(self).hits += 1
+            positions = next(self.payloads)
+        body = json.dumps({'positions': positions}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_infra():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _InfraHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def test_gthread_workers_serve_concurrent_requests(tmp_path, fake_infra, isolated_paths):
+    pytest.importorskip('gunicorn')
+    port = _free_port()
+    env = os.environ.copy()
+    env.update({
+        'SECRET_KEY': 'gthread-secret',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'gthread.db'}",
+        'AUTO_CREATE_DB': 'true',
+        'CREATE_DEFAULT_USERS': 'false',
+        'WEBHOOK_ENABLED': 'false',
+        'LOG_LEVEL': 'WARNING',
+        'TT_INFRA_INTERNAL_URL': fake_infra,
+        **isolated_paths,
+    })
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', '2',
+         '--worker-class', 'gthread', '--threads', '4', '--log-level', 'warning', 'app:create_app()'],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if requests.get(f'{base_url}/health', timeout=2).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            assert process.poll() is None, process.stdout.read().decode('utf-8', 'replace')
+            assert time.monotonic() < deadline, 'gunicorn did not start'
+            time.sleep(0.2)
+
+        paths = ['/login'] * 80 + ['/health', '/service-worker.js'] * 20
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            statuses = list(pool.map(lambda path: requests.get(base_url + path, timeout=10).status_code, paths))
+        assert statuses == [200] * len(paths)
+        # Jeder Login-Request hat die Positionsgruppen neu geladen und den Snapshot getauscht
+        assert _InfraHandler.hits >= paths.count('/login')
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from app.profiling import PROFILE_ID_HEADER, ProfileStore, RequestProfile, get_profile_store, init_profiling
+
+
+@pytest.fixture
+def profiling_app(app, tmp_path):
+    # Hooks werden nur bei PROFILING_ENABLED registriert, also vor dem ersten Request
+    app.config.update(PROFILING_ENABLED=True, PROFILE_DIR=str(tmp_path / 'profiles'), PROFILE_BUFFER_SIZE=3)
+    init_profiling(app)
+    return app
+
+
+def test_profiling_disabled_by_default(app, client, login_as):
+    login_as(role='admin')
+    response = client.get('/?_profile=1')
+
+    assert PROFILE_ID_HEADER not in response.headers
+    assert get_profile_store(app) is None
+    assert 'Profiling ist deaktiviert' in client.get('/admin/perf').get_data(as_text=True)
+
+
+def test_admin_profile_is_stored_and_viewable(profiling_app, client, login_as):
+    login_as(role='admin')
+    response = client.get('/admin/trainings?_profile=1')
+
+    profile_id = response.headers[PROFILE_ID_HEADER]
+    report = get_profile_store(profiling_app).load(profile_id)
+    assert report['endpoint'] == 'admin.admin_trainings'
+    assert report['sql_count'] == len(report['sql']) > 0
+    assert 'cumulative' in report['stats']
+
+    overview = client.get('/admin/perf').get_data(as_text=True)
+    assert '/admin/trainings?_profile=1' in overview
+    detail = client.get(f'/admin/perf/{profile_id}')
+    assert detail.status_code == 200
+    assert 'FROM training' in detail.get_data(as_text=True)
+
+
+def test_profiling_ignores_non_admins_and_unrequested(profiling_app, client, login_as):
+    login_as(role='user')
+    assert PROFILE_ID_HEADER not in client.get('/?_profile=1').headers
+    assert client.get('/admin/perf').status_code == 302
+
+    login_as(username='admin', role='admin')
+    assert PROFILE_ID_HEADER not in client.get('/').headers
+    assert PROFILE_ID_HEADER in client.get('/', headers={'X-TT-Profile': '1'}).headers
+
+
+def test_overlapping_profiled_requests_profile_only_one(profiling_app, client, login_as, monkeypatch):
+    login_as(role='admin')
+    with client.session_transaction() as sess:
+        session_data = dict(sess)
+    other = profiling_app.test_client()
+    with other.session_transaction() as sess:
+        sess.update(session_data)
+
+    # Der erste Request hält sein Profil offen, bis der zweite durch ist
+    entered, release = threading.Event(), threading.Event()
+    stop = RequestProfile.stop
+
+    def blocking_stop(self):
+        entered.set()
+        release.wait(5)
+        return stop(self)
+
+    monkeypatch.setattr(RequestProfile, 'stop', blocking_stop)
+    responses = {}
+    first = threading.Thread(target=lambda: responses.setdefault('first', client.get('/?_profile=1')))
+    first.start()
+    try:
+        assert entered.wait(5)
+        responses['second'] = other.get('/?_profile=1')
+    finally:
+        release.set()
+        first.join(5)
+
+    assert responses['second'].status_code == 200
+    assert PROFILE_ID_HEADER not in responses['second'].headers
+    assert PROFILE_ID_HEADER in responses['first'].headers
+    # Danach ist der Profiler wieder frei
+    assert PROFILE_ID_HEADER in other.get('/?_profile=1').headers
+
+
+def test_profile_store_is_bounded_ring_buffer(tmp_path):
+    store = ProfileStore(str(tmp_path), size=3)
+    ids = [store.save({'path': f'/{index}'}) for index in range(5)]
+
+    assert [item['id'] for item in store.list()] == list(reversed(ids[2:]))
+    assert store.load(ids[0]) is None
+    assert store.load('../../etc/passwd') is None
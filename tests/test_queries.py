@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from app.benchmark import generate_dataset
+from app.extensions import db
+from app.models import Activity, ActivityInstance, Training, TrainingInstance
+from app.queries import ACTIVITY_WITH_TRAINING, get_or_404
+from app.schema import ensure_activity_types
+
+TEAM = 'TEAM01'
+
+
+@pytest.fixture
+def admin_client(app, client, create_user):
+    ensure_activity_types()
+    user = create_user(username='coach', role='admin')
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+        sess['username'] = 'coach'
+        sess['user_role'] = 'admin'
+        sess['memberships'] = [{'team_code': TEAM, 'team_name': 'Team 1'}]
+        sess['active_team_code'] = TEAM
+        sess['webhook_sent'] = True
+    return client
+
+
+@pytest.fixture
+def dataset(app):
+    generate_dataset(teams=1, trainings=1, activities=4, seasons=1, instance_ratio=1.0, seed=7)
+    training = Training.query.filter_by(team_code=TEAM, is_hidden=False).first()
+    instance = TrainingInstance.query.filter_by(training_id=training.id, status='active').first()
+    cancelled = TrainingInstance.query.filter_by(training_id=training.id, status='cancelled').first()
+    ids = {
+        'training': training.id,
+        'activity': Activity.query.filter_by(training_id=training.id).order_by(Activity.order_index).all()[1].id,
+        'instance': instance.id,
+        'instance_activity': ActivityInstance.query.filter_by(training_instance_id=instance.id).order_by(ActivityInstance.order_index).first().id,
+        'cancelled_date': cancelled.date.isoformat() if cancelled else None,
+    }
+    db.session.remove()
+    return ids
+
+
+def test_undeclared_relationship_raises(app, dataset):
+    activity = db.session.get(Activity, dataset['activity'])
+    with pytest.raises(InvalidRequestError):
+        activity.training
+
+
+def test_declared_relationship_is_loaded_with_the_row(app, dataset, count_queries):
+    with count_queries() as queries:
+        activity = get_or_404(Activity, dataset['activity'], ACTIVITY_WITH_TRAINING)
+        assert activity.training.id == dataset['training']
+    assert queries.count == 1, queries.report()
+
+
+def test_lazy_loads_are_allowed_without_the_guard(app, dataset):
+    app.config['RAISE_ON_LAZY_LOAD'] = False
+    activity = db.session.get(Activity, dataset['activity'])
+    assert activity.training.id == dataset['training']
+
+
+ROUTES = [
+    pytest.param('GET', lambda ids: f"/training/instance/{ids['instance']}/edit", None, id='instance_edit'),
+    pytest.param('GET', lambda ids: f"/training/instance/{ids['instance']}/activity/add", None, id='instance_activity_add'),
+    pytest.param('GET', lambda ids: f"/training/instance/activity/{ids['instance_activity']}/edit", None, id='instance_activity_edit'),
+    pytest.param('POST', lambda ids: f"/training/instance/activity/{ids['instance_activity']}/move_down", None, id='instance_activity_move_down'),
+    pytest.param('POST', lambda ids: f"/training/instance/activity/{ids['instance_activity']}/delete", None, id='instance_activity_delete'),
+    pytest.param('POST', lambda ids: f"/training-instance/{ids['instance']}/copy", None, id='instance_copy'),
+    pytest.param('POST', lambda ids: f"/training/instance/{ids['instance']}/delete", None, id='instance_delete'),
+    pytest.param('GET', lambda ids: f"/activity/{ids['activity']}/edit", None, id='activity_edit'),
+    pytest.param('POST', lambda ids: f"/activity/{ids['activity']}/move_up", None, id='activity_move_up'),
+    pytest.param('POST', lambda ids: f"/activity/{ids['activity']}/move_down", None, id='activity_move_down'),
+    pytest.param('POST', lambda ids: f"/activity/{ids['activity']}/delete", None, id='activity_delete'),
+    pytest.param('POST', lambda ids: f"/training/{ids['training']}/instance/create", lambda ids: {'date': ids['cancelled_date']}, id='instance_reactivate'),
+]
+
+
+@pytest.mark.parametrize('method, path, form', ROUTES)
+def test_admin_views_declare_what_they_load(admin_client, dataset, method, path, form):
+    if method == 'GET':
+        response = admin_client.get(path(dataset))
+        assert response.status_code == 200
+        return
+    admin_client.get('/admin/trainings')
+    with admin_client.session_transaction() as sess:
+        token = sess['_csrf_token']
+    db.session.remove()
+    data = {'csrf_token': token, **(form(dataset) if form else {})}
+    response = admin_client.post(path(dataset), data=data)
+    assert response.status_code == 302
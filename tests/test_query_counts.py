@@ -0,0 +1,139 @@
+import re
+
+import pytest
+
+from app.benchmark import generate_dataset
+from app.extensions import db
+from app.models import Activity, ActivityInstance, Training, TrainingInstance
+from app.schema import ensure_activity_types
+
+TEAM = 'TEAM01'
+
+
+@pytest.fixture
+def team_client(app, client, create_user):
+    ensure_activity_types()
+    app.config['INTERNAL_API_SECRET'] = 'internal-secret'
+    user = create_user(username='coach', role='admin')
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+        sess['username'] = 'coach'
+        sess['user_role'] = 'admin'
+        sess['memberships'] = [{'team_code': TEAM, 'team_name': 'Team 1'}]
+        sess['active_team_code'] = TEAM
+        sess['webhook_sent'] = True
+    return client
+
+
+def _latest_ids():
+    training = Training.query.filter_by(team_code=TEAM, is_hidden=False).order_by(Training.id.desc()).first()
+    instance = (
+        TrainingInstance.query.filter_by(training_id=training.id, status='active')
+        .order_by(TrainingInstance.id.desc())
+        .first()
+    )
+    return training.id, instance.id
+
+
+PAGES = {
+    'index': lambda ids: '/',
+    'live': lambda ids: '/live',
+    'api_trainings': lambda ids: f'/api/trainings?teams={TEAM}',
+    'admin_trainings': lambda ids: '/admin/trainings?include_ended=1',
+    'training_edit': lambda ids: f'/training/{ids[0]}/edit',
+    'instance_edit': lambda ids: f'/training/instance/{ids[1]}/edit',
+}
+
+
+# Fester Grundbedarf pro Seite (Trainings, Aktivitäten, Instanzen, Aktivitätstypen, …)
+PAGE_BUDGET = 8
+
+
+def _get(client, page, ids):
+    response = client.get(PAGES[page](ids), headers={'X-TT-Internal-Secret': 'internal-secret'})
+    assert response.status_code == 200
+    return response
+
+
+@pytest.mark.parametrize('page', sorted(PAGES))
+def test_query_count_does_not_grow_with_data(team_client, count_queries, page):
+    generate_dataset(teams=1, trainings=1, activities=2, seasons=1, instance_ratio=1.0, seed=1)
+    ids = _latest_ids()
+    # Leere Identity-Map, sonst verdecken geladene Objekte Lazy-Loads
+    db.session.remove()
+    with count_queries() as small:
+        _get(team_client, page, ids)
+
+    generate_dataset(teams=1, trainings=4, activities=12, seasons=2, instance_ratio=1.0, seed=2)
+    ids = _latest_ids()
+    db.session.remove()
+    with count_queries() as large:
+        _get(team_client, page, ids)
+
+    assert large.count == small.count, f'{page}: {small.count} -> {large.count}\n{large.report()}'
+    assert large.count <= PAGE_BUDGET, large.report()
+
+
+@pytest.mark.max_queries(PAGE_BUDGET)
+def test_max_queries_marker_checks_every_request(team_client):
+    generate_dataset(teams=1, trainings=3, activities=8, seasons=1, instance_ratio=0.5, seed=3)
+    ids = _latest_ids()
+    db.session.remove()
+    for page in sorted(PAGES):
+        _get(team_client, page, ids)
+
+
+def test_activity_types_are_loaded_once_per_request(team_client, count_queries):
+    generate_dataset(teams=1, trainings=2, activities=12, seasons=1, instance_ratio=0.5, seed=4)
+    db.session.remove()
+    with count_queries() as queries:
+        _get(team_client, 'index', None)
+    activity_type_queries = [statement for statement in queries.statements if 'FROM activity_type' in statement]
+    assert len(activity_type_queries) <= 1, queries.report()
+
+
+def _csrf(client):
+    client.get('/admin/trainings')
+    with client.session_transaction() as sess:
+        return sess['_csrf_token']
+
+
+@pytest.mark.parametrize('large', [False, True])
+def test_delete_training_leaves_children_to_the_database(team_client, count_queries, large):
+    if large:
+        generate_dataset(teams=1, trainings=2, activities=12, seasons=2, instance_ratio=1.0, seed=5)
+    else:
+        generate_dataset(teams=1, trainings=1, activities=2, seasons=1, instance_ratio=1.0, seed=5)
+    training_id, instance_id = _latest_ids()
+    assert Activity.query.filter_by(training_id=training_id).count() > 0
+    assert ActivityInstance.query.filter_by(training_instance_id=instance_id).count() > 0
+    token = _csrf(team_client)
+    db.session.remove()
+
+    with count_queries() as queries:
+        response = team_client.post(f'/training/{training_id}/delete', data={'csrf_token': token})
+    assert response.status_code == 302
+
+    deletes = [statement for statement in queries.statements if statement.startswith('DELETE')]
+    assert len(deletes) == 1 and deletes[0].startswith('DELETE FROM training '), queries.report()
+    # Kinder werden weder geladen noch einzeln gelöscht
+    assert not any(re.search(r'FROM (activity|activity_instance|training_instance)\b', statement) for statement in queries.statements), queries.report()
+    assert Activity.query.filter_by(training_id=training_id).count() == 0
+    assert TrainingInstance.query.filter_by(training_id=training_id).count() == 0
+    assert ActivityInstance.query.filter_by(training_instance_id=instance_id).count() == 0
+
+
+def test_delete_training_instance_cascades_to_activities(team_client, count_queries):
+    generate_dataset(teams=1, trainings=1, activities=6, seasons=1, instance_ratio=1.0, seed=6)
+    training_id, instance_id = _latest_ids()
+    token = _csrf(team_client)
+    db.session.remove()
+
+    with count_queries() as queries:
+        response = team_client.post(f'/training/instance/{instance_id}/delete', data={'csrf_token': token})
+    assert response.status_code == 302
+
+    deletes = [statement for statement in queries.statements if statement.startswith('DELETE')]
+    assert len(deletes) == 1 and deletes[0].startswith('DELETE FROM training_instance '), queries.report()
+    assert db.session.get(Training, training_id) is not None
+    assert ActivityInstance.query.filter_by(training_instance_id=instance_id).count() == 0
@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from app.extensions import db
+from app.models import Activity, ActivityInstance, Training, TrainingInstance
+
+TODAY = date(2026, 1, 1)
+
+HOT_QUERIES = {
+    'activity_by_training': lambda: (
+        Activity.query.filter_by(training_id=1).order_by(Activity.order_index)
+    ),
+    'activity_by_trainings': lambda: (
+        Activity.query
+        .filter(Activity.training_id.in_([1, 2, 3]))
+        .order_by(Activity.training_id, Activity.order_index)
+    ),
+    'activity_instance_by_instance': lambda: (
+        ActivityInstance.query.filter_by(training_instance_id=1).order_by(ActivityInstance.order_index)
+    ),
+    'training_by_team_window': lambda: (
+        Training.query
+        .filter_by(team_code='SENIORS', is_hidden=False)
+        .filter(Training.end_date >= TODAY)
+        .order_by(Training.start_date.desc())
+    ),
+    'hidden_training_by_team_window': lambda: (
+        Training.query
+        .filter_by(team_code='SENIORS', is_hidden=True)
+        .filter(Training.start_date >= TODAY)
+        .order_by(Training.start_date.desc())
+    ),
+    'instance_by_training_date': lambda: (
+        TrainingInstance.query.filter_by(training_id=1, date=TODAY)
+    ),
+    'instances_by_training': lambda: (
+        TrainingInstance.query.filter_by(training_id=1).order_by(TrainingInstance.date.asc())
+    ),
+}
+
+
+def _explain(query):
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {statement}')).fetchall()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_queries_use_an_index(app, name):
+    plan = _explain(HOT_QUERIES[name]())
+
+    full_scans = [step for step in plan if step.startswith('SCAN ') and 'USING' not in step]
+    assert not full_scans, f'{name} falls back to a full scan: {plan}'
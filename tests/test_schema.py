@@ -0,0 +1,112 @@
+import pytest
+
+from app import create_app, schema
+from app.extensions import db
+from app.models import ActivityType, SchemaState
+
+
+@pytest.fixture
+def boot_config(tmp_path, isolated_paths):
+    class BootConfig:
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'boot.db'}"
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        SECRET_KEY = 'test-secret-key'
+        WEBHOOK_ENABLED = False
+        LOG_LEVEL = 'DEBUG'
+        AUTO_CREATE_DB = True
+
+    for name, value in isolated_paths.items():
+        setattr(BootConfig, name, value)
+    return BootConfig
+
+
+def test_first_boot_runs_checks_and_stores_fingerprint(boot_config):
+    app = create_app(boot_config)
+    with app.app_context():
+        state = db.session.get(SchemaState, schema.SCHEMA_STATE_KEY)
+        assert state is not None
+        assert state.fingerprint == schema.schema_fingerprint(db.engine)
+        assert ActivityType.query.count() > 0
+
+
+def test_boot_on_current_schema_skips_checks(boot_config, monkeypatch):
+    create_app(boot_config)
+
+    def fail(_app):
+        raise AssertionError('schema checks must not run on an up-to-date database')
+
+    monkeypatch.setattr(schema, 'run_schema_checks', fail)
+    create_app(boot_config)
+
+
+def test_boot_on_current_schema_restores_activity_types(boot_config, tmp_path):
+    app = create_app(boot_config)
+    assert (tmp_path / 'schema.lock').exists()
+    with app.app_context():
+        ActivityType.query.delete()
+        db.session.commit()
+
+    app = create_app(boot_config)
+    with app.app_context():
+        assert ActivityType.query.count() > 0
+
+
+def test_stale_fingerprint_reruns_checks(boot_config, monkeypatch):
+    app = create_app(boot_config)
+    with app.app_context():
+        schema.write_schema_fingerprint('outdated')
+
+    calls = []
+    original = schema.run_schema_checks
+    monkeypatch.setattr(schema, 'run_schema_checks', lambda app: calls.append(app) or original(app))
+    app = create_app(boot_config)
+
+    assert len(calls) == 1
+    with app.app_context():
+        assert schema.read_schema_fingerprint(db.engine) == schema.schema_fingerprint(db.engine)
+
+
+def test_checks_add_cascading_foreign_keys_to_existing_tables(boot_config):
+    from sqlalchemy import MetaData, create_engine, inspect
+
+    from app.models import Activity, Training
+
+    # Bestandsdatenbank aus der Zeit vor ON DELETE CASCADE
+    legacy = MetaData()
+    for table in db.metadata.sorted_tables:
+        table.to_metadata(legacy)
+    for table in legacy.sorted_tables:
+        for foreign_key in table.foreign_keys:
+            foreign_key.ondelete = None
+    engine = create_engine(boot_config.SQLALCHEMY_DATABASE_URI)
+    legacy.create_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO training (id, team_code, name, weekday, start_date, end_date, start_time, is_hidden) "
+            "VALUES (1, 'SENIORS', 'Alt', 0, '2026-01-01', '2026-12-31', '18:00:00.000000', 0)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO activity (training_id, activity_type, start_time, duration, position_groups, order_index) "
+            "VALUES (1, 'team', '18:00:00.000000', 30, '[]', 0)"
+        )
+    engine.dispose()
+
+    app = create_app(boot_config)
+    with app.app_context():
+        for table_name in ('activity', 'training_instance', 'activity_instance'):
+            foreign_keys = inspect(db.engine).get_foreign_keys(table_name)
+            assert [item['options'].get('ondelete') for item in foreign_keys] == ['CASCADE']
+        assert Activity.query.count() == 1
+
+        db.session.delete(db.session.get(Training, 1))
+        db.session.commit()
+        assert Activity.query.count() == 0
+
+
+def test_jsonb_conversion_keeps_not_null_columns_filled():
+    from app.models import Activity, User
+
+    assert schema.jsonb_using(Activity.__table__.c.topics_json) == "NULLIF(topics_json, '')::jsonb"
+    assert schema.jsonb_using(Activity.__table__.c.position_groups) == "COALESCE(NULLIF(position_groups, ''), '[]')::jsonb"
+    assert schema.jsonb_using(User.__table__.c.claims_json) == "COALESCE(NULLIF(claims_json, ''), '{}')::jsonb"
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app, sessions
+from app.extensions import db
+from app.models import ServerSession
+
+
+def _session_cookie(client, app):
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    return cookie.value if cookie else None
+
+
+def test_cookie_holds_only_session_id(client, app):
+    client.get('/login')
+    sid = _session_cookie(client, app)
+    assert sid and len(sid) < 64
+
+    with client.session_transaction() as sess:
+        sess['memberships'] = [{'team_code': f'TEAM{i}', 'team_name': 'x' * 40} for i in range(50)]
+    assert _session_cookie(client, app) == sid
+
+    with client.session_transaction() as sess:
+        assert len(sess['memberships']) == 50
+
+
+def test_unknown_session_id_is_not_adopted(client, app):
+    client.set_cookie(app.config['SESSION_COOKIE_NAME'], 'attacker-chosen-id')
+    client.get('/login')
+    assert _session_cookie(client, app) != 'attacker-chosen-id'
+
+
+def test_logout_deletes_server_side_session(client, app, csrf_token):
+    token = csrf_token()
+    sid = _session_cookie(client, app)
+    store = app.session_interface.store
+
+    client.post('/logout', data={'csrf_token': token})
+
+    assert store.load(sid, datetime.utcnow()) is None
+    assert _session_cookie(client, app) is None
+
+
+def test_sqlite_store_sweeps_expired_sessions(tmp_path):
+    store = sessions.SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    now = datetime.utcnow()
+    store.save('old', b'{}', now - timedelta(seconds=1))
+    store.save('new', b'{}', now + timedelta(hours=1))
+
+    assert store.load('old', now) is None
+    assert store.sweep(now) == 1
+    assert store.load('new', now)[0] == b'{}'
+
+
+def test_session_store_requires_all_backend_methods():
+    class PartialStore(sessions.SessionStore):
+        def load(self, sid, now):
+            return None
+
+    # Fehlende Methoden fallen beim App-Start auf, nicht erst im ersten Request
+    with pytest.raises(TypeError, match='save'):
+        PartialStore()
+
+
+def test_database_backend_and_cookie_fallback(tmp_path, isolated_paths):
+    class DatabaseConfig:
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        SECRET_KEY = 'test-secret-key'
+        LOG_LEVEL = 'DEBUG'
+        AUTO_CREATE_DB = False
+        SESSION_BACKEND = 'database'
+
+    for name, value in isolated_paths.items():
+        setattr(DatabaseConfig, name, value)
+    app = create_app(DatabaseConfig)
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.get('/login')
+    with app.app_context():
+        row = db.session.get(ServerSession, _session_cookie(client, app))
+        assert row is not None and b'_csrf_token' in row.data
+
+    DatabaseConfig.SESSION_BACKEND = 'cookie'
+    assert not isinstance(create_app(DatabaseConfig).session_interface, sessions.ServerSideSessionInterface)
+
+    DatabaseConfig.SESSION_BACKEND = 'memcached'
+    with pytest.raises(RuntimeError):
+        create_app(DatabaseConfig)
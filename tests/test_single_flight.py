@@ -0,0 +1,129 @@
+from datetime import date, datetime, time, timedelta
+import threading
+import time as time_module
+
+import pytest
+
+from app.extensions import db
+from app.models import Activity, Training
+from app.single_flight import SingleFlight, get_single_flight
+from app.utils import TrainingRef, get_upcoming_occurrences
+
+
+def _slow_compute(calls, started=None, result='ergebnis'):
+    def compute():
+        calls.append(threading.get_ident())
+        if started is not None:
+            started.set()
+        time_module.sleep(0.2)
+        return result
+    return compute
+
+
+def _run_concurrently(target, count):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def run(index):
+        barrier.wait()
+        results[index] = target()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+    results = _run_concurrently(lambda: flight.do(('upcoming', 'A'), _slow_compute(calls)), 8)
+    assert len(calls) == 1
+    assert results == ['ergebnis'] * 8
+    assert flight.shared == 7
+
+
+def test_different_keys_compute_independently():
+    flight = SingleFlight()
+    calls = []
+    flight.do(('upcoming', 'A'), _slow_compute(calls))
+    flight.do(('upcoming', 'B'), _slow_compute(calls))
+    assert len(calls) == 2
+
+
+def test_errors_reach_all_waiters_and_are_not_cached():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time_module.sleep(0.1)
+        raise RuntimeError('kaputt')
+
+    errors = []
+
+    def follower():
+        started.wait()
+        try:
+            flight.do('key', lambda: 'nie')
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    with pytest.raises(RuntimeError):
+        flight.do('key', failing)
+    thread.join()
+    assert len(errors) == 1
+    assert flight.do('key', lambda: 'neu') == 'neu'
+
+
+def test_workers_coordinate_through_the_lock_file(tmp_path):
+    # Zwei Instanzen stehen für zwei Gunicorn-Worker mit gemeinsamem Verzeichnis
+    first, second = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    calls = []
+    started = threading.Event()
+    leader = threading.Thread(target=lambda: first.do('key', _slow_compute(calls, started, ['a', 1])))
+    leader.start()
+    started.wait()
+    assert second.do('key', _slow_compute(calls, result=['b', 2])) == ['a', 1]
+    leader.join()
+    assert len(calls) == 1
+    assert second.computed == 0
+
+
+def test_upcoming_occurrences_are_shared_per_minute_and_data_version(app):
+    today = date.today()
+    training = Training(
+        team_code='TEAM01',
+        name='Montag',
+        weekday=(today + timedelta(days=1)).weekday(),
+        start_date=today,
+        end_date=today + timedelta(days=14),
+        start_time=time(18, 0),
+    )
+    db.session.add(training)
+    db.session.flush()
+    db.session.add(Activity(training_id=training.id, activity_type='team', start_time=time(18, 0), duration=60))
+    db.session.commit()
+    now = datetime.now().replace(second=5)
+    flight = get_single_flight(app)
+
+    with app.test_request_context():
+        first = get_upcoming_occurrences(['TEAM01'], now)
+        again = get_upcoming_occurrences(['TEAM01'], now.replace(second=50))
+    assert flight.computed == 1
+    assert first == again
+    assert first[0]['training'] == TrainingRef(training.id, 'Montag', training.weekday, 'TEAM01', False)
+    assert first[0]['end_time'] == time(19, 0)
+
+    training.name = 'Dienstag'
+    db.session.commit()
+    with app.test_request_context():
+        changed = get_upcoming_occurrences(['TEAM01'], now)
+        next_minute = get_upcoming_occurrences(['TEAM01'], now + timedelta(minutes=1))
+    assert flight.computed == 3
+    assert changed[0]['training'].name == 'Dienstag'
+    assert next_minute == changed
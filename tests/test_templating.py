@@ -0,0 +1,8 @@
+def test_templates_compile_fills_bytecode_cache(app, runner, tmp_path):
+    result = runner.invoke(args=['templates', 'compile'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Templates kompiliert' in result.output
+    compiled = int(result.output.rsplit('\n', 2)[-2].split()[0])
+    assert compiled > 0
+    assert len(list((tmp_path / 'jinja-cache').iterdir())) == compiled
@@ -188,3 +188,55 @@ def test_build_group_cells_individual():
     # OL cell should have content
     ol_cell = next(c for c in cells if c['groups'] == ['OL'])
     assert ol_cell['content'] == 'OL topic'
+
+
+def test_parse_groups_restores_position_group_order(app):
+    from app.utils import get_position_groups
+
+    groups = get_position_groups()
+    # So liefert Postgres ein JSONB-Objekt: Schlüssel sortiert
+    stored = {group: f'{group} topic' for group in sorted(groups)}
+    stored['XX'] = 'unknown group'
+
+    parse_groups = app.jinja_env.filters['parse_groups']
+    assert list(parse_groups(stored)) == [*groups, 'XX']
+    assert list(parse_groups('{"WR": "a", "OL": "b"}')) == [g for g in groups if g in ('WR', 'OL')]
+
+
+def test_load_training_rows_bypasses_identity_map(app):
+    from datetime import date, time
+    from app.models import Activity, ActivityInstance, Training, TrainingInstance
+    from app.extensions import db
+    from app.utils import ActivityRow, TrainingRow, build_group_cells, get_timeline_from_activities, load_training_rows
+
+    t = Training(team_code='ROWS', name='Zeilen', weekday=4, start_date=date(2026, 1, 1),
+                 end_date=date(2026, 12, 31), start_time=time(18, 0))
+    t.activities = [
+        Activity(activity_type='team', start_time=time(18, 0), duration=30,
+                 position_groups=['OL', 'QB'], topic='Install', order_index=0),
+        Activity(activity_type='team', start_time=time(18, 30), duration=45,
+                 position_groups=[], topic='Scrimmage', order_index=1),
+    ]
+    instance = TrainingInstance(date=date(2026, 1, 2), status='active', start_time=time(18, 0))
+    instance.activities = [ActivityInstance(activity_type='team', start_time=time(18, 0), duration=20,
+                                            position_groups=['DL'], order_index=0)]
+    t.instances.append(instance)
+    db.session.add(t)
+    db.session.commit()
+    tid, iid = t.id, instance.id
+    db.session.remove()
+
+    trainings, acts_by_t, inst_by_key, inst_acts_by_id = load_training_rows(team_code='ROWS')
+
+    assert len(db.session.identity_map) == 0
+    assert trainings == [TrainingRow(tid, 'ROWS', 'Zeilen', 4, date(2026, 1, 1), date(2026, 12, 31), time(18, 0), False)]
+    activities = acts_by_t[tid]
+    assert all(isinstance(activity, ActivityRow) for activity in activities)
+    assert [activity.topic for activity in activities] == ['Install', 'Scrimmage']
+    assert activities[0].position_groups == ['OL', 'QB']
+    assert inst_by_key[(tid, date(2026, 1, 2))].id == iid
+    assert [activity.duration for activity in inst_acts_by_id[iid]] == [20]
+
+    timeline, start_dt, end_dt = get_timeline_from_activities(activities, date(2026, 1, 2))
+    assert (start_dt.time(), end_dt.time()) == (time(18, 0), time(19, 15))
+    assert build_group_cells(activities[0])[0]['content'] == 'Install'
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import WebhookEvent
+from app.webhooks import WebhookDispatcher
+
+
+@pytest.fixture(autouse=True)
+def no_worker_thread(app, monkeypatch):
+    # Tests liefern synchron über deliver_due() aus
+    monkeypatch.setattr(WebhookDispatcher, 'start', lambda self: None)
+    app.config['WEBHOOK_URL'] = 'http://webhook.invalid/hook'
+
+
+def _dispatcher(app, send):
+    return WebhookDispatcher(app, send=send)
+
+
+def test_index_queues_webhook_without_http_call(app, login_as, monkeypatch):
+    import requests
+
+    def fail(*args, **kwargs):
+        raise AssertionError('index must not call the webhook synchronously')
+
+    monkeypatch.setattr(requests, 'post', fail)
+    monkeypatch.setattr(requests.Session, 'post', fail)
+    app.config['WEBHOOK_ENABLED'] = True
+
+    response = login_as()
+
+    assert response.status_code == 200
+    event = WebhookEvent.query.one()
+    assert event.status == 'pending'
+    assert 'test' in event.payload['message']
+
+
+def test_delivery_removes_event_from_spool(app):
+    sent = []
+    dispatcher = _dispatcher(app, lambda url, payload: sent.append((url, payload)))
+    dispatcher.enqueue({'title': 'a'})
+    dispatcher.enqueue({'title': 'b'})
+
+    assert dispatcher.deliver_due(datetime.utcnow() + timedelta(seconds=1)) == 2
+    assert [payload['title'] for _, payload in sent] == ['a', 'b']
+    assert WebhookEvent.query.count() == 0
+    assert dispatcher.stats()['counters']['delivered'] == 2
+
+
+def test_failed_delivery_backs_off_and_gives_up(app):
+    def fail(url, payload):
+        raise ConnectionError('n8n down')
+
+    app.config['WEBHOOK_MAX_ATTEMPTS'] = 2
+    dispatcher = _dispatcher(app, fail)
+    dispatcher.enqueue({'title': 'a'})
+    now = datetime.utcnow() + timedelta(seconds=1)
+
+    assert dispatcher.deliver_due(now) == 1
+    event = db.session.get(WebhookEvent, 1)
+    assert event.attempts == 1 and event.status == 'pending'
+    assert event.next_attempt_at == now + timedelta(seconds=5)
+    assert dispatcher.deliver_due(now) == 0
+
+    assert dispatcher.deliver_due(now + timedelta(seconds=5)) == 1
+    db.session.expire_all()
+    assert db.session.get(WebhookEvent, 1).status == 'dead'
+    stats = dispatcher.stats()
+    assert stats['queue_depth'] == 0 and stats['dead'] == 1
+    assert stats['counters']['failed_attempts'] == 2
+
+
+def test_webhook_stats_endpoint(client, app):
+    app.config['INTERNAL_API_SECRET'] = 'internal-secret'
+    response = client.get('/api/internal/webhooks/stats', headers={'X-TT-Internal-Secret': 'internal-secret'})
+    assert response.status_code == 200
+    assert response.get_json()['queue_depth'] == 0
+
+
+def test_dead_events_are_swept_after_retention(app, runner):
+    now = datetime.utcnow()
+    for status, age in (('dead', 20), ('dead', 2), ('pending', 20)):
+        db.session.add(WebhookEvent(
+            url='http://webhook.invalid/hook', payload={}, status=status, attempts=8,
+            next_attempt_at=now, created_at=now - timedelta(days=age),
+        ))
+    db.session.commit()
+
+    result = runner.invoke(args=['webhooks', 'sweep'])
+
+    assert result.exit_code == 0, result.output
+    assert '1 fehlgeschlagene Webhooks gelöscht' in result.output
+    remaining = sorted((event.status, event.created_at < now - timedelta(days=14)) for event in WebhookEvent.query.all())
+    assert remaining == [('dead', False), ('pending', True)]